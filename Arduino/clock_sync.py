@@ -0,0 +1,219 @@
+"""
+Clock synchronization between the ultrasonic position log and the Phyphox
+streams (magnetometer, accelerometer) by FFT cross-correlation.
+
+Both devices see the same motion: the position changes when the phone
+moves, and so do the measured field (through its spatial gradient) and the
+acceleration. Every stream is reduced to a motion-activity signal on a
+common uniform grid, and the lag of the cross-correlation peak inside the
+search window is the clock offset. Estimating the offset separately on
+segments of the scan and fitting a line gives the clock drift.
+
+The result follows the convention of time_align.Alignment:
+t_other = t_pos * (1 + drift) + offset.
+
+    python clock_sync.py 3 4 5        # estimate for the DATASETS of process_table.py
+"""
+import os
+import sys
+
+import numpy as np
+from scipy import fft
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from time_align import Alignment
+
+# --- Configuration ---
+RATE = 10.0            # Hz, common grid of the activity signals
+SMOOTH = 0.5           # s, moving average of the activity
+SEARCH_WINDOW = 10.0   # s, offsets searched in [-w, +w] (or a (min, max) tuple)
+MIN_OVERLAP = 0.5      # minimum overlap of the two signals, fraction of the shorter one
+SEGMENT = 60.0         # s, segment length for the drift estimate
+EXCLUDE = 2.0          # s, lags this close to the peak do not count as rival peaks
+
+
+def activity(t, values, t_end=None, rate=RATE, smooth=SMOOTH, derivative=True):
+    """
+    Motion activity on the grid 0, 1/rate, ... t_end of the stream's own
+    clock, standardized. derivative=True: norm of the rate of change
+    (positions, magnetic field); False: norm of the deviation from the
+    median (acceleration).
+
+    Streams denser than the grid are averaged per grid cell first, so sensor
+    noise does not alias into the derivative. The activity is compared on a
+    log scale: how strongly the field reacts to motion depends on the local
+    gradient, when the phone moves or rests does not.
+    """
+    t = np.asarray(t, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).reshape(len(t), -1)
+    t_end = t[-1] if t_end is None else t_end
+    grid = np.arange(0.0, t_end, 1.0 / rate)
+
+    if len(t) > 2 * len(grid):
+        cell = np.floor(t * rate).astype(np.int64)
+        ok = (cell >= 0) & (cell < len(grid))
+        count = np.bincount(cell[ok], minlength=len(grid))
+        sums = np.column_stack([np.bincount(cell[ok], values[ok, k], len(grid)) for k in range(values.shape[1])])
+        filled = count > 0
+        t, values = (np.flatnonzero(filled) + 0.5) / rate, sums[filled] / count[filled, None]
+    y = Alignment(t, grid).linear(values)
+
+    if derivative:
+        a = np.linalg.norm(np.gradient(y, axis=0), axis=1) * rate
+    else:
+        a = np.linalg.norm(y - np.median(y, axis=0), axis=1)
+
+    k = max(int(round(smooth * rate)), 1)
+    if k > 1:
+        c = np.concatenate(([0.0], np.cumsum(a)))
+        lo = np.clip(np.arange(len(a)) - k // 2, 0, len(a))
+        hi = np.clip(lo + k, 0, len(a))
+        a = (c[hi] - c[lo]) / (hi - lo)
+
+    a = np.log(a + 0.1 * np.median(a) + 1e-12)
+    std = a.std()
+    return (a - a.mean()) / std if std > 0 else a - a.mean()
+
+
+def _window_lags(window, rate):
+    if np.isscalar(window):
+        window = (-window, window)
+    return int(np.floor(window[0] * rate)), int(np.ceil(window[1] * rate))
+
+
+def xcorr_peak(a, b, rate=RATE, window=SEARCH_WINDOW, min_overlap=MIN_OVERLAP, exclude=EXCLUDE):
+    """
+    Lag (s) at which b best matches a, i.e. b[i + lag * rate] ~ a[i].
+    The cross-correlation comes from one FFT product; every lag in the window
+    is normalized to the Pearson correlation over the overlapping samples
+    (prefix sums), so edges with little overlap are not favoured.
+
+    Returns dict(lag, correlation, confidence, lags, curve). confidence is
+    the peak correlation minus the best correlation at lags farther than
+    `exclude` from it: 0 for an ambiguous peak, up to 2.
+    """
+    na, nb = len(a), len(b)
+    k0, k1 = _window_lags(window, rate)
+    k0, k1 = max(k0, -na + 1), min(k1, nb - 1)
+    n = fft.next_fast_len(na + nb - 1, real=True)
+    c = fft.irfft(fft.rfft(b, n) * np.conj(fft.rfft(a, n)), n)
+
+    lags = np.arange(k0, k1 + 1)
+    raw = c[lags % n]
+    # Overlap a[i0:i1] with b[i0 + k:i1 + k]
+    i0 = np.maximum(0, -lags)
+    i1 = np.minimum(na, nb - lags)
+    m = i1 - i0
+    ok = m >= max(min_overlap * min(na, nb), 2)
+
+    ca = np.concatenate(([0.0], np.cumsum(a)))
+    ca2 = np.concatenate(([0.0], np.cumsum(a * a)))
+    cb = np.concatenate(([0.0], np.cumsum(b)))
+    cb2 = np.concatenate(([0.0], np.cumsum(b * b)))
+    m_safe = np.maximum(m, 1)
+    i0c, i1c = np.clip(i0, 0, na), np.clip(i1, 0, na)
+    j0c, j1c = np.clip(i0 + lags, 0, nb), np.clip(i1 + lags, 0, nb)
+    sa, sa2 = ca[i1c] - ca[i0c], ca2[i1c] - ca2[i0c]
+    sb, sb2 = cb[j1c] - cb[j0c], cb2[j1c] - cb2[j0c]
+    cov = raw - sa * sb / m_safe
+    var = (sa2 - sa * sa / m_safe) * (sb2 - sb * sb / m_safe)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        curve = np.where(ok & (var > 0), cov / np.sqrt(var), -np.inf)
+
+    if not np.isfinite(curve).any():
+        return {'lag': np.nan, 'correlation': np.nan, 'confidence': 0.0, 'lags': lags / rate, 'curve': curve}
+
+    p = int(np.argmax(curve))
+    # Parabolic refinement between the neighbouring lags
+    frac = 0.0
+    if 0 < p < len(curve) - 1 and np.isfinite(curve[p - 1]) and np.isfinite(curve[p + 1]):
+        den = curve[p - 1] - 2 * curve[p] + curve[p + 1]
+        if den < 0:
+            frac = 0.5 * (curve[p - 1] - curve[p + 1]) / den
+
+    far = np.abs(lags - lags[p]) > exclude * rate
+    rival = curve[far & np.isfinite(curve)].max(initial=-1.0)
+    return {'lag': (lags[p] + frac) / rate, 'correlation': float(curve[p]),
+            'confidence': float(curve[p] - rival), 'lags': lags / rate, 'curve': curve}
+
+
+def estimate_offset(ref, other, rate=RATE, window=SEARCH_WINDOW):
+    """Offset of `other` relative to `ref` (activity signals on the same grid)."""
+    peak = xcorr_peak(ref, other, rate, window)
+    return {'offset': peak['lag'], 'drift': 0.0, 'confidence': peak['confidence'],
+            'correlation': peak['correlation'], 'segments': 1}
+
+
+def estimate_drift(ref, other, rate=RATE, window=SEARCH_WINDOW, segment=SEGMENT, min_correlation=0.3):
+    """
+    Offset and linear drift: the offset is estimated per segment of `ref`
+    (searched around the global offset) and a line offset + drift * t is
+    fitted, weighted by the segment correlations. Falls back to the global
+    offset (drift 0) with fewer than three usable segments.
+    """
+    glob = estimate_offset(ref, other, rate, window)
+    if not np.isfinite(glob['offset']):
+        return glob
+    seg = int(segment * rate)
+    local = (glob['offset'] - SMOOTH - 1.0, glob['offset'] + SMOOTH + 1.0)
+    t_mid, offsets, weights = [], [], []
+    for s0 in range(0, len(ref) - seg + 1, seg):
+        # Segment a = ref[s0:s0 + seg] against the part of `other` it can
+        # match, b = other[b0:b1]: other[b0 + i + lag] ~ ref[s0 + i]
+        b0 = max(s0 + int(np.floor(local[0] * rate)), 0)
+        b1 = min(s0 + seg + int(np.ceil(local[1] * rate)) + 1, len(other))
+        if b1 - b0 < seg:
+            continue
+        win = (local[0] + (s0 - b0) / rate, local[1] + (s0 - b0) / rate)
+        peak = xcorr_peak(ref[s0:s0 + seg], other[b0:b1], rate, win, min_overlap=1.0)
+        if np.isfinite(peak['lag']) and peak['correlation'] >= min_correlation:
+            t_mid.append((s0 + seg / 2) / rate)
+            offsets.append(peak['lag'] + (b0 - s0) / rate)
+            weights.append(peak['correlation'])
+
+    if len(offsets) < 3:
+        return glob
+    slope, intercept = np.polyfit(t_mid, offsets, 1, w=weights)
+    # t_other - t_ref = offset + drift * t_ref
+    return {'offset': float(intercept), 'drift': float(slope), 'confidence': glob['confidence'],
+            'correlation': glob['correlation'], 'segments': len(offsets)}
+
+
+def synchronize_scan(pos_df, other_df, other_cols=('x', 'y', 'z'), time_col='Time',
+                     drift=False, derivative=True, rate=RATE, window=SEARCH_WINDOW):
+    """
+    Clock of a Phyphox stream (other_df) relative to the ultrasonic positions
+    (pos_df with Time_s, S1, S2). derivative=False for accelerometer streams.
+    """
+    ref = activity(pos_df['Time_s'], pos_df[['S1', 'S2']], rate=rate)
+    other = activity(other_df[time_col], other_df[list(other_cols)], rate=rate, derivative=derivative)
+    if drift:
+        return estimate_drift(ref, other, rate, window)
+    return estimate_offset(ref, other, rate, window)
+
+
+def main():
+    import time
+    from process_table import BASE_DIR, DATASETS, clean_positions
+    from ultrasonic_parser import parse_ultrasonic_fast
+    from phyphox_loader import load_phyphox
+
+    keys = sys.argv[1:] or list(DATASETS)
+    print(f"{'dataset':<22} {'offset (s)':>10} {'drift (ppm)':>12} {'corr':>6} {'confidence':>10} {'ms':>6}")
+    for key in keys:
+        pos_file, mag_file, name = DATASETS[key]
+        try:
+            pos_df = parse_ultrasonic_fast(os.path.join(BASE_DIR, pos_file))
+            mag_df = load_phyphox(os.path.join(BASE_DIR, mag_file))
+        except FileNotFoundError:
+            print(f"{name:<22} missing files")
+            continue
+        t0 = time.perf_counter()
+        sync = synchronize_scan(clean_positions(pos_df), mag_df, drift=True)
+        ms = (time.perf_counter() - t0) * 1e3
+        print(f"{name:<22} {sync['offset']:>10.2f} {sync['drift'] * 1e6:>12.0f} "
+              f"{sync['correlation']:>6.2f} {sync['confidence']:>10.2f} {ms:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
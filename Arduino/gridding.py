@@ -0,0 +1,119 @@
+import numpy as np
+from scipy.interpolate import griddata
+from scipy.spatial import cKDTree
+
+from kriging import krige
+
+
+# --- Backends ---
+# Every backend maps scattered (x, y, z) samples onto the meshgrid (xi, yi)
+# and returns an array shaped like xi, with NaN where it has no estimate.
+
+def _grid_linear(x, y, z, xi, yi):
+    """Delaunay-linear interpolation (the original griddata path)."""
+    return griddata((x, y), z, (xi, yi), method='linear')
+
+
+def _bin_index(x, y, xi, yi):
+    """
+    Cell index of every sample for a regular meshgrid. Cells are centred on
+    the grid nodes; samples more than half a cell outside the grid get -1.
+    """
+    ax = xi[0, :]
+    ay = yi[:, 0]
+    nx, ny = len(ax), len(ay)
+    dx = (ax[-1] - ax[0]) / max(nx - 1, 1) or 1.0
+    dy = (ay[-1] - ay[0]) / max(ny - 1, 1) or 1.0
+    ix = np.floor((np.asarray(x, float) - ax[0]) / dx + 0.5).astype(np.int64)
+    iy = np.floor((np.asarray(y, float) - ay[0]) / dy + 0.5).astype(np.int64)
+    inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+    return np.where(inside, iy * nx + ix, -1)
+
+
+def _grid_bin_mean(x, y, z, xi, yi):
+    """O(n) binned mean via histogram-style accumulation."""
+    cell = _bin_index(x, y, xi, yi)
+    keep = cell >= 0
+    cell, z = cell[keep], np.asarray(z, float)[keep]
+    counts = np.bincount(cell, minlength=xi.size)
+    sums = np.bincount(cell, weights=z, minlength=xi.size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zi = sums / counts
+    return zi.reshape(xi.shape)
+
+
+def _grid_bin_median(x, y, z, xi, yi):
+    """Binned median; one sort of all samples by (cell, value)."""
+    cell = _bin_index(x, y, xi, yi)
+    keep = cell >= 0
+    cell, z = cell[keep], np.asarray(z, float)[keep]
+    order = np.lexsort((z, cell))
+    cell, z = cell[order], z[order]
+
+    counts = np.bincount(cell, minlength=xi.size)
+    start = np.cumsum(counts) - counts
+    occupied = counts > 0
+    c, s = counts[occupied], start[occupied]
+    zi = np.full(xi.size, np.nan)
+    zi[occupied] = 0.5 * (z[s + (c - 1) // 2] + z[s + c // 2])
+    return zi.reshape(xi.shape)
+
+
+def _grid_idw(x, y, z, xi, yi, k=8, power=2.0, max_distance=np.inf, block_size=65536, workers=-1):
+    """
+    k-nearest-neighbour inverse-distance weighting on a cKDTree. Targets are
+    queried in blocks, so memory stays at block_size * k regardless of grid size.
+    """
+    pts = np.column_stack((np.asarray(x, float), np.asarray(y, float)))
+    z = np.asarray(z, float)
+    k = min(k, len(z))
+    tree = cKDTree(pts)
+    targets = np.column_stack((xi.ravel(), yi.ravel()))
+    zi = np.full(len(targets), np.nan)
+
+    for start in range(0, len(targets), block_size):
+        block = targets[start:start + block_size]
+        dist, idx = tree.query(block, k=k, distance_upper_bound=max_distance, workers=workers)
+        if k == 1:
+            dist, idx = dist[:, None], idx[:, None]
+        valid = np.isfinite(dist)
+        idx = np.where(valid, idx, 0)
+        with np.errstate(divide='ignore'):
+            w = np.where(valid, 1.0 / dist ** power, 0.0)
+        # Exact hits take the sample value
+        exact = dist == 0
+        hit = exact.any(axis=1)
+        w[hit] = exact[hit]
+        wsum = w.sum(axis=1)
+        with np.errstate(invalid='ignore'):
+            zi[start:start + len(block)] = (w * z[idx]).sum(axis=1) / wsum
+    return zi.reshape(xi.shape)
+
+
+def _grid_kriging(x, y, z, xi, yi, **options):
+    """
+    Local ordinary kriging (kriging.py): fills the whole grid, also outside
+    the convex hull. The variance map comes from kriging.krige directly.
+    """
+    return krige(x, y, z, xi, yi, **options)[0]
+
+
+BACKENDS = {
+    'linear': _grid_linear,
+    'bin_mean': _grid_bin_mean,
+    'bin_median': _grid_bin_median,
+    'idw': _grid_idw,
+    'kriging': _grid_kriging,
+}
+
+
+def grid_map(x, y, z, xi, yi, method='linear', **options):
+    """
+    Grids scattered samples onto the meshgrid (xi, yi) with the selected
+    backend (see BACKENDS). Extra keyword options go to the backend, e.g.
+    grid_map(..., method='idw', k=12, power=1.5).
+    """
+    if method not in BACKENDS:
+        raise ValueError(f"Unknown gridding method '{method}', choose from {sorted(BACKENDS)}")
+    x, y, z = (np.asarray(v, float) for v in (x, y, z))
+    return BACKENDS[method](x, y, z, np.asarray(xi, float), np.asarray(yi, float), **options)
@@ -2,105 +2,27 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.widgets import Slider
-from scipy.signal import butter, filtfilt
 import tkinter as tk
+from scrub_view import BlitManager, LodScatter, MinMaxTrace
+import os
+import sys
 
-def trajectory_heatmap_slider():
-    # --- CONFIGURATION ---
-    WINDOW_1_W_PCT = 0.5  
-    WINDOW_2_W_PCT = 0.4  
-    WINDOW_H_PCT = 0.8
-    # ---------------------
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from dead_reckoning import detrend_endpoints, integrate_filtered, reckon_stream
+from time_align import Alignment
+from stage_timer import from_env, stage
 
-    print("1. Loading Data...")
-    try:
-        # Load Linear Acceleration
-        df_lin = pd.read_csv('Linear Acceleration.csv')
-        t_col = [c for c in df_lin.columns if 'Time' in c][0]
-        x_col = [c for c in df_lin.columns if 'x' in c and 'Acceleration' in c][0]
-        y_col = [c for c in df_lin.columns if 'y' in c and 'Acceleration' in c][0]
-        
-        t = df_lin[t_col].values
-        ax = df_lin[x_col].values
-        ay = df_lin[y_col].values
-        
-        # Load Magnetometer
-        try:
-            df_mag = pd.read_csv('Magnetometer.csv')
-            mag_t_col = [c for c in df_mag.columns if 'Time' in c][0]
-            mag_x_col = [c for c in df_mag.columns if 'x' in c and 'field' in c][0]
-            mag_y_col = [c for c in df_mag.columns if 'y' in c and 'field' in c][0]
-            mag_z_col = [c for c in df_mag.columns if 'z' in c and 'field' in c][0]
-            
-            mag_x = np.interp(t, df_mag[mag_t_col], df_mag[mag_x_col])
-            mag_y = np.interp(t, df_mag[mag_t_col], df_mag[mag_y_col])
-            mag_z = np.interp(t, df_mag[mag_t_col], df_mag[mag_z_col])
-            
-            mag_intensity = np.sqrt(mag_x**2 + mag_y**2 + mag_z**2)
-            has_mag = True
-            print("   Magnetometer loaded.")
-        except:
-            mag_intensity = t
-            has_mag = False
-            
-    except Exception as e:
-        print(f"   Error: {e}")
-        return
-
-    # --- PHYSICS ENGINE ---
-    dt = np.mean(np.diff(t))
-    fs = 1 / dt
-    
-    def lowpass_filter(data, cutoff, fs, order=4):
-        nyquist = 0.5 * fs
-        normal_cutoff = cutoff / nyquist
-        b, a = butter(order, normal_cutoff, btype='low', analog=False)
-        return filtfilt(b, a, data)
-
-    # Filter
-    CUTOFF = 2.0 # Hz
-    ax_filt = lowpass_filter(ax, CUTOFF, fs)
-    ay_filt = lowpass_filter(ay, CUTOFF, fs)
-    
-    # Detrend
-    def detrend_signal(signal):
-        drift = np.linspace(signal[0], signal[-1], len(signal))
-        return signal - drift
-
-    # Integrate
-    vx_raw = np.cumsum(ax_filt * dt)
-    vy_raw = np.cumsum(ay_filt * dt)
-    
-    vx_clean = detrend_signal(vx_raw)
-    vy_clean = detrend_signal(vy_raw)
-    
-    # Velocity Threshold
-    VEL_THRESHOLD = 0.02 
-    vx_clean[np.abs(vx_clean) < VEL_THRESHOLD] = 0
-    vy_clean[np.abs(vy_clean) < VEL_THRESHOLD] = 0
-    
-    # Position
-    px = np.cumsum(vx_clean * dt)
-    py = np.cumsum(vy_clean * dt)
-    if (input("Detrend position? (y/n): ").lower() == 'y'):
-        px = detrend_signal(px)
-        py = detrend_signal(py)
-
-    # --- PLOT SETUP ---
-    print("2. Opening Interactive Windows...")
-    
-    try:
-        root = tk.Tk()
-        screen_w = root.winfo_screenwidth()
-        screen_h = root.winfo_screenheight()
-        root.destroy()
-        dpi = 100
-    except:
-        screen_w, screen_h = 1920, 1080
-        dpi = 100
+# 'batch' (filtfilt + detrend over the whole recording) or 'stream' (causal, see dead_reckoning.py)
+INTEGRATION = 'batch'
 
+def build_scrub_view(t, px, py, mag_intensity, vx_clean, vy_clean, ax_filt, ay_filt,
+                     map_size=(9.6, 8.6), graphs_size=(7.7, 8.6), dpi=100):
+    """
+    Creates the trajectory map and the four physics graphs with the time-scrub
+    slider. Returns the figures, the slider and its update callback.
+    """
     # --- WINDOW 1: MAP ---
-    fig_map = plt.figure(num="Trajectory Map", figsize=(screen_w*WINDOW_1_W_PCT/dpi, screen_h*WINDOW_H_PCT/dpi), dpi=dpi)
+    fig_map = plt.figure(num="Trajectory Map", figsize=map_size, dpi=dpi)
     plt.subplots_adjust(bottom=0.15)
     ax_map = fig_map.add_subplot(111)
     
@@ -118,14 +40,15 @@ def trajectory_heatmap_slider():
     ax_map.set_xlabel("X (m)")
     ax_map.set_ylabel("Y (m)")
     
-    heatmap = ax_map.scatter(px, py, c=mag_intensity, cmap='plasma', s=30, alpha=0.6, label='Magnetic Field')
+    # Level-of-detail scatter: at most one marker per marker-sized screen cell
+    heatmap = LodScatter(ax_map, px, py, mag_intensity, cmap='plasma', s=30, alpha=0.6, label='Magnetic Field').collection
     point_path, = ax_map.plot([], [], marker='o', color='lime', markersize=14, markeredgecolor='black')
     
     cbar = plt.colorbar(heatmap, ax=ax_map)
     cbar.set_label('Magnetic Field (µT)')
 
     # --- WINDOW 2: GRAPHS ---
-    fig_graphs = plt.figure(num="Physics Data", figsize=(screen_w*WINDOW_2_W_PCT/dpi, screen_h*WINDOW_H_PCT/dpi), dpi=dpi)
+    fig_graphs = plt.figure(num="Physics Data", figsize=graphs_size, dpi=dpi)
     plt.subplots_adjust(bottom=0.15, hspace=0.4)
     
     # 4 Subplots: Vel X, Vel Y, Acc X, Acc Y
@@ -141,7 +64,7 @@ def trajectory_heatmap_slider():
     ax_vx.set_ylim(np.min(vx_clean), np.max(vx_clean))
     line_vx, = ax_vx.plot([], [], color='orange', linewidth=2)
     point_vx, = ax_vx.plot([], [], marker='o', color='red', markersize=5)
-    ax_vx.plot(t, vx_clean, color='orange', alpha=0.2) 
+    bg_vx, = ax_vx.plot([], [], color='orange', alpha=0.2) 
 
     # Graph 2: Velocity Y
     ax_vy.set_title("Velocity Y (m/s)")
@@ -150,7 +73,7 @@ def trajectory_heatmap_slider():
     ax_vy.set_ylim(np.min(vy_clean), np.max(vy_clean))
     line_vy, = ax_vy.plot([], [], color='green', linewidth=2)
     point_vy, = ax_vy.plot([], [], marker='o', color='red', markersize=5)
-    ax_vy.plot(t, vy_clean, color='green', alpha=0.2)
+    bg_vy, = ax_vy.plot([], [], color='green', alpha=0.2)
 
     # Graph 3: Acceleration X (Filtered)
     ax_ax.set_title("Acceleration X (m/s²)")
@@ -159,7 +82,7 @@ def trajectory_heatmap_slider():
     ax_ax.set_ylim(np.min(ax_filt), np.max(ax_filt))
     line_ax, = ax_ax.plot([], [], color='purple', linewidth=1.5)
     point_ax, = ax_ax.plot([], [], marker='o', color='red', markersize=5)
-    ax_ax.plot(t, ax_filt, color='purple', alpha=0.2)
+    bg_ax, = ax_ax.plot([], [], color='purple', alpha=0.2)
 
     # Graph 4: Acceleration Y (Filtered)
     ax_ay.set_title("Acceleration Y (m/s²)")
@@ -168,9 +91,19 @@ def trajectory_heatmap_slider():
     ax_ay.set_ylim(np.min(ay_filt), np.max(ay_filt))
     line_ay, = ax_ay.plot([], [], color='teal', linewidth=1.5)
     point_ay, = ax_ay.plot([], [], marker='o', color='red', markersize=5)
-    ax_ay.plot(t, ay_filt, color='teal', alpha=0.2)
+    bg_ay, = ax_ay.plot([], [], color='teal', alpha=0.2)
     ax_ay.set_xlabel("Time (s)")
 
+    # Min/max decimation to the pixel width of the graphs
+    bg_lines = [bg_vx, bg_vy, bg_ax, bg_ay]
+    traces = []
+    def decimate(_event=None):
+        n_bins = int(ax_vx.bbox.width)
+        traces[:] = [MinMaxTrace(t, v, n_bins) for v in (vx_clean, vy_clean, ax_filt, ay_filt)]
+        for bg_line, trace in zip(bg_lines, traces):
+            bg_line.set_data(*trace.full())
+    decimate()
+
     # --- SLIDER SETUP ---
     ax_slider = plt.axes([0.2, 0.02, 0.6, 0.03], facecolor='lightgoldenrodyellow')
     total_frames = len(t) - 1
@@ -184,32 +117,124 @@ def trajectory_heatmap_slider():
         valstep=1
     )
 
+    # Blitting: only the cursor artists and the slider are redrawn per tick
+    slider.drawon = False
+    blit_map = BlitManager(fig_map.canvas, [point_path])
+    blit_graphs = BlitManager(fig_graphs.canvas,
+                              [line_vx, point_vx, line_vy, point_vy, line_ax, point_ax, line_ay, point_ay, ax_slider])
+    fig_graphs.canvas.mpl_connect('resize_event', decimate)
+
     def update(val):
         idx = int(slider.val)
-        current_t = t[:idx]
         
         # Window 1 Update
         point_path.set_data([px[idx]], [py[idx]])
         
         # Window 2 Update
-        line_vx.set_data(current_t, vx_clean[:idx])
-        point_vx.set_data([t[idx]], [vx_clean[idx]])
+        for line, point, trace in ((line_vx, point_vx, traces[0]), (line_vy, point_vy, traces[1]),
+                                   (line_ax, point_ax, traces[2]), (line_ay, point_ay, traces[3])):
+            line.set_data(*trace.prefix(idx))
+            point.set_data([t[idx]], [trace.y[idx]])
         
-        line_vy.set_data(current_t, vy_clean[:idx])
-        point_vy.set_data([t[idx]], [vy_clean[idx]])
-        
-        line_ax.set_data(current_t, ax_filt[:idx])
-        point_ax.set_data([t[idx]], [ax_filt[idx]])
+        blit_map.update()
+        blit_graphs.update()
+
+    slider.on_changed(update)
+    return {'fig_map': fig_map, 'fig_graphs': fig_graphs, 'slider': slider, 'update': update}
+
+def trajectory_heatmap_slider():
+    # --- CONFIGURATION ---
+    WINDOW_1_W_PCT = 0.5  
+    WINDOW_2_W_PCT = 0.4  
+    WINDOW_H_PCT = 0.8
+    # ---------------------
+
+    print("1. Loading Data...")
+    try:
+        # Load Linear Acceleration
+        with stage('load_acceleration') as st:
+            df_lin = pd.read_csv('Linear Acceleration.csv')
+            st.samples = len(df_lin)
+        t_col = [c for c in df_lin.columns if 'Time' in c][0]
+        x_col = [c for c in df_lin.columns if 'x' in c and 'Acceleration' in c][0]
+        y_col = [c for c in df_lin.columns if 'y' in c and 'Acceleration' in c][0]
         
-        line_ay.set_data(current_t, ay_filt[:idx])
-        point_ay.set_data([t[idx]], [ay_filt[idx]])
+        t = df_lin[t_col].values
+        ax = df_lin[x_col].values
+        ay = df_lin[y_col].values
         
-        fig_map.canvas.draw_idle()
-        fig_graphs.canvas.draw_idle()
+        # Load Magnetometer
+        try:
+            with stage('load_magnetometer') as st:
+                df_mag = pd.read_csv('Magnetometer.csv')
+                st.samples = len(df_mag)
+            mag_t_col = [c for c in df_mag.columns if 'Time' in c][0]
+            mag_x_col = [c for c in df_mag.columns if 'x' in c and 'field' in c][0]
+            mag_y_col = [c for c in df_mag.columns if 'y' in c and 'field' in c][0]
+            mag_z_col = [c for c in df_mag.columns if 'z' in c and 'field' in c][0]
+            
+            # Magnetometer onto the acceleration timestamps (np.interp semantics, one search)
+            with stage('align', len(t)):
+                mag_xyz = Alignment(df_mag[mag_t_col].to_numpy(), t).linear(
+                    df_mag[[mag_x_col, mag_y_col, mag_z_col]].to_numpy())
+                mag_x, mag_y, mag_z = mag_xyz.T
+                
+                mag_intensity = np.sqrt(mag_x**2 + mag_y**2 + mag_z**2)
+            has_mag = True
+            print("   Magnetometer loaded.")
+        except:
+            mag_intensity = t
+            has_mag = False
+            
+    except Exception as e:
+        print(f"   Error: {e}")
+        return
 
-    slider.on_changed(update)
+    # --- PHYSICS ENGINE ---
+    dt = np.mean(np.diff(t))
+
+    CUTOFF = 2.0 # Hz
+    VEL_THRESHOLD = 0.02 
+    with stage('integrate', len(t)):
+        if INTEGRATION == 'stream':
+            # Causal: sosfilt low-pass, running integration, zero-velocity updates
+            acc_filt, vel, pos, _ = reckon_stream(np.column_stack((ax, ay)), dt, cutoff=CUTOFF,
+                                                  vel_threshold=VEL_THRESHOLD)
+            ax_filt, ay_filt = acc_filt.T
+            vx_clean, vy_clean = vel.T
+            px, py = pos.T
+        else:
+            # filtfilt low-pass, integration, endpoint detrend, velocity threshold
+            ax_filt, vx_clean, px = integrate_filtered(ax, dt, CUTOFF, VEL_THRESHOLD)
+            ay_filt, vy_clean, py = integrate_filtered(ay, dt, CUTOFF, VEL_THRESHOLD)
+    if (input("Detrend position? (y/n): ").lower() == 'y'):
+        with stage('detrend', len(t)):
+            px = detrend_endpoints(px)
+            py = detrend_endpoints(py)
+
+    # --- PLOT SETUP ---
+    print("2. Opening Interactive Windows...")
     
+    try:
+        root = tk.Tk()
+        screen_w = root.winfo_screenwidth()
+        screen_h = root.winfo_screenheight()
+        root.destroy()
+        dpi = 100
+    except:
+        screen_w, screen_h = 1920, 1080
+        dpi = 100
+
+    # --- WINDOWS ---
+    with stage('build_view', len(t)):
+        view = build_scrub_view(
+            t, px, py, mag_intensity, vx_clean, vy_clean, ax_filt, ay_filt,
+            map_size=(screen_w*WINDOW_1_W_PCT/dpi, screen_h*WINDOW_H_PCT/dpi),
+            graphs_size=(screen_w*WINDOW_2_W_PCT/dpi, screen_h*WINDOW_H_PCT/dpi),
+            dpi=dpi)
+
     plt.show()
 
 if __name__ == "__main__":
+    from_env('heatmap')
     trajectory_heatmap_slider()
\ No newline at end of file
@@ -0,0 +1,225 @@
+import numpy as np
+from scipy.spatial import Delaunay, QhullError
+
+BARY_EPS = 1e-10        # tolerance for cells on triangle edges
+MAX_PAIR_TESTS = 2e7    # point x circle tests per block
+
+
+class IncrementalGrid:
+    """
+    Linear (Delaunay) interpolation onto a fixed grid that is updated in place
+    as new (S1, S2, B_abs) samples arrive, matching griddata(...,
+    method='linear') on all samples seen so far. Samples at an already seen
+    position are merged into the mean of that position (griddata would keep
+    an arbitrary one of them, depending on the input order).
+
+    Every triangle created by inserting points is incident to one of them and
+    together these triangles cover everything the insertion changed; the same
+    holds for the triangles around a point whose mean changed. Each batch is
+    therefore triangulated locally, in a window around the new and updated
+    points, and only the cells under the new triangles are re-evaluated. A
+    local triangle is accepted once its circumcircle is known to be empty of
+    all other samples; otherwise the window grows until it is.
+    """
+
+    def __init__(self, xlim, ylim, shape=(300, 300)):
+        ny, nx = shape
+        self.xi = np.linspace(xlim[0], xlim[1], nx)
+        self.yi = np.linspace(ylim[0], ylim[1], ny)
+        self.zi = np.full(shape, np.nan)
+        self._points = np.empty((0, 2))
+        self._sums = np.empty(0)
+        self._counts = np.empty(0)
+        self._index = {}           # position -> row in _points
+        self._built = False
+        self.last_window_points = 0
+
+    @property
+    def n_samples(self):
+        return int(self._counts.sum())
+
+    def meshgrid(self):
+        return np.meshgrid(self.xi, self.yi)
+
+    def add_samples(self, x, y, z):
+        """Adds a batch of samples and returns the number of refreshed cells."""
+        new_pts = np.column_stack((np.asarray(x, float), np.asarray(y, float)))
+        new_vals = np.asarray(z, float)
+        if len(new_vals) == 0:
+            return 0
+
+        # Repeated positions (within the batch or seen before) share one point
+        uniq, inv = np.unique(new_pts, axis=0, return_inverse=True)
+        rows = np.array([self._index.setdefault(tuple(p), len(self._index)) for p in uniq.tolist()])
+        n_old = len(self._points)
+        added = rows >= n_old
+        self._points = np.concatenate((self._points, uniq[added]))
+        self._sums = np.concatenate((self._sums, np.zeros(added.sum())))
+        self._counts = np.concatenate((self._counts, np.zeros(added.sum())))
+        np.add.at(self._sums, rows[inv.ravel()], new_vals)
+        np.add.at(self._counts, rows[inv.ravel()], 1)
+
+        if not self._built:
+            try:
+                tri = Delaunay(self._points)
+            except (QhullError, ValueError):
+                # Fewer than 3 non-collinear points so far
+                return 0
+            self._built = True
+            self.last_window_points = len(self._points)
+            return self._rasterize(tri.simplices)
+
+        touched = np.zeros(len(self._points), dtype=bool)
+        touched[rows] = True
+        local_idx, simplices = self._local_triangles(touched)
+        return self._rasterize(local_idx[simplices])
+
+    # --- Local re-triangulation ---
+    def _local_triangles(self, touched):
+        """Triangles incident to the new or updated points (mask touched)."""
+        pts = self._points
+        new_pts = pts[touched]
+        all_lo, all_hi = pts.min(axis=0), pts.max(axis=0)
+        # Start with a window a few average sample spacings around the batch
+        spacing = np.sqrt(np.prod(all_hi - all_lo + 1e-9) / len(pts))
+        lo = np.maximum(new_pts.min(axis=0) - 4 * spacing, all_lo)
+        hi = np.minimum(new_pts.max(axis=0) + 4 * spacing, all_hi)
+
+        while True:
+            inside = np.all((pts >= lo) & (pts <= hi), axis=1)
+            local_idx = np.nonzero(inside)[0]
+            full = np.all(lo <= all_lo) and np.all(hi >= all_hi)
+            try:
+                tri = Delaunay(pts[local_idx])
+            except (QhullError, ValueError):
+                if full:
+                    raise
+                # Window holds only collinear samples (part of one scan line): grow it
+                size = hi - lo
+                lo, hi = np.maximum(lo - size, all_lo), np.minimum(hi + size, all_hi)
+                continue
+            is_new = touched[local_idx]
+            simplices = tri.simplices[is_new[tri.simplices].any(axis=1)]
+            # Zero-area triangles (collinear corners) cover no cell and have no circumcircle
+            simplices = simplices[~_flat(tri.points[simplices])]
+            self.last_window_points = len(local_idx)
+
+            if full:
+                # Window holds every sample: this is the global triangulation
+                return local_idx, simplices
+
+            outside = pts[~inside]
+            grow_lo, grow_hi = self._uncertified_extent(tri, simplices, is_new, outside,
+                                                        lo, hi, all_lo, all_hi)
+            if grow_lo is None:
+                return local_idx, simplices
+            lo = np.minimum(lo, np.maximum(grow_lo, all_lo))
+            hi = np.maximum(hi, np.minimum(grow_hi, all_hi))
+
+    def _uncertified_extent(self, tri, simplices, is_new, outside, lo, hi, all_lo, all_hi):
+        """
+        Returns the bounding box the window must grow to, or (None, None) if
+        all triangles touching new points are also global Delaunay triangles.
+        """
+        # 1. Circumcircles: empty of samples outside the window?
+        center, radius = _circumcircles(tri.points[simplices])
+        c_lo = np.maximum(center - radius[:, None], all_lo)
+        c_hi = np.minimum(center + radius[:, None], all_hi)
+        unsure = ~(np.all(c_lo >= lo, axis=1) & np.all(c_hi <= hi, axis=1))
+        offending = np.zeros(len(outside), dtype=bool)
+        if unsure.any():
+            cand = np.nonzero(unsure)[0]
+            # Only samples inside the circles' joint bounding box can violate
+            near = np.nonzero(np.all((outside >= c_lo[cand].min(axis=0)) &
+                                     (outside <= c_hi[cand].max(axis=0)), axis=1))[0]
+            n_parts = int(len(cand) * len(near) // MAX_PAIR_TESTS) + 1
+            for part in np.array_split(cand, n_parts):
+                dx = outside[near, 0] - center[part, 0, None]
+                dy = outside[near, 1] - center[part, 1, None]
+                inside_circle = dx * dx + dy * dy < (radius[part, None] ** 2) * (1 - 1e-12)
+                offending[near] |= inside_circle.any(axis=0)
+
+        # 2. Local hull edges at new points: global samples beyond them would
+        #    add triangles the local triangulation does not know about
+        hull = tri.convex_hull
+        hull = hull[is_new[hull].any(axis=1)]
+        if len(hull) and len(outside):
+            a = tri.points[hull[:, 0]]
+            b = tri.points[hull[:, 1]]
+            # Orient every edge so the local samples lie on its left side
+            centroid = tri.points.mean(axis=0)
+            flip = _cross(b - a, centroid - a) < 0
+            a[flip], b[flip] = b[flip], a[flip].copy()
+            for k in range(len(a)):
+                offending |= _cross(b[k] - a[k], outside - a[k]) < 0
+
+        if not offending.any():
+            return None, None
+        # Grow towards the offending samples, at most doubling the window
+        size = hi - lo
+        return (np.maximum(outside[offending].min(axis=0), lo - size),
+                np.minimum(outside[offending].max(axis=0), hi + size))
+    # --- Grid evaluation ---
+    def _rasterize(self, simplices):
+        """Evaluates the linear interpolant on all cells covered by the triangles."""
+        simplices = simplices[~_flat(self._points[simplices])]
+        if len(simplices) == 0:
+            return 0
+        corners = self._points[simplices]
+        vals = self._sums[simplices] / self._counts[simplices]
+        i0 = np.searchsorted(self.xi, corners[:, :, 0].min(axis=1), 'left')
+        i1 = np.searchsorted(self.xi, corners[:, :, 0].max(axis=1), 'right')
+        j0 = np.searchsorted(self.yi, corners[:, :, 1].min(axis=1), 'left')
+        j1 = np.searchsorted(self.yi, corners[:, :, 1].max(axis=1), 'right')
+        w = np.maximum(i1 - i0, 0)
+        area = w * np.maximum(j1 - j0, 0)
+        keep = area > 0
+        if not keep.any():
+            return 0
+        corners, vals, i0, j0, w, area = corners[keep], vals[keep], i0[keep], j0[keep], w[keep], area[keep]
+
+        # One (triangle, cell) pair per cell of every triangle's bounding box
+        tid = np.repeat(np.arange(len(area)), area)
+        k = np.arange(len(tid)) - np.repeat(np.cumsum(area) - area, area)
+        ii = i0[tid] + k % w[tid]
+        jj = j0[tid] + k // w[tid]
+
+        a = corners[:, 0]
+        e1 = corners[:, 1] - a
+        e2 = corners[:, 2] - a
+        det = _cross(e1, e2)
+        dx = self.xi[ii] - a[tid, 0]
+        dy = self.yi[jj] - a[tid, 1]
+        l1 = (dx * e2[tid, 1] - dy * e2[tid, 0]) / det[tid]
+        l2 = (e1[tid, 0] * dy - e1[tid, 1] * dx) / det[tid]
+        l0 = 1 - l1 - l2
+        hit = (l0 >= -BARY_EPS) & (l1 >= -BARY_EPS) & (l2 >= -BARY_EPS)
+
+        t = tid[hit]
+        self.zi[jj[hit], ii[hit]] = l0[hit] * vals[t, 0] + l1[hit] * vals[t, 1] + l2[hit] * vals[t, 2]
+        return int(len(np.unique(jj[hit] * len(self.xi) + ii[hit])))
+
+
+def _cross(u, v):
+    return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+
+def _flat(corners):
+    """Triangles whose area is zero up to rounding (relative to their edge lengths)."""
+    e1 = corners[:, 1] - corners[:, 0]
+    e2 = corners[:, 2] - corners[:, 0]
+    scale = (e1 ** 2).sum(axis=1) + (e2 ** 2).sum(axis=1)
+    return np.abs(_cross(e1, e2)) <= 1e-12 * scale
+
+
+def _circumcircles(corners):
+    a = corners[:, 0]
+    b = corners[:, 1] - a
+    c = corners[:, 2] - a
+    d = 2 * _cross(b, c)
+    b2 = (b ** 2).sum(axis=1)
+    c2 = (c ** 2).sum(axis=1)
+    ux = (c[:, 1] * b2 - b[:, 1] * c2) / d
+    uy = (b[:, 0] * c2 - c[:, 0] * b2) / d
+    center = a + np.column_stack((ux, uy))
+    return center, np.hypot(ux, uy)
@@ -0,0 +1,233 @@
+"""
+Local ordinary kriging with a variance map. A global kriging / GP solve is
+O(n^3) in the number of samples; here every target cell is estimated from its
+k nearest samples only (cKDTree), and the small (k+1) x (k+1) kriging systems
+of a whole block of cells are solved in one batched np.linalg.solve. Blocks
+run in a thread pool, so runtime grows linearly with the number of cells and
+only logarithmically with the number of samples.
+
+The covariance model (exponential, gaussian or spherical, plus nugget) is fit
+to the empirical semivariogram of a random subsample. Neighbours are picked
+per sector (quadrants by default), so a cell between two scan lanes uses
+samples from both lanes and not just the closest one.
+
+    zi, var = krige(x, y, z, xi, yi, k=16)
+    python kriging.py 3 --png table3_kriging.png
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.optimize import curve_fit
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import pdist
+
+# --- Configuration ---
+K_NEIGHBOURS = 16
+SECTORS = 4               # neighbour quota per sector; 0 = plain k nearest
+BLOCK_SIZE = 4096         # target cells per batched solve
+VARIOGRAM_SAMPLE = 3000   # samples used for the variogram fit
+VARIOGRAM_BINS = 20
+JITTER = 1e-9             # relative diagonal regularization (duplicate positions)
+
+
+# --- Covariance models (partial sill s, range a) ---
+def _exponential(h, a):
+    return np.exp(-h / a)
+
+
+def _gaussian(h, a):
+    return np.exp(-(h / a) ** 2)
+
+
+def _spherical(h, a):
+    r = np.minimum(h / a, 1.0)
+    return 1.0 - 1.5 * r + 0.5 * r ** 3
+
+
+MODELS = {'exponential': _exponential, 'gaussian': _gaussian, 'spherical': _spherical}
+
+
+def covariance(h, model):
+    """Covariance of the noise-free field at distance h (nugget excluded)."""
+    return model['sill'] * MODELS[model['model']](h, model['range'])
+
+
+def variogram(x, y, z, bins=VARIOGRAM_BINS, max_lag=None, sample=VARIOGRAM_SAMPLE, seed=0):
+    """Empirical semivariogram (lag centres, gamma, pair counts) of a random subsample."""
+    pts = np.column_stack((np.ravel(x), np.ravel(y)))
+    z = np.asarray(z, float).ravel()
+    if len(z) > sample:
+        keep = np.random.default_rng(seed).choice(len(z), sample, replace=False)
+        pts, z = pts[keep], z[keep]
+    h = pdist(pts)
+    g = 0.5 * pdist(z[:, None], 'sqeuclidean')
+    if max_lag is None:
+        max_lag = 0.5 * h.max()
+    edges = np.linspace(0, max_lag, bins + 1)
+    b = np.digitize(h, edges) - 1
+    ok = (b >= 0) & (b < bins)
+    counts = np.bincount(b[ok], minlength=bins)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        gamma = np.bincount(b[ok], weights=g[ok], minlength=bins) / counts
+    lags = np.bincount(b[ok], weights=h[ok], minlength=bins) / np.maximum(counts, 1)
+    used = counts > 0
+    return lags[used], gamma[used], counts[used]
+
+
+def fit_variogram(x, y, z, model='exponential', **options):
+    """
+    Fits nugget, partial sill and range of the model to the empirical
+    semivariogram (Cressie weights: pair count / gamma^2, so the short lags
+    that matter for kriging dominate). Returns a model dict for krige.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown variogram model '{model}', choose from {sorted(MODELS)}")
+    lags, gamma, counts = variogram(x, y, z, **options)
+    shape = MODELS[model]
+    var = max(float(np.var(z)), 1e-12)
+
+    def semivariogram(h, nugget, sill, a):
+        return nugget + sill * (1.0 - shape(h, a))
+
+    p0 = (0.1 * var, 0.9 * var, lags.max() / 3)
+    try:
+        (nugget, sill, a), _ = curve_fit(semivariogram, lags, gamma, p0=p0,
+                                         sigma=np.maximum(gamma, 1e-12 * var) / np.sqrt(counts),
+                                         bounds=([0, 1e-12 * var, 1e-9 * lags.max()], [10 * var, 10 * var, 10 * lags.max()]))
+    except RuntimeError:
+        nugget, sill, a = p0
+    return {'model': model, 'nugget': float(nugget), 'sill': float(sill), 'range': float(a)}
+
+
+# --- Kriging ---
+def _sector_select(targets, pts, dist, idx, k, sectors):
+    """From distance-sorted candidates keep up to ceil(k / sectors) per sector, nearest first, then fill to k."""
+    d = pts[idx] - targets[:, None, :]
+    sec = (((np.arctan2(d[..., 1], d[..., 0]) + np.pi) / (2 * np.pi) * sectors).astype(np.int64)) % sectors
+    cum = np.cumsum(sec[..., None] == np.arange(sectors), axis=1, dtype=np.int16)
+    rank = np.take_along_axis(cum, sec[..., None], axis=2)[..., 0] - 1
+    keep = rank < -(-k // sectors)
+    order = np.argsort(~keep, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(dist, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+def _solve_block(tree, pts, z, targets, k, model, sectors):
+    n = len(z)
+    kq = min(n, k * sectors) if sectors else k
+    dist, idx = tree.query(targets, k=kq)
+    if kq == 1:
+        dist, idx = dist[:, None], idx[:, None]
+    if kq > k:
+        dist, idx = _sector_select(targets, pts, dist, idx, k, sectors)
+
+    # Ordinary kriging system [[C, 1], [1, 0]] [w, mu] = [c0, 1] per target
+    # Pairwise distances via complex positions (one abs instead of a 4-D sum)
+    p = pts[idx, 0] + 1j * pts[idx, 1]
+    h = np.abs(p[:, :, None] - p[:, None, :])
+    a = np.empty((len(targets), k + 1, k + 1))
+    a[:, :k, :k] = covariance(h, model)
+    diag = np.arange(k)
+    a[:, diag, diag] += model['nugget'] + JITTER * (model['sill'] + model['nugget'])
+    a[:, k, :k] = a[:, :k, k] = 1.0
+    a[:, k, k] = 0.0
+    b = np.empty((len(targets), k + 1))
+    b[:, :k] = covariance(dist, model)
+    b[:, k] = 1.0
+    sol = np.linalg.solve(a, b[..., None])[..., 0]
+    w, mu = sol[:, :k], sol[:, k]
+    mean = (w * z[idx]).sum(axis=1)
+    var = np.maximum(model['sill'] - (w * b[:, :k]).sum(axis=1) - mu, 0.0)
+    return mean, var, dist[:, 0]
+
+
+def krige(x, y, z, xi, yi, k=K_NEIGHBOURS, model=None, sectors=SECTORS, block_size=BLOCK_SIZE, workers=None,
+          max_distance=np.inf):
+    """
+    Local ordinary kriging of the samples onto the grid (xi, yi). Returns
+    (zi, var): the estimate and its kriging variance (of the noise-free field,
+    in units of z squared), both shaped like xi. model is a fit_variogram
+    dict or a model name (fit here). Cells farther than max_distance from
+    every sample are NaN.
+    """
+    x, y, z = (np.asarray(v, float).ravel() for v in (x, y, z))
+    ok = np.isfinite(x) & np.isfinite(y) & np.isfinite(z)
+    x, y, z = x[ok], y[ok], z[ok]
+    xi = np.asarray(xi, float)
+    if len(z) == 0:
+        return np.full(xi.shape, np.nan), np.full(xi.shape, np.nan)
+    if model is None or isinstance(model, str):
+        model = fit_variogram(x, y, z, model or 'exponential')
+    pts = np.column_stack((x, y))
+    tree = cKDTree(pts)
+    targets = np.column_stack((xi.ravel(), np.asarray(yi, float).ravel()))
+    k = min(k, len(z))
+    mean = np.empty(len(targets))
+    var = np.empty(len(targets))
+    nearest = np.empty(len(targets))
+
+    def run(start):
+        sl = slice(start, start + block_size)
+        mean[sl], var[sl], nearest[sl] = _solve_block(tree, pts, z, targets[sl], k, model, sectors)
+
+    starts = range(0, len(targets), block_size)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(run, starts))
+    else:
+        for s in starts:
+            run(s)
+    far = nearest > max_distance
+    mean[far] = var[far] = np.nan
+    return mean.reshape(xi.shape), var.reshape(xi.shape)
+
+
+# --- Main ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local kriging map with variance for a table scan")
+    parser.add_argument('dataset', help="process_table.DATASETS key")
+    parser.add_argument('--k', type=int, default=K_NEIGHBOURS)
+    parser.add_argument('--model', default='exponential', choices=sorted(MODELS))
+    parser.add_argument('--sectors', type=int, default=SECTORS)
+    parser.add_argument('--shape', type=int, nargs=2, default=(300, 300), metavar=('NY', 'NX'))
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--png', help="save estimate and standard deviation maps")
+    args = parser.parse_args()
+
+    import time
+    import process_table
+    merged = process_table.merge_points(args.dataset, process_table.BASE_DIR)
+    if merged is None:
+        raise SystemExit(1)
+    df, display_name = merged
+    x, y, z = df['S1'].to_numpy(), df['S2'].to_numpy(), df['B_abs'].to_numpy()
+    t0 = time.perf_counter()
+    model = fit_variogram(x, y, z, args.model)
+    print(f"Variogram ({model['model']}): nugget {model['nugget']:.3f}, sill {model['sill']:.3f}, "
+          f"range {model['range']:.2f} ({time.perf_counter() - t0:.2f} s)")
+    xi, yi = np.meshgrid(np.linspace(x.min(), x.max(), args.shape[1]), np.linspace(y.min(), y.max(), args.shape[0]))
+    t0 = time.perf_counter()
+    zi, var = krige(x, y, z, xi, yi, args.k, model, args.sectors, workers=args.workers)
+    print(f"{len(z)} samples -> {zi.size} cells in {time.perf_counter() - t0:.2f} s, "
+          f"median std {np.median(np.sqrt(var)):.3f} µT")
+
+    if args.png:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        fig, axes = plt.subplots(1, 2, figsize=(16, 6), constrained_layout=True)
+        for ax, data, label, cmap in ((axes[0], zi, 'Magnetic Field Strength (µT)', 'inferno'),
+                                      (axes[1], np.sqrt(var), 'Kriging std (µT)', 'viridis')):
+            mesh = ax.pcolormesh(xi, yi, data, cmap=cmap, shading='auto')
+            fig.colorbar(mesh, ax=ax, label=label)
+            ax.plot(x, y, ',', color='white', alpha=0.3)
+            ax.set_xlabel('Position S1 (cm)')
+            ax.set_ylabel('Position S2 (cm)')
+            ax.axis('equal')
+            ax.invert_xaxis()
+            ax.invert_yaxis()
+        fig.suptitle(f'Kriging - {display_name}')
+        fig.savefig(args.png, dpi=120)
+        print(f"Saved as {args.png}")
@@ -0,0 +1,396 @@
+"""
+NumPy filter pipeline for the ultrasonic S1/S2 tracks, same output as the
+pandas/medfilt cleaning of process_table.py (dropout and jump removal,
+running median, centered rolling mean).
+
+Every stage works on a whole track in place (apply) or incrementally on
+chunks (push/flush): a stage returns the samples whose value is final and
+keeps just enough context for the next chunk, so the streamed output equals
+the batch output for any chunk sizes.
+
+    s1, s2 = clean_tracks(pos_df['S1'].to_numpy(), pos_df['S2'].to_numpy())
+
+    filt = PositionFilter(dense=True)
+    for chunk in stream_samples(port):
+        t, s1, s2 = filt.push(chunk[:, 1], chunk[:, 2], chunk[:, 3])
+    t, s1, s2 = filt.flush()
+"""
+import numpy as np
+
+# --- Configuration ---
+DENSE_MIN_POINTS = 500   # more points than this: median 7 + mean 5, else median 3
+JUMP_THRESHOLD = 25      # cm between consecutive samples
+BLOCK = 8192             # samples per block of the median network (fits the cache)
+
+# Median selection networks: compare-exchange (i, j) puts the min on wire i
+# and the max on wire j; only the comparators that reach the middle wire are
+# kept (see _prune).
+MEDIAN_NETWORKS = {
+    5: [(0, 1), (3, 4), (0, 3), (1, 4), (1, 2), (2, 3), (1, 2)],
+    7: [(0, 5), (0, 3), (1, 6), (2, 4), (0, 1), (3, 5), (2, 6),
+        (2, 3), (3, 6), (4, 5), (1, 4), (1, 3), (3, 4)],
+}
+
+
+def _transposition_network(k):
+    # Odd-even transposition sort, valid for any k
+    return [(i, i + 1) for r in range(k) for i in range(r % 2, k - 1, 2)]
+
+
+def _prune(network, k):
+    """Keeps the comparators the middle wire depends on, and which of their outputs are needed."""
+    needed = {k // 2}
+    ops = []
+    for i, j in reversed(network):
+        need_min, need_max = i in needed, j in needed
+        if need_min or need_max:
+            ops.append((i, j, need_min, need_max))
+            needed |= {i, j}
+    return ops[::-1]
+
+
+def median_ops(k):
+    return _prune(MEDIAN_NETWORKS.get(k) or _transposition_network(k), k)
+
+
+def median_valid(p, k, out=None, ops=None):
+    """
+    Running median of width k over p without padding: out[i] = median(p[i:i + k]),
+    len(out) = len(p) - k + 1. The network runs on shifted views of p, block by
+    block, with a fixed pool of scratch buffers.
+    """
+    m = len(p) - k + 1
+    if out is None:
+        out = np.empty(max(m, 0))
+    if m <= 0:
+        return out
+    ops = median_ops(k) if ops is None else ops
+    pool = [np.empty(min(BLOCK, m)) for _ in range(k + 2)]
+    for s in range(0, m, BLOCK):
+        n = min(BLOCK, m - s)
+        wires = [p[s + i:s + i + n] for i in range(k)]
+        owned = [False] * k
+        free = [b[:n] for b in pool]
+        for i, j, need_min, need_max in ops:
+            a, b = wires[i], wires[j]
+            if need_min:
+                lo = free.pop()
+                np.minimum(a, b, out=lo)
+            if need_max:
+                hi = free.pop()
+                np.maximum(a, b, out=hi)
+            # Replaced wires go back to the pool only after both outputs exist
+            if need_min:
+                if owned[i]:
+                    free.append(wires[i])
+                wires[i], owned[i] = lo, True
+            if need_max:
+                if owned[j]:
+                    free.append(wires[j])
+                wires[j], owned[j] = hi, True
+        out[s:s + n] = wires[k // 2]
+    return out
+
+
+def _window_sum(p, k, out):
+    """out[i] = sum(p[i:i + k])."""
+    n = len(out)
+    np.copyto(out, p[:n])
+    for i in range(1, k):
+        out += p[i:i + n]
+    return out
+
+
+# --- Stages ---
+class Dropout:
+    """Marks sensor dropouts (value 0) as missing."""
+
+    def __init__(self, value=0.0):
+        self.value = value
+
+    def apply(self, x):
+        x[x == self.value] = np.nan
+        return x
+
+    def push(self, x):
+        return self.apply(np.array(x, dtype=np.float64))
+
+    def flush(self):
+        return np.empty(0)
+
+    def reset(self):
+        pass
+
+
+class Jumps:
+    """Marks samples that differ by more than threshold from the previous one as missing."""
+
+    def __init__(self, threshold=JUMP_THRESHOLD):
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self._prev = np.nan
+
+    def apply(self, x):
+        with np.errstate(invalid='ignore'):
+            jump = np.abs(np.diff(x)) > self.threshold
+        x[1:][jump] = np.nan
+        return x
+
+    def push(self, x):
+        x = np.array(x, dtype=np.float64)
+        if len(x) == 0:
+            return x
+        # The diff is taken on the incoming values, before any are masked
+        with np.errstate(invalid='ignore'):
+            jump = np.abs(np.diff(x, prepend=self._prev)) > self.threshold
+        self._prev = x[-1]
+        x[jump] = np.nan
+        return x
+
+    def flush(self):
+        return np.empty(0)
+
+
+class Interpolate:
+    """
+    Fills missing samples linearly over the sample number, holding the first
+    and last valid value at the edges (interpolate(limit_direction='both')).
+    Streaming holds back a trailing run of missing samples until the next
+    valid value arrives.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._pending = np.empty(0)
+        self._last = np.nan          # last valid value passed on
+        self._seen = False
+
+    def apply(self, x):
+        bad = np.isnan(x)
+        fill = np.flatnonzero(bad)
+        if 0 < len(fill) < len(x):
+            good = np.flatnonzero(~bad)
+            x[fill] = np.interp(fill, good, x[good])
+        return x
+
+    def push(self, x):
+        x = np.concatenate((self._pending, np.asarray(x, dtype=np.float64)))
+        valid = np.flatnonzero(~np.isnan(x))
+        if len(valid) == 0:
+            self._pending = x
+            return np.empty(0)
+        end = valid[-1] + 1
+        out, self._pending = x[:end], x[end:]
+        bad = np.isnan(out)
+        if bad.any():
+            if self._seen:
+                # Interpolate from the last value passed on (sample -1)
+                xp = np.concatenate(([-1.0], valid.astype(np.float64)))
+                fp = np.concatenate(([self._last], out[valid]))
+            else:
+                xp, fp = valid.astype(np.float64), out[valid]
+            out[bad] = np.interp(np.flatnonzero(bad).astype(np.float64), xp, fp)
+        self._last, self._seen = out[-1], True
+        return out
+
+    def flush(self):
+        out = np.full(len(self._pending), self._last)
+        self._pending = np.empty(0)
+        return out
+
+
+class RunningMedian:
+    """Running median of odd width k with zero padding at both ends (scipy.signal.medfilt)."""
+
+    def __init__(self, k):
+        if k % 2 == 0:
+            raise ValueError("kernel size must be odd")
+        self.k = k
+        self._ops = median_ops(k)
+        self._pad = np.empty(0)
+        self.reset()
+
+    def reset(self):
+        self._tail = np.zeros(self.k // 2)
+
+    def _padded(self, n):
+        # Reused between calls so a batch of tracks allocates it once
+        if len(self._pad) < n:
+            self._pad = np.empty(n)
+        return self._pad[:n]
+
+    def apply(self, x):
+        h = self.k // 2
+        p = self._padded(len(x) + 2 * h)
+        p[:h] = 0.0
+        p[h:h + len(x)] = x
+        p[h + len(x):] = 0.0
+        return median_valid(p, self.k, out=x, ops=self._ops)
+
+    def push(self, x):
+        p = np.concatenate((self._tail, np.asarray(x, dtype=np.float64)))
+        self._tail = p[max(len(p) - (self.k - 1), 0):]
+        return median_valid(p, self.k, ops=self._ops)
+
+    def flush(self):
+        p = np.concatenate((self._tail, np.zeros(self.k // 2)))
+        self.reset()
+        return median_valid(p, self.k, ops=self._ops)
+
+
+class CenteredMean:
+    """Centered moving average of odd width k, shortened at the ends (rolling(k, center=True, min_periods=1))."""
+
+    def __init__(self, k):
+        if k % 2 == 0:
+            raise ValueError("window size must be odd")
+        self.k = k
+        self._pad = np.empty(0)
+        self.reset()
+
+    def reset(self):
+        self._tail = np.zeros(self.k // 2)
+        self._n_in = 0      # samples received
+        self._n_out = 0     # samples returned
+
+    def _counts(self, start, m, n_total):
+        # Samples inside the window of output start .. start + m - 1
+        h = self.k // 2
+        i = np.arange(start, start + m)
+        return np.minimum(i + h, n_total - 1) - np.maximum(i - h, 0) + 1
+
+    def apply(self, x):
+        h = self.k // 2
+        n = len(x)
+        if len(self._pad) < n + 2 * h:
+            self._pad = np.empty(n + 2 * h)
+        p = self._pad[:n + 2 * h]
+        p[:h] = 0.0
+        p[h:h + n] = x
+        p[h + n:] = 0.0
+        _window_sum(p, self.k, x)
+        # Full windows except for h samples at each end
+        ends = np.r_[0:min(h, n), max(n - h, h):n]
+        end_sums = x[ends]
+        x /= self.k
+        x[ends] = end_sums / self._counts(0, n, n)[ends]
+        return x
+
+    def push(self, x):
+        x = np.asarray(x, dtype=np.float64)
+        p = np.concatenate((self._tail, x))
+        self._tail = p[max(len(p) - (self.k - 1), 0):]
+        self._n_in += len(x)
+        m = max(len(p) - self.k + 1, 0)
+        out = _window_sum(p, self.k, np.empty(m))
+        out /= self._counts(self._n_out, m, np.inf)
+        self._n_out += m
+        return out
+
+    def flush(self):
+        h = self.k // 2
+        p = np.concatenate((self._tail, np.zeros(h)))
+        m = len(p) - 2 * h      # = samples received but not yet returned
+        out = _window_sum(p, self.k, np.empty(m))
+        out /= self._counts(self._n_out, m, self._n_in)
+        self.reset()
+        return out
+
+
+class Pipeline:
+    """Stages applied in order, on whole tracks (apply) or chunk by chunk (push/flush)."""
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+
+    def apply(self, x, copy=True):
+        x = np.array(x, dtype=np.float64) if copy else x
+        for stage in self.stages:
+            x = stage.apply(x)
+        return x
+
+    def push(self, x):
+        for stage in self.stages:
+            x = stage.push(x)
+        return x
+
+    def flush(self):
+        # What a stage releases at the end still has to pass the later stages
+        x = np.empty(0)
+        for stage in self.stages:
+            x = np.concatenate((stage.push(x), stage.flush()))
+        return x
+
+    def reset(self):
+        for stage in self.stages:
+            stage.reset()
+
+
+# --- Presets (process_table.py) ---
+def smoothing(dense):
+    if dense:
+        # Standard smoothing for dense data
+        return [RunningMedian(7), CenteredMean(5)]
+    # Minimal smoothing for sparse/fast scans to preserve shape
+    return [RunningMedian(3)]
+
+
+def s1_pipeline(dense, jump_threshold=JUMP_THRESHOLD):
+    """S1: dropouts (0), jumps, smoothing."""
+    return Pipeline([Dropout(0.0), Interpolate(), Jumps(jump_threshold), Interpolate()] + smoothing(dense))
+
+
+def s2_pipeline(dense, jump_threshold=JUMP_THRESHOLD):
+    """S2: jumps, smoothing."""
+    return Pipeline([Jumps(jump_threshold), Interpolate()] + smoothing(dense))
+
+
+def clean_tracks(s1, s2, dense=None, jump_threshold=JUMP_THRESHOLD):
+    """Cleaned copies of S1 and S2; dense=None decides by the number of points."""
+    if dense is None:
+        dense = len(s1) > DENSE_MIN_POINTS
+    return s1_pipeline(dense, jump_threshold).apply(s1), s2_pipeline(dense, jump_threshold).apply(s2)
+
+
+class PositionFilter:
+    """
+    Streaming version of clean_tracks for live scans. Whether the scan is
+    dense has to be chosen up front. push returns the (t, S1, S2) rows that
+    are final in both tracks, the rest follows with later chunks or flush;
+    t can also carry several columns per sample (e.g. Run and Time_s).
+    """
+
+    def __init__(self, dense=True):
+        self.dense = dense
+        self.reset()
+
+    def reset(self):
+        self.s1 = s1_pipeline(self.dense)
+        self.s2 = s2_pipeline(self.dense)
+        self._t = None
+        self._s1 = np.empty(0)
+        self._s2 = np.empty(0)
+
+    def _take(self, s1, s2):
+        self._s1 = np.concatenate((self._s1, s1))
+        self._s2 = np.concatenate((self._s2, s2))
+        n = min(len(self._s1), len(self._s2))
+        out = self._t[:n], self._s1[:n], self._s2[:n]
+        self._t, self._s1, self._s2 = self._t[n:], self._s1[n:], self._s2[n:]
+        return out
+
+    def push(self, t, s1, s2):
+        t = np.asarray(t, dtype=np.float64)
+        self._t = t if self._t is None else np.concatenate((self._t, t))
+        return self._take(self.s1.push(s1), self.s2.push(s2))
+
+    def flush(self):
+        if self._t is None:
+            return np.empty(0), np.empty(0), np.empty(0)
+        out = self._take(self.s1.flush(), self.s2.flush())
+        self.reset()
+        return out
@@ -1,13 +1,27 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import re
 from datetime import datetime, timedelta
-from scipy.interpolate import griddata, interp1d
-from scipy.signal import medfilt
+from ultrasonic_parser import parse_ultrasonic_fast
+from gridding import grid_map
+from clock_sync import synchronize_scan
+from position_filter import DENSE_MIN_POINTS, clean_tracks
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from phyphox_loader import load_phyphox
+from time_align import Alignment
+from stage_timer import from_env, stage
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # --- Configuration ---
 FILTER_S1_THRESHOLD = 53  # cm
+GRID_METHOD = 'linear'    # 'linear', 'bin_mean', 'bin_median', 'idw' or 'kriging' (see gridding.py)
+CLOCK_SYNC = 'off'        # 'off', 'offset' or 'drift': cross-correlation clock sync (see clock_sync.py)
+SYNC_MIN_CONFIDENCE = 0.05 # minimum margin of the correlation peak over rival lags to apply it
 
 # --- File Mapping ---
 DATASETS = {
@@ -19,6 +33,7 @@ DATASETS = {
 }
 
 def parse_ultrasonic_robust(file_path):
+    # Reference implementation, kept for benchmarking parse_ultrasonic_fast
     with open(file_path, 'r') as f:
         lines = f.readlines()
         
@@ -82,100 +97,140 @@ def parse_ultrasonic_robust(file_path):
             
     return pd.DataFrame(flat_data)
 
-def process_table_measurement(selection):
+def clean_positions(pos_df):
+    """Dropout and jump removal plus adaptive smoothing of S1/S2 (in place, returned)."""
+    # 1. Clean Position Data (S1=0 dropouts, jumps) and
+    # 2. ADAPTIVE SMOOTHING BASED ON DATA DENSITY, see position_filter.py
+    n_points = len(pos_df)
+    dense = n_points > DENSE_MIN_POINTS
+    if not dense:
+        print(f"Notice: Sparse data detected ({n_points} points). Reducing smoothing.")
+    s1, s2 = clean_tracks(pos_df['S1'].to_numpy(dtype=np.float64), pos_df['S2'].to_numpy(dtype=np.float64), dense)
+    pos_df['S1'] = s1
+    pos_df['S2'] = s2
+    return pos_df
+
+def merge_points(selection, base_dir=''):
+    """
+    Parses, cleans and synchronizes one dataset. Returns (clean_df,
+    display_name) with the magnetometer rows (Time_s, x, y, z, B_abs) and
+    their positions S1/S2, or None.
+    """
     if selection not in DATASETS:
         print("Invalid selection.")
-        return
-        
+        return None
+
     pos_file, mag_file, display_name = DATASETS[selection]
     print(f"\n--- Processing {display_name} ---")
-    
+
     try:
-        pos_df = parse_ultrasonic_robust(pos_file)
-        mag_df = pd.read_csv(mag_file)
+        with stage('parse_ultrasonic') as st:
+            pos_df = parse_ultrasonic_fast(os.path.join(base_dir, pos_file))
+            st.samples = len(pos_df)
+        with stage('load_magnetometer') as st:
+            mag_df = load_phyphox(os.path.join(base_dir, mag_file))
+            st.samples = len(mag_df)
     except FileNotFoundError:
         print(f"Error: Could not find {pos_file} or {mag_file}.")
-        return
+        return None
 
-    # Clean Mag Header
-    mag_df.columns = [c.split('(')[0].strip() for c in mag_df.columns]
-    mag_df.rename(columns={'Time': 'Time_s', 'Absolute field': 'B_abs'}, inplace=True)
+    mag_df.rename(columns={'Time': 'Time_s', 'abs': 'B_abs'}, inplace=True)
     
-    # 1. Clean Position Data
-    # Fix S1=0 (Sensor Dropout)
-    pos_df['S1'] = pos_df['S1'].replace(0, np.nan)
-    pos_df['S1'] = pos_df['S1'].interpolate(method='linear', limit_direction='both')
-
-    # Remove Jumps
-    def clean_jumps(series, threshold=25):
-        diff = series.diff().abs()
-        series[diff > threshold] = np.nan
-        return series.interpolate(method='linear', limit_direction='both')
-
-    pos_df['S1'] = clean_jumps(pos_df['S1'])
-    pos_df['S2'] = clean_jumps(pos_df['S2'])
-
-    # 2. ADAPTIVE SMOOTHING BASED ON DATA DENSITY
-    n_points = len(pos_df)
-    if n_points > 500:
-        # Standard smoothing for dense data
-        pos_df['S1'] = medfilt(pos_df['S1'], kernel_size=7)
-        pos_df['S2'] = medfilt(pos_df['S2'], kernel_size=7)
-        pos_df['S1'] = pos_df['S1'].rolling(window=5, center=True, min_periods=1).mean()
-        pos_df['S2'] = pos_df['S2'].rolling(window=5, center=True, min_periods=1).mean()
-    else:
-        # Minimal smoothing for sparse/fast scans to preserve shape
-        print(f"Notice: Sparse data detected ({n_points} points). Reducing smoothing.")
-        pos_df['S1'] = medfilt(pos_df['S1'], kernel_size=3)
-        pos_df['S2'] = medfilt(pos_df['S2'], kernel_size=3)
+    with stage('clean_positions', len(pos_df)):
+        pos_df = clean_positions(pos_df)
 
     # 3. Synchronize
-    f_s1 = interp1d(pos_df['Time_s'], pos_df['S1'], kind='linear', bounds_error=False, fill_value=np.nan)
-    f_s2 = interp1d(pos_df['Time_s'], pos_df['S2'], kind='linear', bounds_error=False, fill_value=np.nan)
+    offset, drift = 0.0, 0.0
+    if CLOCK_SYNC != 'off':
+        with stage('clock_sync', len(mag_df)):
+            sync = synchronize_scan(pos_df, mag_df, time_col='Time_s', drift=CLOCK_SYNC == 'drift')
+        print(f"Clock sync: offset {sync['offset']:+.2f} s, drift {sync['drift'] * 1e6:+.0f} ppm, "
+              f"confidence {sync['confidence']:.2f} (correlation {sync['correlation']:.2f})")
+        if sync['confidence'] >= SYNC_MIN_CONFIDENCE:
+            offset, drift = sync['offset'], sync['drift']
+        else:
+            print("   Low confidence, keeping the start-time alignment.")
 
-    mag_df['S1'] = f_s1(mag_df['Time_s'])
-    mag_df['S2'] = f_s2(mag_df['Time_s'])
-    merged_df = mag_df.dropna(subset=['S1', 'S2'])
+    # One search for both sensors, NaN outside the ultrasonic time range
+    with stage('align', len(mag_df)):
+        align = Alignment(pos_df['Time_s'].to_numpy(), mag_df['Time_s'].to_numpy(), offset, drift)
+        s12 = align.linear(pos_df[['S1', 'S2']].to_numpy(), outside='nan')
+        mag_df['S1'] = s12[:, 0]
+        mag_df['S2'] = s12[:, 1]
+        merged_df = mag_df.dropna(subset=['S1', 'S2'])
 
     # 4. Filter Artifacts
-    clean_df = merged_df[merged_df['S1'] > FILTER_S1_THRESHOLD].copy()
+    with stage('filter') as st:
+        clean_df = merged_df[merged_df['S1'] > FILTER_S1_THRESHOLD].copy()
+        st.samples = len(clean_df)
     print(f"Generated {len(clean_df)} valid points.")
-
-    # 5. Plot
+    return clean_df, display_name
+
+def build_map(selection, base_dir=''):
+    """
+    Parses, cleans and synchronizes one dataset and grids it onto the
+    300x300 map. Returns (xi, yi, zi, display_name) or None.
+    """
+    merged = merge_points(selection, base_dir)
+    if merged is None:
+        return None
+    clean_df, display_name = merged
+
+    # 5. Grid
     x = clean_df['S1']
     y = clean_df['S2']
     z = clean_df['B_abs']
 
-    xi = np.linspace(x.min(), x.max(), 300)
-    yi = np.linspace(y.min(), y.max(), 300)
-    xi, yi = np.meshgrid(xi, yi)
-    zi = griddata((x, y), z, (xi, yi), method='linear')
+    with stage('grid', len(z)):
+        xi = np.linspace(x.min(), x.max(), 300)
+        yi = np.linspace(y.min(), y.max(), 300)
+        xi, yi = np.meshgrid(xi, yi)
+        zi = grid_map(x, y, z, xi, yi, method=GRID_METHOD)
+    return xi, yi, zi, display_name
 
-    plt.figure(figsize=(10, 8))
-    plt.pcolormesh(xi, yi, zi, cmap='inferno', shading='auto')
-    
-    cbar = plt.colorbar()
+def map_filename(display_name):
+    return display_name.replace(" ", "_").replace("(", "").replace(")", "").lower() + ".png"
+
+def draw_map(fig, xi, yi, zi, display_name):
+    """Draws the heat map onto fig (cleared first, so one figure can be reused)."""
+    fig.clf()
+    fig.set_size_inches(10, 8)
+    ax = fig.add_subplot(111)
+    mesh = ax.pcolormesh(xi, yi, zi, cmap='inferno', shading='auto')
+
+    cbar = fig.colorbar(mesh, ax=ax)
     cbar.set_label('Magnetic Field Strength (µT)', fontsize=12)
-    plt.title(f'Magnetic Heat Map - {display_name}', fontsize=14)
-    plt.xlabel('Position S1 (cm)', fontsize=12)
-    plt.ylabel('Position S2 (cm)', fontsize=12)
-    plt.axis('equal')
-    
+    ax.set_title(f'Magnetic Heat Map - {display_name}', fontsize=14)
+    ax.set_xlabel('Position S1 (cm)', fontsize=12)
+    ax.set_ylabel('Position S2 (cm)', fontsize=12)
+    ax.axis('equal')
+
     # Rotate 180°
-    plt.gca().invert_xaxis()
-    plt.gca().invert_yaxis()
+    ax.invert_xaxis()
+    ax.invert_yaxis()
+    return fig
+
+def process_table_measurement(selection):
+    result = build_map(selection)
+    if result is None:
+        return
+    xi, yi, zi, display_name = result
+    with stage('draw', zi.size):
+        draw_map(plt.figure(figsize=(10, 8)), xi, yi, zi, display_name)
 
     # Save Prompt
     save = input("Do you want to save this map? (y/n): ").strip().lower()
     if save in ['y', 'yes']:
-        fname = display_name.replace(" ", "_").replace("(", "").replace(")", "").lower() + ".png"
-        plt.savefig(fname)
+        fname = map_filename(display_name)
+        with stage('save'):
+            plt.savefig(fname)
         print(f"Saved as {fname}")
     
     plt.show()
 
 # --- Main ---
 if __name__ == "__main__":
+    from_env('process_table')
     print("Unified Magnetic Table Scanner")
     for key, val in DATASETS.items():
         print(f"{key}: {val[2]}")
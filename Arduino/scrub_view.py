@@ -0,0 +1,162 @@
+import numpy as np
+
+
+# --- Min/max decimation ---
+
+class MinMaxTrace:
+    """
+    Min/max decimation of a time series for a plot that is n_bins pixels wide.
+    Every time bin keeps its minimum and maximum sample (in time order), so
+    the decimated line covers exactly the same pixels as the full one.
+
+    prefix(idx) returns the decimated samples [0, idx) in O(n_bins): complete
+    bins come from the precomputed table, only the bin containing idx - 1 is
+    reduced on the fly.
+    """
+
+    def __init__(self, t, y, n_bins):
+        self.t = np.asarray(t, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        n = len(self.t)
+        self.n_bins = n_bins = max(int(n_bins), 1)
+
+        span = self.t[-1] - self.t[0] if n > 1 else 0.0
+        if span > 0:
+            b = ((self.t - self.t[0]) * (n_bins / span)).astype(np.int64)
+            self.bin = np.minimum(b, n_bins - 1)
+        else:
+            self.bin = np.zeros(n, dtype=np.int64)
+        self.start = np.searchsorted(self.bin, np.arange(n_bins + 1))
+
+        # Index of the first minimum and first maximum of every non-empty bin
+        counts = np.diff(self.start)
+        occupied = np.flatnonzero(counts)
+        s = self.start[occupied]
+        mins = np.minimum.reduceat(self.y, s) if n else np.empty(0)
+        maxs = np.maximum.reduceat(self.y, s) if n else np.empty(0)
+        i_min = self._first_match(self.y == np.repeat(mins, counts[occupied]))
+        i_max = self._first_match(self.y == np.repeat(maxs, counts[occupied]))
+        pairs = np.sort(np.column_stack((i_min, i_max)), axis=1)
+
+        self.keep = pairs.ravel()
+        # Number of kept samples before bin k (complete bins only)
+        per_bin = np.zeros(n_bins, dtype=np.int64)
+        per_bin[occupied] = 2
+        self.kept_before = np.concatenate(([0], np.cumsum(per_bin)))
+
+    def _first_match(self, hit):
+        pos = np.flatnonzero(hit)
+        _, first = np.unique(self.bin[pos], return_index=True)
+        return pos[first]
+
+    def prefix(self, idx):
+        if idx <= 0:
+            return self.t[:0], self.y[:0]
+        idx = min(idx, len(self.t))
+        k = self.bin[idx - 1]
+        sel = self.keep[:self.kept_before[k]]
+
+        lo = self.start[k]
+        part = self.y[lo:idx]
+        tail = np.unique([lo + np.argmin(part), lo + np.argmax(part), idx - 1])
+        sel = np.concatenate((sel, tail))
+        return self.t[sel], self.y[sel]
+
+    def full(self):
+        return self.prefix(len(self.t))
+
+
+# --- Level-of-detail scatter ---
+
+class LodScatter:
+    """
+    Scatter plot that never draws more than about one marker per marker-sized
+    screen cell: visible samples are binned on a grid of the marker size and
+    each occupied cell shows the mean position and mean colour value. The
+    decimation is redone for the visible region whenever the view limits
+    change, so zooming in reveals the individual samples again.
+    """
+
+    def __init__(self, ax, x, y, c, s=30, max_points=20000, **kwargs):
+        self.ax = ax
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.c = np.asarray(c, dtype=float)
+        self.s = s
+        self.max_points = max_points
+        kwargs.setdefault('vmin', np.nanmin(self.c))
+        kwargs.setdefault('vmax', np.nanmax(self.c))
+        x, y, c = self._decimate()
+        self.collection = ax.scatter(x, y, c=c, s=s, **kwargs)
+        ax.callbacks.connect('xlim_changed', self._refresh)
+        ax.callbacks.connect('ylim_changed', self._refresh)
+
+    def _decimate(self):
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        vis = (self.x >= x0) & (self.x <= x1) & (self.y >= y0) & (self.y <= y1)
+        x, y, c = self.x[vis], self.y[vis], self.c[vis]
+        if len(x) <= self.max_points:
+            return x, y, c
+
+        # Cell size = marker diameter in data units (s is in points^2)
+        bbox = self.ax.bbox
+        marker_px = max(np.sqrt(self.s) * self.ax.figure.dpi / 72.0, 1.0)
+        nx = max(int(bbox.width / marker_px), 1)
+        ny = max(int(bbox.height / marker_px), 1)
+        ix = np.minimum(((x - x0) / ((x1 - x0) or 1.0) * nx).astype(np.int64), nx - 1)
+        iy = np.minimum(((y - y0) / ((y1 - y0) or 1.0) * ny).astype(np.int64), ny - 1)
+        cell = iy * nx + ix
+
+        counts = np.bincount(cell, minlength=nx * ny)
+        occupied = counts > 0
+        n = counts[occupied]
+        return (np.bincount(cell, x, nx * ny)[occupied] / n,
+                np.bincount(cell, y, nx * ny)[occupied] / n,
+                np.bincount(cell, c, nx * ny)[occupied] / n)
+
+    def _refresh(self, _ax=None):
+        x, y, c = self._decimate()
+        self.collection.set_offsets(np.column_stack((x, y)))
+        self.collection.set_array(c)
+
+
+# --- Blitting ---
+
+class BlitManager:
+    """
+    Redraws only the animated artists on top of a cached background.
+    The background is captured after every full draw (resize, zoom). Whole
+    axes can be passed as artists too (e.g. a slider, whose value text lies
+    outside its axes patch); they are then left out of the background.
+    """
+
+    def __init__(self, canvas, artists=()):
+        self.canvas = canvas
+        self.background = None
+        self.artists = list(artists)
+        self.supported = getattr(canvas, 'supports_blit', True)
+        for a in self.artists:
+            a.set_animated(True)
+        canvas.mpl_connect('draw_event', self.on_draw)
+
+    def on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        fig = self.canvas.figure
+        for a in self.artists:
+            fig.draw_artist(a)
+
+    def update(self):
+        if not self.supported:
+            self.canvas.draw_idle()
+            return
+        if self.background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self.background)
+            self._draw_animated()
+            self.canvas.blit(self.canvas.figure.bbox)
+        self.canvas.flush_events()
@@ -0,0 +1,299 @@
+import argparse
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from position_filter import PositionFilter
+from ultrasonic_parser import NUMBER_PATTERN
+
+# --- Protocol (ultrasoundStartStop.ino) ---
+# "--- READY ---", "--- STARTED ---", then "time_ms,s1,s2" lines each followed
+# by "/" (no newline), so every data line after the first starts with "/".
+# A serial-monitor dump adds a "HH:MM:SS.fff -> " prefix and can jam markers
+# and data into one line ("--- STARTED ---0,204.00,61.00").
+MARKER_PATTERN = re.compile(r"---\s*(READY|STARTED|STOPPED)\s*---")
+PREFIX_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{1,2}):(\d{1,2}\.\d+)\s*->")
+NUMBER_RE = re.compile(NUMBER_PATTERN)
+
+COLUMNS = ('Run', 'Time_s', 'S1', 'S2')
+MAX_LINE_LENGTH = 4096  # bytes, longer garbage is dropped
+
+
+class StreamStats:
+    def __init__(self):
+        self.lines = 0
+        self.samples = 0
+        self.dropped_bytes = 0
+        self.t_start = time.perf_counter()
+        self.t_last = None      # clock after the last fed block; idle time until hang-up is not counted
+
+    def mark(self):
+        self.t_last = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        end = self.t_last if self.t_last is not None else time.perf_counter()
+        return end - self.t_start
+
+    @property
+    def lines_per_second(self):
+        return self.lines / max(self.elapsed, 1e-9)
+
+    def __str__(self):
+        return (f"{self.lines} lines, {self.samples} samples in {self.elapsed:.3f} s "
+                f"({self.lines_per_second:,.0f} lines/s)")
+
+
+class SerialStreamParser:
+    """
+    Incremental parser for the Arduino byte stream. Bytes are fed in arbitrary
+    pieces, complete samples are collected into a preallocated buffer of
+    chunk_size rows (Run, Time_s, S1, S2), so memory stays bounded.
+    """
+
+    def __init__(self, chunk_size=256):
+        self.chunk_size = chunk_size
+        self.stats = StreamStats()
+        self.running = False
+        self.run = 0
+        self._pending = b""
+        self._buf = np.empty((chunk_size, len(COLUMNS)))
+        self._n = 0
+        self._ready = []
+        self._run_host_start = None
+
+    def feed(self, data):
+        """Consumes raw bytes and returns the list of completed chunks."""
+        data = self._pending + data
+        lines = data.split(b"\n")
+        self._pending = lines.pop()
+        if len(self._pending) > MAX_LINE_LENGTH:
+            self.stats.dropped_bytes += len(self._pending)
+            self._pending = b""
+
+        for raw in lines:
+            self._parse_line(raw.decode('utf-8', errors='replace'))
+        self.stats.mark()
+        return self._take_ready()
+
+    def flush(self):
+        """Parses a trailing unterminated line and returns all remaining samples."""
+        if self._pending:
+            self._parse_line(self._pending.decode('utf-8', errors='replace'))
+            self._pending = b""
+        if self._n:
+            self._emit()
+        return self._take_ready()
+
+    def drain(self):
+        """Completed chunks plus the samples parsed so far (leaves a partial line pending)."""
+        if self._n:
+            self._emit()
+        return self._take_ready()
+
+    def _take_ready(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+    def _parse_line(self, line):
+        self.stats.lines += 1
+        host_time = None
+        prefix = PREFIX_PATTERN.match(line)
+        if prefix:
+            hh, mm, ss = prefix.groups()
+            host_time = (int(hh) * 60 + int(mm)) * 60 + float(ss)
+            line = line[prefix.end():]
+
+        # Data and markers can be jammed in any order within one line
+        pos = 0
+        for marker in MARKER_PATTERN.finditer(line):
+            self._parse_values(line[pos:marker.start()], host_time)
+            self._handle_marker(marker.group(1), host_time)
+            pos = marker.end()
+        self._parse_values(line[pos:], host_time)
+
+    def _handle_marker(self, name, host_time):
+        if name == 'STARTED':
+            self.running = True
+            self.run += 1
+            self._run_host_start = host_time
+        elif name == 'STOPPED':
+            self.running = False
+            if self._n:
+                self._emit()
+
+    def _parse_values(self, text, host_time):
+        tokens = NUMBER_RE.findall(text)
+        if not tokens:
+            return
+        vals = [float(n) for n in tokens]
+        # Triplets only if every time_ms is printed as an integer; older
+        # firmware prints pairs with decimals ("45.00,74.00 45.00,75.00...")
+        if len(vals) % 3 == 0 and all('.' not in tok for tok in tokens[::3]):
+            # time_ms,s1,s2 from the current firmware
+            for i in range(0, len(vals), 3):
+                self._append(vals[i] / 1000.0, vals[i + 1], vals[i + 2])
+        elif len(vals) % 2 == 0:
+            # Older firmware without time_ms: fall back to the host timestamp
+            if host_time is not None and self._run_host_start is not None:
+                t = (host_time - self._run_host_start) % 86400
+            else:
+                t = np.nan
+            for i in range(0, len(vals), 2):
+                self._append(t, vals[i], vals[i + 1])
+
+    def _append(self, t, s1, s2):
+        if not self.running:
+            # Data without a preceding marker: we joined a run in progress
+            self.running = True
+            self.run = max(self.run, 1)
+        self._buf[self._n] = (self.run, t, s1, s2)
+        self._n += 1
+        self.stats.samples += 1
+        if self._n == self.chunk_size:
+            self._emit()
+
+    def _emit(self):
+        self._ready.append(self._buf[:self._n].copy())
+        self._n = 0
+
+
+# --- Sources ---
+def _read_blocks(source, block_size):
+    """Yields raw byte blocks from a path (file, pty, tty) or a file-like object."""
+    if hasattr(source, 'read'):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                return
+            yield block.encode() if isinstance(block, str) else block
+
+    fd = os.open(source, os.O_RDONLY | getattr(os, 'O_NOCTTY', 0))
+    try:
+        if os.isatty(fd):
+            import termios
+            import tty
+            # TCSANOW: do not discard bytes already waiting in the pty
+            tty.setraw(fd, termios.TCSANOW)
+        while True:
+            try:
+                block = os.read(fd, block_size)
+            except OSError:
+                # EIO: the other side of the pty was closed
+                return
+            if not block:
+                return
+            yield block
+    finally:
+        os.close(fd)
+
+
+def open_serial(port, baudrate=9600, timeout=1.0):
+    """Opens a real Arduino port; needs pyserial (pip install pyserial)."""
+    try:
+        import serial
+    except ImportError:
+        raise ImportError("Reading a serial port directly requires pyserial: pip install pyserial")
+    return serial.Serial(port, baudrate=baudrate, timeout=timeout)
+
+
+def stream_samples(source, chunk_size=256, block_size=4096, stats=None):
+    """
+    Yields float arrays of shape (<= chunk_size, 4) with columns
+    (Run, Time_s, S1, S2) while the source is being read.
+    """
+    parser = SerialStreamParser(chunk_size)
+    if stats is not None:
+        parser.stats = stats
+    for block in _read_blocks(source, block_size):
+        for chunk in parser.feed(block):
+            yield chunk
+    for chunk in parser.flush():
+        yield chunk
+
+
+# --- Local stand-in for the Arduino ---
+def replay_to_pty(log_path, lines_per_second=None):
+    """
+    Replays a recorded log through a pseudo-terminal. Returns the slave path
+    to read from and the writer thread; the master is closed when done.
+    """
+    import pty
+    master, slave = pty.openpty()
+    slave_path = os.ttyname(slave)
+    import tty
+    tty.setraw(slave)
+
+    with open(log_path, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+
+    def writer():
+        delay = 1.0 / lines_per_second if lines_per_second else 0.0
+        try:
+            for line in lines:
+                os.write(master, line)
+                if delay:
+                    time.sleep(delay)
+            # Let the reader drain the pty before hanging up
+            time.sleep(0.2)
+        finally:
+            os.close(master)
+            os.close(slave)
+
+    thread = threading.Thread(target=writer, daemon=True)
+    return slave_path, thread
+
+
+# --- Main ---
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming ingestion for ultrasoundStartStop.ino")
+    parser.add_argument('source', nargs='?', help="log file, pty/tty path or serial port")
+    parser.add_argument('--replay', help="replay this log through a local pseudo-terminal")
+    parser.add_argument('--rate', type=float, default=None, help="replay rate in lines/s (default: as fast as possible)")
+    parser.add_argument('--serial', action='store_true', help="open source with pyserial")
+    parser.add_argument('--baud', type=int, default=9600)
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--out', help="append samples as CSV (Run,Time_s,S1,S2)")
+    parser.add_argument('--clean', choices=('dense', 'sparse'),
+                        help="clean S1/S2 on the fly like process_table.py (see position_filter.py)")
+    args = parser.parse_args()
+
+    source = args.source
+    thread = None
+    if args.replay:
+        source, thread = replay_to_pty(args.replay, args.rate)
+        print(f"Replaying {args.replay} via {source}")
+    elif source is None:
+        parser.error("source or --replay required")
+    elif args.serial:
+        source = open_serial(source, args.baud)
+
+    stats = StreamStats()
+    out = open(args.out, 'a') if args.out else None
+    filt = PositionFilter(args.clean == 'dense') if args.clean else None
+
+    def write(chunk):
+        # chunk=None at the end: whatever the filter still holds back
+        if filt is not None:
+            rows, s1, s2 = filt.push(chunk[:, :2], chunk[:, 2], chunk[:, 3]) if chunk is not None else filt.flush()
+            chunk = np.column_stack((rows.reshape(-1, 2), s1, s2))
+        if out and chunk is not None and len(chunk):
+            np.savetxt(out, chunk, fmt=['%d', '%.3f', '%.2f', '%.2f'], delimiter=',')
+
+    try:
+        if thread is not None:
+            # The pty buffers the replayed bytes until the reader opens it
+            thread.start()
+        for chunk in stream_samples(source, args.chunk_size, stats=stats):
+            write(chunk)
+            print(f"chunk: {len(chunk)} samples, run {int(chunk[-1, 0])}, "
+                  f"t={chunk[-1, 1]:.3f} s  [{stats}]")
+        write(None)
+    finally:
+        if out:
+            out.close()
+
+    print(f"Done: {stats}")
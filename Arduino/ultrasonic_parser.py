@@ -0,0 +1,113 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# --- Tokenizer Patterns ---
+# Same number pattern as parse_ultrasonic_robust: handles floats with two
+# decimals, integers and jammed numbers ("163.00,32.00164.00,35.00").
+NUMBER_PATTERN = r"[-+]?\d+\.\d{2}|[-+]?\d+"
+LINE_PATTERN = re.compile(
+    r"^[ \t]*(\d{1,2}):(\d{1,2}):(\d{1,2})\.(\d{1,6})[ \t]*->([^\n]*)$",
+    re.MULTILINE,
+)
+# '\n' tokens mark line ends so every value can be mapped back to its line
+TOKEN_PATTERN = re.compile(r"\n|" + NUMBER_PATTERN)
+
+LAST_LINE_DURATION = 0.5  # s, assumed duration of the final log line
+
+
+def _to_int(strings):
+    return np.fromstring(" ".join(strings), dtype=np.int64, sep=" ")
+
+
+def tokenize_log(text):
+    """
+    Splits a serial-monitor dump into per-line timestamps (µs since midnight)
+    and a flat value array with the line index of every value.
+    """
+    matches = LINE_PATTERN.findall(text)
+    if not matches:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, np.empty(0), empty
+
+    hh, mm, ss, frac, contents = zip(*matches)
+    hh = _to_int(hh)
+    mm = _to_int(mm)
+    ss = _to_int(ss)
+    # strptime rejects out-of-range fields (e.g. "00:11:60.000"), so skip them
+    ok = (hh < 24) & (mm < 60) & (ss < 60)
+    frac_len = np.fromiter(map(len, frac), dtype=np.int64, count=len(frac))
+    frac = _to_int(frac)
+    if not ok.all():
+        hh, mm, ss, frac, frac_len = hh[ok], mm[ok], ss[ok], frac[ok], frac_len[ok]
+        contents = [c for c, keep in zip(contents, ok) if keep]
+    # %f semantics: "161" -> 161000 µs
+    frac_us = frac * 10 ** (6 - frac_len)
+    line_us = ((hh * 60 + mm) * 60 + ss) * 1_000_000 + frac_us
+
+    content = "\n".join(contents).replace("--- STARTED ---", "") + "\n"
+    # Line ends become NaN markers, all numbers are converted in one C pass
+    tokens = " ".join(TOKEN_PATTERN.findall(content)).replace("\n", "nan")
+    flat = np.fromstring(tokens, sep=" ")
+    is_newline = np.isnan(flat)
+    line_id = np.cumsum(is_newline)[~is_newline]
+    values = flat[~is_newline]
+
+    return line_us, values, line_id
+
+
+def parse_ultrasonic_fast(file_path):
+    """
+    Vectorized replacement for parse_ultrasonic_robust with identical output
+    (DataFrame with Time_s, S1, S2).
+    """
+    with open(file_path, 'r') as f:
+        text = f.read()
+    return parse_ultrasonic_text(text)
+
+
+def parse_ultrasonic_text(text):
+    line_us, values, line_id = tokenize_log(text)
+    if values.size == 0:
+        return pd.DataFrame()
+
+    n_lines = len(line_us)
+    counts = np.bincount(line_id, minlength=n_lines)
+    line_start = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    pos_in_line = np.arange(values.size) - line_start[line_id]
+
+    # Auto-detect format per line (Triplets vs Pairs)
+    is_triplet = (counts > 0) & (counts % 3 == 0)
+    is_pair = (counts > 0) & ~is_triplet & (counts % 2 == 0)
+    n_points = np.where(is_triplet, counts // 3, np.where(is_pair, counts // 2, 0))
+
+    trip_val = is_triplet[line_id]
+    pair_val = is_pair[line_id]
+    s1_mask = (trip_val & (pos_in_line % 3 == 1)) | (pair_val & (pos_in_line % 2 == 0))
+    s2_mask = (trip_val & (pos_in_line % 3 == 2)) | (pair_val & (pos_in_line % 2 == 1))
+    s1 = values[s1_mask]
+    s2 = values[s2_mask]
+
+    valid = n_points > 0
+    if not valid.any():
+        return pd.DataFrame()
+    line_us = line_us[valid]
+    n_points = n_points[valid]
+
+    # Interpolate Timestamps: spread the points of a line over the time
+    # until the next line, wrapping at midnight
+    duration = np.empty(len(line_us))
+    duration[:-1] = np.diff(line_us) / 1e6
+    duration[:-1][duration[:-1] < 0] += 86400
+    duration[-1] = LAST_LINE_DURATION
+    step = duration / n_points
+
+    pt_line = np.repeat(np.arange(len(line_us)), n_points)
+    pt_start = np.concatenate(([0], np.cumsum(n_points)[:-1]))
+    j = np.arange(len(pt_line)) - pt_start[pt_line]
+    # timedelta rounds to whole microseconds
+    offset_us = np.round(j * step[pt_line] * 1e6).astype(np.int64)
+    rel_us = line_us[pt_line] - line_us[0] + offset_us
+
+    return pd.DataFrame({'Time_s': rel_us / 1e6, 'S1': s1, 'S2': s2})
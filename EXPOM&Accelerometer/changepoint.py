@@ -0,0 +1,372 @@
+"""
+Changepoint-Erkennung für Magnetometer-Aufnahmen beim Gehen (drinnen/draußen,
+Inside_Outside*.csv): zerlegt |B| oder die Komponenten x, y, z in Abschnitte
+mit eigenem Niveau und gibt Grenzen und Statistik je Abschnitt aus.
+
+  pelt()          Offline: PELT mit Kosten aus Präfixsummen (Mittelwert-,
+                  Mittelwert+Varianz- oder Gerade-Wechsel; 'linear' hält eine
+                  langsame Rampe in einem Abschnitt statt sie in Stufen der
+                  Mindestlänge zu zerlegen). Lange Aufnahmen werden zuerst
+                  in Blöcken gerechnet (Kosten blockweise exakt), danach wird
+                  jede Grenze auf das genaue Sample verfeinert -> O(n). Bis
+                  max_bloecke Samples ist das Ergebnis exaktes PELT.
+  OnlineCusum     Streaming: zweiseitiges CUSUM je Kanal, blockweise
+                  vektorisiert (Lindley-Rekursion über kumulative Summen).
+  segment_stats() n, Dauer, Mittelwert, Std, Min, Max je Abschnitt.
+
+    grenzen = pelt(werte, penalty=None, min_laenge=50)
+    stat = segment_stats(werte, grenzen, zeit)
+
+    python changepoint.py Inside_Outside.csv --kanal abs --min-dauer 0.5 --kosten linear
+    python changepoint.py Inside_Outside*.csv --online
+"""
+import argparse
+import glob
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from phyphox_loader import COLUMNS, load_phyphox_array
+
+KOSTEN = ('mean', 'meanvar', 'linear')
+MAX_BLOECKE = 20000      # PELT läuft auf höchstens so vielen Blöcken, Rest ist Verfeinerung
+VAR_MIN = 1e-8           # Untergrenze der Varianz (konstante Abschnitte) für 'meanvar'
+
+
+# --- Kosten aus Präfixsummen ---
+def _als_matrix(werte):
+    x = np.asarray(werte, dtype=np.float64)
+    return x[:, None] if x.ndim == 1 else x
+
+
+def rauschen(x, lag=1):
+    """
+    Robuste Rausch-Std je Kanal aus den Differenzen im Abstand lag (MAD).
+    Mit lag = kürzester Abschnitt zählt langsame Drift innerhalb eines
+    Abschnitts zum Rauschen statt als Wechsel.
+    """
+    lag = max(1, min(int(lag), len(x) // 4))
+    if len(x) < 3:
+        return np.ones(x.shape[1])
+    d = x[lag:] - x[:-lag]
+    sigma = np.median(np.abs(d - np.median(d, axis=0)), axis=0) / (0.6745 * np.sqrt(2))
+    fallback = np.std(x, axis=0)
+    sigma = np.where(sigma > 0, sigma, np.where(fallback > 0, fallback, 1.0))
+    return sigma
+
+
+class _Praefix:
+    """
+    S = Summe, Q = Quadratsumme, I = Summe Index * Wert je Kanal bis Index i
+    (Länge n+1).
+    """
+
+    def __init__(self, x):
+        n, d = x.shape
+        self.S = np.zeros((n + 1, d))
+        self.Q = np.zeros((n + 1, d))
+        self.I = np.zeros((n + 1, d))
+        np.cumsum(x, axis=0, out=self.S[1:])
+        np.cumsum(x * x, axis=0, out=self.Q[1:])
+        np.cumsum(np.arange(n)[:, None] * x, axis=0, out=self.I[1:])
+
+    def kosten(self, s, e, art):
+        """Kosten der Abschnitte [s, e) (Arrays gleicher Form)."""
+        n = (e - s)[..., None].astype(np.float64)
+        S = self.S[e] - self.S[s]
+        Q = self.Q[e] - self.Q[s]
+        rss = Q - S * S / n
+        if art == 'mean':
+            return rss.sum(axis=-1)
+        if art == 'linear':
+            # Gerade a + b * i je Kanal: Restquadratsumme nach Abzug der Steigung
+            mitte = (s + e - 1)[..., None] / 2
+            sxy = self.I[e] - self.I[s] - mitte * S
+            sxx = n * (n * n - 1) / 12
+            return np.maximum(rss - sxy * sxy / np.where(sxx > 0, sxx, np.inf), 0).sum(axis=-1)
+        var = np.maximum(rss / n, VAR_MIN)
+        return (n * np.log(var)).sum(axis=-1)
+
+
+# --- PELT ---
+def _pelt(kosten, m, min_seg, beta):
+    """PELT auf den Indizes 0..m; kosten(s, e) vektorisiert über s."""
+    F = np.full(m + 1, np.inf)
+    F[0] = -beta
+    letzte = np.zeros(m + 1, dtype=np.int64)
+    R = np.array([0], dtype=np.int64)
+    verworfen = {}
+    for t in range(min_seg, m + 1):
+        # Pruning von t - min_seg: gilt erst für Enden s >= t' + min_seg
+        if t - min_seg in verworfen:
+            R = R[~np.isin(R, verworfen.pop(t - min_seg))]
+        neu = t - min_seg
+        if neu >= min_seg:
+            R = np.append(R, neu)
+        c = F[R] + kosten(R, np.full(len(R), t))
+        i = np.argmin(c)
+        F[t] = c[i] + beta
+        letzte[t] = R[i]
+        # Kandidaten, die nie mehr besser werden können
+        weg = c > F[t]
+        if weg.any():
+            verworfen[t] = R[weg]
+    grenzen = []
+    t = m
+    while t > 0:
+        t = letzte[t]
+        if t > 0:
+            grenzen.append(t)
+    return np.array(grenzen[::-1], dtype=np.int64)
+
+
+def pelt(werte, penalty=None, min_laenge=2, kosten='mean', normieren=True, max_bloecke=MAX_BLOECKE):
+    """
+    Changepoints von werte (n,) oder (n, Kanäle): Anfangsindizes der
+    Abschnitte 2..K. penalty=None: BIC-artig (Parameter je Abschnitt + 1) *
+    log(n) auf rausch-normierten Daten (Rauschen auf der Skala von
+    min_laenge); 'linear' hat je Kanal Niveau und Steigung. Über max_bloecke
+    Samples wird auf Blöcken gerechnet und anschließend verfeinert.
+    """
+    if kosten not in KOSTEN:
+        raise ValueError(f"Unbekannte Kosten '{kosten}', erlaubt: {KOSTEN}")
+    x = _als_matrix(werte)
+    n, d = x.shape
+    min_laenge = max(int(min_laenge), 1 if kosten == 'mean' else 2)
+    if n < 2 * min_laenge:
+        return np.empty(0, dtype=np.int64)
+    if normieren:
+        x = (x - x.mean(axis=0)) / rauschen(x, min_laenge)
+    parameter = 2 * d if kosten == 'linear' else d
+    beta = (parameter + 1) * np.log(n) if penalty is None else float(penalty)
+    p = _Praefix(x)
+
+    # Blöcke: Kosten an Blockgrenzen sind exakt, PELT findet blockgenaue Grenzen
+    b = max(1, int(np.ceil(n / max_bloecke)))
+    rand = np.r_[np.arange(0, n, b), n]
+    min_seg = max(1, int(np.ceil(min_laenge / b)))
+    grob = _pelt(lambda s, e: p.kosten(rand[s], rand[e], kosten), len(rand) - 1, min_seg, beta)
+    grenzen = rand[grob]
+    if b == 1 or len(grenzen) == 0:
+        return grenzen
+    return _verfeinern(p, grenzen, n, b, min_laenge, kosten)
+
+
+def _verfeinern(p, grenzen, n, b, min_laenge, kosten):
+    """Jede Grenze im Fenster ±b um die Blockgrenze auf das beste Sample schieben (Nachbarn fest)."""
+    grenzen = grenzen.copy()
+    for i, g in enumerate(grenzen):
+        a = grenzen[i - 1] if i > 0 else 0
+        c = grenzen[i + 1] if i + 1 < len(grenzen) else n
+        lo = max(g - b, a + min_laenge)
+        hi = min(g + b, c - min_laenge)
+        if hi <= lo:
+            continue
+        tau = np.arange(lo, hi + 1)
+        gesamt = p.kosten(np.full(len(tau), a), tau, kosten) + p.kosten(tau, np.full(len(tau), c), kosten)
+        grenzen[i] = tau[np.argmin(gesamt)]
+    return grenzen
+
+
+# --- Statistik je Abschnitt ---
+def segment_stats(werte, grenzen, zeit=None):
+    """
+    Statistik je Abschnitt als dict von Arrays: start, ende (Index, exklusiv),
+    n, t_start, t_ende, mean, std, min, max (letztere (K, Kanäle)).
+    """
+    x = _als_matrix(werte)
+    n = len(x)
+    start = np.r_[0, np.asarray(grenzen, dtype=np.int64)]
+    ende = np.r_[start[1:], n]
+    anzahl = ende - start
+    # Kanal-major: reduceat entlang der schnellen Achse
+    xt = np.ascontiguousarray(x.T)
+    summe = np.add.reduceat(xt, start, axis=1).T
+    quad = np.add.reduceat(xt * xt, start, axis=1).T
+    mean = summe / anzahl[:, None]
+    std = np.sqrt(np.maximum(quad / anzahl[:, None] - mean * mean, 0.0))
+    stat = {'start': start, 'ende': ende, 'n': anzahl, 'mean': mean, 'std': std,
+            'min': np.minimum.reduceat(xt, start, axis=1).T, 'max': np.maximum.reduceat(xt, start, axis=1).T}
+    if zeit is not None:
+        zeit = np.asarray(zeit, dtype=np.float64)
+        stat['t_start'] = zeit[start]
+        stat['t_ende'] = zeit[ende - 1]
+    return stat
+
+
+# --- Online-CUSUM ---
+class OnlineCusum:
+    """
+    Selbststartendes zweiseitiges CUSUM je Kanal für Datenströme. Nach
+    jedem Wechsel wartet der Detektor `warmup` Samples für den Mittelwert des
+    neuen Abschnitts und schätzt die Streuung mit rauschen() über die letzten
+    4 * lag Samples, also auch aus dem vorigen Abschnitt (beim Start: die
+    ersten max(warmup, 4 * lag) Samples). lag in der Größe des kürzesten
+    Abschnitts macht die Streuung robust gegen langsame Drift. Die
+    Referenz ist der laufende Mittelwert aller bisherigen Samples des
+    Abschnitts. Ein Wechsel wird gemeldet, sobald ein Kanal die Schwelle h
+    (in Std, siehe schwelle()) mit Drift k übersteigt; als Wechselzeitpunkt
+    gilt der letzte Nullpunkt der CUSUM-Statistik davor. Jeder push() ist
+    vektorisiert (keine Schleife je Sample).
+    """
+
+    def __init__(self, k=0.5, h=10.0, warmup=50, sigma=None, lag=None):
+        self.k, self.h, self.warmup = k, h, warmup
+        self.lag = max(1, warmup // 4 if lag is None else int(lag))
+        self.ereignisse = []       # (Wechsel-Index, Erkennungs-Index, Referenz-Mittelwert)
+        self._n = 0                # bisher gesehene Samples
+        self.sigma_fest = sigma
+        self._sigma = None
+        self._verlauf = None       # letzte 4 * lag Samples für die Streuung
+        self._neuer_abschnitt()
+
+    def _neuer_abschnitt(self):
+        self._warm = []
+        self._n_warm = 0
+        self._bereit = False
+        self._summe, self._anzahl = 0.0, 0
+        self._g = None             # (2, Kanäle): oben / unten
+        self._null = None          # letzter Nullpunkt je Richtung und Kanal (globaler Index)
+
+    def push(self, werte):
+        """Nimmt einen Block (n,) oder (n, Kanäle) auf; gibt die neuen Ereignisse zurück."""
+        x = _als_matrix(werte)
+        neu = []
+        pos = 0
+        while pos < len(x):
+            if not self._bereit:
+                # Aufwärmen: Mittelwert des Abschnitts; beim ersten Mal auch 4 * lag Samples
+                # für die Streuung
+                erstes = self._sigma is None and self.sigma_fest is None
+                bedarf = max(self.warmup, 4 * self.lag) if erstes else self.warmup
+                stueck = x[pos:pos + bedarf - self._n_warm]
+                self._warm.append(stueck)
+                self._n_warm += len(stueck)
+                pos += len(stueck)
+                if self._n_warm >= bedarf:
+                    w = np.concatenate(self._warm)
+                    if self.sigma_fest is not None:
+                        self._sigma = np.broadcast_to(self.sigma_fest, w.shape[1:]).astype(float)
+                    else:
+                        # Streuung über die letzten 4 * lag Samples, auch über die Grenze zurück
+                        fenster = x[:pos] if self._verlauf is None else np.concatenate((self._verlauf, x[:pos]))
+                        self._sigma = rauschen(fenster[-4 * self.lag:], self.lag)
+                    self._bereit = True
+                    self._summe, self._anzahl = w.sum(axis=0), len(w)
+                    self._g = np.zeros((2, x.shape[1]))
+                    self._null = np.full((2, x.shape[1]), self._n + pos - 1)
+                continue
+
+            # Referenz je Sample: Mittelwert aller früheren Samples des Abschnitts
+            xs = x[pos:]
+            vorher = self._summe + np.cumsum(xs, axis=0) - xs
+            n_vorher = (self._anzahl + np.arange(len(xs)))[:, None]
+            mu = vorher / n_vorher
+            # x - mu hat Varianz sigma^2 (1 + 1/n) solange mu aus n Samples geschätzt ist
+            z = (xs - mu) / (self._sigma * np.sqrt(1 + 1 / n_vorher))
+            # g_t = max(0, g_{t-1} + y_t) geschlossen: S_t - min(0, min_{s<=t} S_s)
+            g_oben = self._g[0] + np.cumsum(z - self.k, axis=0)
+            g_oben -= np.minimum(np.minimum.accumulate(g_oben, axis=0), 0)
+            g_unten = self._g[1] + np.cumsum(-z - self.k, axis=0)
+            g_unten -= np.minimum(np.minimum.accumulate(g_unten, axis=0), 0)
+
+            alarm = (g_oben > self.h).any(axis=1) | (g_unten > self.h).any(axis=1)
+            j = int(np.argmax(alarm)) if alarm.any() else len(z)
+            # Letzter Nullpunkt bis einschließlich j (global), je Richtung und Kanal
+            idx = self._n + pos + np.arange(min(j + 1, len(z)))
+            for r, g in enumerate((g_oben, g_unten)):
+                null = g[:len(idx)] == 0
+                hat = null.any(axis=0)
+                letzte = len(idx) - 1 - np.argmax(null[::-1], axis=0)
+                self._null[r] = np.where(hat, idx[letzte], self._null[r])
+
+            if j == len(z):
+                self._g = np.stack((g_oben[-1], g_unten[-1]))
+                self._summe = vorher[-1] + xs[-1]
+                self._anzahl += len(xs)
+                pos = len(x)
+                break
+
+            # Richtung/Kanal mit dem Alarm bestimmt den Wechselzeitpunkt
+            treffer = np.stack((g_oben[j], g_unten[j])) > self.h
+            wechsel = int(self._null[treffer].min()) + 1
+            erkennung = self._n + pos + j
+            neu.append((wechsel, erkennung, mu[j].copy()))
+            pos += j + 1
+            self._neuer_abschnitt()
+        self._verlauf = (x if self._verlauf is None else np.concatenate((self._verlauf, x)))[-4 * self.lag:]
+        self._n += len(x)
+        self.ereignisse.extend(neu)
+        return neu
+
+    @property
+    def grenzen(self):
+        return np.array([e[0] for e in self.ereignisse], dtype=np.int64)
+
+
+def schwelle(arl, k=0.5):
+    """
+    CUSUM-Schwelle h (in Std) für eine mittlere Lauflänge ohne Wechsel von
+    etwa arl Samples je Richtung (Siegmund-Näherung
+    ARL = (exp(2k(h + 1.166)) - 2k(h + 1.166) - 1) / (2k^2), Exponent dominiert).
+    """
+    return np.log(arl * 2 * k ** 2) / (2 * k) - 1.166
+
+
+def cusum(werte, k=0.5, h=10.0, warmup=50, lag=None, block=65536):
+    """OnlineCusum über eine ganze Aufnahme (in Blöcken); gibt die Grenzen zurück."""
+    det = OnlineCusum(k, h, warmup, lag=lag)
+    x = _als_matrix(werte)
+    for i in range(0, len(x), block):
+        det.push(x[i:i + block])
+    return det.grenzen
+
+
+# --- Dateien ---
+def load_recording(pfad, kanal='abs'):
+    """Zeit und Kanäle einer Phyphox-Magnetometer-CSV ('abs', 'xyz' oder einzelne Achse)."""
+    arr = load_phyphox_array(pfad)
+    spalten = [COLUMNS.index(c) for c in (['x', 'y', 'z'] if kanal == 'xyz' else [kanal])]
+    return arr[:, 0], arr[:, spalten]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Changepoints in Magnetometer-Aufnahmen (drinnen/draußen)")
+    parser.add_argument('dateien', nargs='*', help="Standard: Inside_Outside*.csv / Inside_outside*.csv hier")
+    parser.add_argument('--kanal', default='abs', choices=('abs', 'xyz', 'x', 'y', 'z'))
+    parser.add_argument('--kosten', default='linear', choices=KOSTEN,
+                        help="'linear': Niveau und Steigung je Abschnitt, Rampen bleiben ein Abschnitt")
+    parser.add_argument('--penalty', type=float, help="Strafterm je Wechsel (Standard: (Kanäle + 1) * log n)")
+    parser.add_argument('--min-dauer', type=float, default=1.0, help="kürzester Abschnitt in s")
+    parser.add_argument('--online', action='store_true', help="zusätzlich Online-CUSUM")
+    parser.add_argument('--h', type=float, default=None,
+                        help="CUSUM-Schwelle (Std); Standard: Fehlalarm seltener als alle 10^5 Mindestdauern")
+    args = parser.parse_args()
+
+    hier = os.path.dirname(os.path.abspath(__file__))
+    dateien = args.dateien or sorted(set(glob.glob(os.path.join(hier, 'Inside_[Oo]utside*.csv'))))
+    for pfad in dateien:
+        zeit, werte = load_recording(pfad, args.kanal)
+        rate = (len(zeit) - 1) / (zeit[-1] - zeit[0]) if len(zeit) > 1 else 1.0
+        grenzen = pelt(werte, args.penalty, max(2, int(args.min_dauer * rate)), args.kosten)
+        stat = segment_stats(werte, grenzen, zeit)
+        print(f"\n{os.path.basename(pfad)}: {len(zeit)} Samples, {zeit[-1] - zeit[0]:.1f} s, "
+              f"{len(grenzen) + 1} Abschnitte ({args.kanal})")
+        print(f"{'#':>3} {'von (s)':>8} {'bis (s)':>8} {'n':>7} {'mean':>24} {'std':>24}")
+        for i in range(len(stat['n'])):
+            mean = ' '.join(f"{v:7.2f}" for v in stat['mean'][i])
+            std = ' '.join(f"{v:7.2f}" for v in stat['std'][i])
+            print(f"{i + 1:>3} {stat['t_start'][i]:>8.2f} {stat['t_ende'][i]:>8.2f} {stat['n'][i]:>7} "
+                  f"{mean:>24} {std:>24}")
+        if args.online:
+            # Mittelwert über die Mindestdauer, Streuung mit halber Mindestdauer als lag
+            min_laenge = max(20, int(args.min_dauer * rate))
+            h = args.h if args.h is not None else schwelle(1e5 * min_laenge)
+            online = cusum(werte, h=h, warmup=min_laenge, lag=min_laenge // 2)
+            print(f"    Online-CUSUM: Wechsel bei {', '.join(f'{zeit[g]:.2f} s' for g in online) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,404 @@
+"""
+Lader für die Exporte des Expom-ELF (Export_ELF_<Datum>_<Uhrzeit>_<Ort>.csv/.xlsx)
+und schnelle Fenster-Statistik über viele Exporte.
+
+Aufbau eines Exports: zwei Zeilen Geräte-Vorspann ("Device ID: EELF17002 /
+Expom-ELF Utility v.1.3.5.0", "FFT Window: ..."), Kopfzeile, dann 24
+Spalten in Anführungszeichen (Bänder 16 Hz/50 Hz/Harmonische, DC-Anteile,
+GPS, Akku) mit Zeitstempeln dd/mm/yyyy HH:MM:SS.
+
+Jeder Export wird einmal geparst (Zeitstempel vektorisiert, Bänder als
+float64) und als strukturiertes Array über den Cache von phyphox_loader.py
+abgelegt; spätere Ladevorgänge mappen nur noch die .npy-Datei.
+
+    archiv = ElfArchive(find_exports('.'))
+    start, stat = archiv.resample(600)              # 10-min-Fenster
+    stat['mean'][:, archiv.band_index('50Hz')]
+    archiv.aggregate('2025-11-24T19:20', '2025-11-24T19:22')
+
+    python elf_export.py [Ordner] [--fenster 600]
+"""
+import argparse
+import csv
+import glob
+import io
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import phyphox_loader
+
+# Spaltenname im Export -> Feld im Array
+SPALTEN = {
+    'Date and Time': 'time',
+    'Sequence number': 'seq',
+    'Railway 16Hz (16-17 Hz)': '16Hz',
+    'Mains 50Hz (49-51 Hz)': '50Hz',
+    'H2 (99-101 Hz)': 'H2',
+    'H3 (149-151 Hz)': 'H3',
+    'H12 (599-601 Hz)': 'H12',
+    'DC component (total)': 'DC',
+    'DC component (X)': 'DC_X',
+    'DC component (Y)': 'DC_Y',
+    'DC component (Z)': 'DC_Z',
+    'GPS Fix': 'gps_fix',
+    'GPS# Satellites': 'satellites',
+    'Battery charge %': 'battery',
+    'Movement Index': 'movement',
+}
+BANDS = ['16Hz', '50Hz', 'H2', 'H3', 'H12', 'DC', 'DC_X', 'DC_Y', 'DC_Z']
+ELF_DTYPE = np.dtype([('time', 'datetime64[s]'), ('seq', 'i8')]
+                     + [(b, 'f8') for b in BANDS]
+                     + [('gps_fix', '?'), ('satellites', 'i2'), ('battery', 'f4'), ('movement', 'f8')])
+
+DATEINAME = re.compile(r'^Export_ELF_(\d{4}-\d{2}-\d{2})_(\d{2})(\d{2})_(.+)\.(csv|xlsx)$')
+ZEITFORMAT = 'dd/mm/yyyy HH:MM:SS'
+CACHE_TAG = 'elf-v1'
+
+
+# --- Vorspann ---
+
+def parse_preamble(zeilen):
+    """'Schlüssel: Wert'-Zeilen des Vorspanns als dict; die Device ID enthält auch die Software-Version."""
+    meta = {}
+    for zeile in zeilen:
+        zeile = str(zeile).strip().strip('"')
+        if ':' not in zeile:
+            continue
+        key, value = (s.strip() for s in zeile.split(':', 1))
+        meta[key.lower().replace(' ', '_')] = value
+    if ' / ' in meta.get('device_id', ''):
+        meta['device_id'], meta['software'] = (s.strip() for s in meta['device_id'].split(' / ', 1))
+    return meta
+
+
+def read_preamble(pfad):
+    """Vorspann und Angaben aus dem Dateinamen (Datum, Uhrzeit, Ort)."""
+    if pfad.endswith('.xlsx'):
+        zeilen = pd.read_excel(pfad, header=None, nrows=2, usecols=[0])[0].tolist()
+    else:
+        with open(pfad, 'rb') as f:
+            zeilen = [f.readline().decode('latin-1').split('","')[0] for _ in range(2)]
+    meta = parse_preamble(zeilen)
+    m = DATEINAME.match(os.path.basename(pfad))
+    if m:
+        meta['export'] = f"{m.group(1)}T{m.group(2)}:{m.group(3)}"
+        meta['ort'] = m.group(4)
+    return meta
+
+
+# --- Zeitstempel ---
+
+def parse_timestamps(texte):
+    """
+    dd/mm/yyyy HH:MM:SS als datetime64[s], ohne Python-Schleife: die Texte
+    werden als (n, 19)-Bytematrix gelesen und die Ziffern direkt verrechnet.
+    Leere Einträge werden NaT.
+    """
+    raw = np.asarray(texte, dtype='S19')
+    b = raw.view(np.uint8).reshape(len(raw), 19)
+    leer = b[:, 0] == 0
+    d = b.astype(np.int64) - ord('0')
+
+    ok = ((b[:, [2, 5]] == ord('/')).all(axis=1) & (b[:, 10] == ord(' '))
+          & (b[:, [13, 16]] == ord(':')).all(axis=1))
+    ziffern = d[:, [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15, 17, 18]]
+    ok &= ((ziffern >= 0) & (ziffern <= 9)).all(axis=1)
+    if not (ok | leer).all():
+        i = int(np.flatnonzero(~(ok | leer))[0])
+        raise ValueError(f"Zeitstempel {raw[i]!r} passt nicht zu {ZEITFORMAT}")
+
+    tag = d[:, 0] * 10 + d[:, 1]
+    monat = d[:, 3] * 10 + d[:, 4]
+    jahr = d[:, 6] * 1000 + d[:, 7] * 100 + d[:, 8] * 10 + d[:, 9]
+    sekunden = (d[:, 11] * 10 + d[:, 12]) * 3600 + (d[:, 14] * 10 + d[:, 15]) * 60 + d[:, 17] * 10 + d[:, 18]
+    # Monatsanfang über datetime64[M], dann Tage und Sekunden addieren
+    monate = ((jahr - 1970) * 12 + monat - 1).astype('datetime64[M]')
+    zeit = monate.astype('datetime64[D]').astype('datetime64[s]') + (tag - 1) * 86400 + sekunden
+    zeit[leer] = np.datetime64('NaT')
+    return zeit
+
+
+# --- Parser ---
+
+def _to_records(spalten, zeit, pfad):
+    """Baut das strukturierte Array aus den Spalten (dict Feld -> Array), leere Zeilen fallen weg."""
+    fehlend = [b for b in BANDS if b not in spalten]
+    if fehlend:
+        raise ValueError(f"{pfad}: Spalten fehlen: {', '.join(fehlend)}")
+    ok = ~np.isnat(zeit)
+    out = np.zeros(int(ok.sum()), dtype=ELF_DTYPE)
+    out['time'] = zeit[ok]
+    for feld in ELF_DTYPE.names[1:]:
+        if feld not in spalten:
+            continue
+        werte = np.asarray(spalten[feld])[ok]
+        if feld == 'gps_fix':
+            werte = ~np.isin(np.char.strip(werte.astype(str)), ('no fix', ''))
+        elif ELF_DTYPE[feld].kind in 'iu':
+            werte = np.nan_to_num(werte.astype(np.float64))
+        out[feld] = werte
+    return out[np.argsort(out['time'], kind='stable')]
+
+
+def parse_elf_csv(pfad):
+    """Parst einen CSV-Export in ein Array mit ELF_DTYPE (nach Zeit sortiert)."""
+    with open(pfad, 'rb') as f:
+        data = f.read()
+    # Zwei Zeilen Vorspann; die GPS-Felder enthalten NUL-Bytes
+    body = data.split(b'\n', 2)[2].replace(b'\x00', b' ')
+    kopf = next(csv.reader([body[:body.find(b'\n')].decode('latin-1')]))
+    usecols = [c for c in kopf if c in SPALTEN]
+    dtype = {c: (str if SPALTEN[c] in ('time', 'gps_fix') else np.float64) for c in usecols}
+
+    # Leere Schlusszeilen ("","",...) abschneiden, dann geht es ohne NA-Erkennung
+    ende = len(body)
+    while True:
+        while ende and body[ende - 1] in b'\r\n':
+            ende -= 1
+        anfang = body.rfind(b'\n', 0, ende) + 1
+        if not body.startswith(b'"",', anfang):
+            break
+        ende = anfang
+    try:
+        df = pd.read_csv(io.BytesIO(body[:ende]), usecols=usecols, dtype=dtype, engine='c', na_filter=False)
+    except ValueError:
+        # Leere Felder mitten in der Datei
+        df = pd.read_csv(io.BytesIO(body), usecols=usecols, dtype=dtype, engine='c')
+    spalten = {SPALTEN[c]: df[c].to_numpy() for c in usecols}
+    if 'gps_fix' in spalten:
+        spalten['gps_fix'] = df['GPS Fix'].fillna('').to_numpy(dtype=str)
+    zeit = parse_timestamps(df['Date and Time'].fillna('').to_numpy(dtype='S19'))
+    return _to_records(spalten, zeit, pfad)
+
+
+def parse_elf_xlsx(pfad):
+    """Wie parse_elf_csv für den .xlsx-Export (braucht openpyxl)."""
+    df = pd.read_excel(pfad, header=2)
+    usecols = [c for c in df.columns if c in SPALTEN]
+    spalten = {}
+    for c in usecols:
+        if SPALTEN[c] == 'gps_fix':
+            spalten['gps_fix'] = df[c].fillna('no fix').to_numpy(dtype=str)
+        elif SPALTEN[c] != 'time':
+            spalten[SPALTEN[c]] = pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=np.float64)
+    # Excel liefert die Zeitstempel meist schon als Datum, sonst als Text
+    t = df['Date and Time']
+    texte = t.dropna()
+    if len(texte) and isinstance(texte.iloc[0], str):
+        zeit = parse_timestamps(t.fillna('').astype(str).to_numpy(dtype='S19'))
+    else:
+        zeit = pd.to_datetime(t).to_numpy().astype('datetime64[s]')
+    return _to_records(spalten, zeit, pfad)
+
+
+def load_elf_array(pfad, use_cache=True):
+    """Array mit ELF_DTYPE für einen Export; aus dem Cache als read-only Memory-Map."""
+    parse = parse_elf_xlsx if pfad.endswith('.xlsx') else parse_elf_csv
+    if not use_cache:
+        return parse(pfad)
+
+    key = phyphox_loader.cache_key(pfad, CACHE_TAG)
+    cached = phyphox_loader.cache_path(key)
+    if os.path.exists(cached):
+        try:
+            arr = np.load(cached, mmap_mode='r')
+            if arr.dtype == ELF_DTYPE:
+                phyphox_loader.touch(cached)
+                return arr
+        except (OSError, ValueError):
+            pass  # abgeschnittene oder fremde Datei: neu parsen
+
+    arr = parse(pfad)
+    try:
+        phyphox_loader.store(key, arr)
+    except OSError as e:
+        print(f"Warnung: Cache für {pfad} nicht schreibbar: {e}")
+    return arr
+
+
+def load_elf(pfad, use_cache=True):
+    """DataFrame mit Zeitindex; der Vorspann steht in df.attrs['meta']."""
+    df = pd.DataFrame(np.array(load_elf_array(pfad, use_cache))).set_index('time')
+    df.attrs['meta'] = read_preamble(pfad)
+    return df
+
+
+def find_exports(ordner='.'):
+    """Export_ELF_*-Dateien im Ordner; liegt ein Export als .csv und .xlsx vor, gilt die CSV."""
+    pfade = {}
+    for pfad in sorted(glob.glob(os.path.join(ordner, 'Export_ELF_*'))):
+        stamm, endung = os.path.splitext(pfad)
+        if endung == '.csv' or (endung == '.xlsx' and stamm not in pfade):
+            pfade[stamm] = pfad
+    return sorted(pfade.values())
+
+
+# --- Fenster-Statistik ---
+
+def _to_seconds(t):
+    t = np.asarray(t)
+    if t.dtype.kind in 'iuf':
+        return t
+    return t.astype('datetime64[s]').astype(np.int64)
+
+
+def _sparse_table(werte, ufunc):
+    """Stufe j: ufunc über 2**j aufeinanderfolgende Zeilen."""
+    stufen = [werte]
+    j = 1
+    while 2 ** j <= len(werte):
+        prev = stufen[-1]
+        stufen.append(ufunc(prev[:-2 ** (j - 1)], prev[2 ** (j - 1):]))
+        j += 1
+    return stufen
+
+
+def _range_query(stufen, lo, hi, ufunc):
+    """ufunc über die Zeilen lo..hi-1 (hi > lo) aus zwei überlappenden Zweierpotenz-Blöcken."""
+    j = np.floor(np.log2(hi - lo)).astype(np.int64)
+    out = np.empty((len(lo),) + stufen[0].shape[1:])
+    for s in np.unique(j):
+        m = j == s
+        out[m] = ufunc(stufen[s][lo[m]], stufen[s][hi[m] - 2 ** s])
+    return out
+
+
+def window_stats(zeit, werte, start, ende):
+    """
+    Anzahl, Minimum, Mittelwert und Maximum je Band über die Zeitfenster
+    [start, ende) (beliebig viele, auch überlappend). werte hat eine Zeile
+    je Band (Bänder x n, so laufen die Reduktionen über zusammenhängenden
+    Speicher); die Ergebnisse sind (Fenster x Bänder). NaN in den Daten
+    wird ignoriert, leere Fenster ergeben NaN.
+
+    Die Fenstergrenzen zerlegen die Zeitachse in Elementarabschnitte, die
+    einmal mit reduceat zusammengefasst werden (O(n)); jedes Fenster ist
+    dann eine Bereichsabfrage über diese Abschnitte: Präfixsummen für Anzahl
+    und Summe, Sparse Table für Minimum und Maximum (O(q log q)).
+    """
+    start, ende = np.atleast_1d(_to_seconds(start)), np.atleast_1d(_to_seconds(ende))
+    lo = np.searchsorted(zeit, start, side='left')
+    hi = np.maximum(np.searchsorted(zeit, ende, side='left'), lo)
+    q, nb = len(lo), werte.shape[0]
+    res = {'count': np.zeros(q, dtype=np.int64), 'min': np.full((q, nb), np.nan),
+           'mean': np.full((q, nb), np.nan), 'max': np.full((q, nb), np.nan)}
+    voll = hi > lo
+    if not voll.any():
+        return res
+
+    grenzen = np.unique(np.concatenate((lo[voll], hi[voll])))
+    a, b = grenzen[0], grenzen[-1]
+    teil = werte[:, a:b]
+    anfang = grenzen[:-1] - a
+    zeilen = np.diff(grenzen)
+    gueltig = ~np.isnan(teil)
+    if gueltig.all():
+        anzahl = np.broadcast_to(zeilen, (nb, len(zeilen)))
+        summe = np.add.reduceat(teil, anfang, axis=1)
+    else:
+        anzahl = np.add.reduceat(gueltig, anfang, axis=1)
+        summe = np.add.reduceat(np.where(gueltig, teil, 0.0), anfang, axis=1)
+    # fmin/fmax überspringen NaN
+    seg_min = np.fmin.reduceat(teil, anfang, axis=1).T
+    seg_max = np.fmax.reduceat(teil, anfang, axis=1).T
+
+    # Fenster -> Abschnitte i0..i1-1
+    i0 = np.searchsorted(grenzen, lo[voll])
+    i1 = np.searchsorted(grenzen, hi[voll])
+    c_zeilen = np.concatenate(([0], np.cumsum(zeilen)))
+    c_anzahl = np.vstack((np.zeros((1, nb), dtype=np.int64), np.cumsum(anzahl.T, axis=0)))
+    c_summe = np.vstack((np.zeros((1, nb)), np.cumsum(summe.T, axis=0)))
+    n = c_anzahl[i1] - c_anzahl[i0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (c_summe[i1] - c_summe[i0]) / n
+    mn = _range_query(_sparse_table(seg_min, np.fmin), i0, i1, np.fmin)
+    mx = _range_query(_sparse_table(seg_max, np.fmax), i0, i1, np.fmax)
+
+    res['count'][voll] = c_zeilen[i1] - c_zeilen[i0]
+    res['mean'][voll] = np.where(n > 0, mean, np.nan)
+    res['min'][voll] = mn
+    res['max'][voll] = mx
+    return res
+
+
+class ElfArchive:
+    """
+    Viele Exporte als eine Zeitreihe: Zeit in Sekunden (int64) und die Bänder
+    als (Bänder, n)-Matrix, nach Zeit sortiert. Geladen wird über den Cache,
+    also ohne erneutes Parsen.
+    """
+
+    def __init__(self, pfade, bands=BANDS, use_cache=True):
+        self.pfade = list(pfade)
+        self.bands = list(bands)
+        arrays = [load_elf_array(p, use_cache) for p in self.pfade]
+        self.datei = np.repeat(np.arange(len(arrays)), [len(a) for a in arrays])
+        zeit = np.concatenate([a['time'] for a in arrays]) if arrays else np.empty(0, 'datetime64[s]')
+        order = np.argsort(zeit, kind='stable')
+        self.zeit = zeit[order].astype(np.int64)
+        self.werte = np.empty((len(self.bands), len(zeit)))
+        for k, band in enumerate(self.bands):
+            if arrays:
+                self.werte[k] = np.concatenate([a[band] for a in arrays])[order]
+        self.datei = self.datei[order]
+
+    def __len__(self):
+        return len(self.zeit)
+
+    def band_index(self, band):
+        return self.bands.index(band)
+
+    @property
+    def zeitraum(self):
+        return self.zeit[[0, -1]].astype('datetime64[s]') if len(self) else None
+
+    def meta(self):
+        return [read_preamble(p) for p in self.pfade]
+
+    def aggregate(self, start, ende):
+        """window_stats über [start, ende); Zeiten als datetime64, ISO-Text oder Sekunden seit 1970."""
+        return window_stats(self.zeit, self.werte, start, ende)
+
+    def resample(self, breite, start=None, ende=None):
+        """Aufeinanderfolgende Fenster von breite Sekunden; gibt (Fensteranfänge, Statistik) zurück."""
+        if len(self) == 0:
+            return np.empty(0, 'datetime64[s]'), window_stats(self.zeit, self.werte, [], [])
+        t0 = self.zeit[0] if start is None else _to_seconds(start)
+        t1 = self.zeit[-1] + 1 if ende is None else _to_seconds(ende)
+        kanten = t0 + np.arange(max(int(np.ceil((t1 - t0) / breite)), 1) + 1) * breite
+        return kanten[:-1].astype('datetime64[s]'), window_stats(self.zeit, self.werte, kanten[:-1], kanten[1:])
+
+
+# --- Hauptprogramm ---
+
+def main():
+    parser = argparse.ArgumentParser(description="Expom-ELF-Exporte laden und in Zeitfenstern zusammenfassen")
+    parser.add_argument('ordner', nargs='?', default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument('--fenster', type=float, default=60.0, help="Fensterbreite in s")
+    parser.add_argument('--band', default='50Hz', choices=BANDS)
+    args = parser.parse_args()
+
+    pfade = find_exports(args.ordner)
+    if not pfade:
+        print(f"Keine Export_ELF_*-Dateien in {args.ordner}")
+        return
+    archiv = ElfArchive(pfade)
+    for pfad, meta in zip(pfade, archiv.meta()):
+        print(f"{os.path.basename(pfad)}: {meta.get('device_id', '?')}, {meta.get('software', '?')}")
+    print(f"{len(archiv)} Zeilen, {archiv.zeitraum[0]} bis {archiv.zeitraum[1]}\n")
+
+    start, stat = archiv.resample(args.fenster)
+    k = archiv.band_index(args.band)
+    print(f"{'Fenster':<20} {'n':>4} {'min':>8} {'mean':>8} {'max':>8}   ({args.band})")
+    for i in np.flatnonzero(stat['count']):
+        print(f"{str(start[i]):<20} {stat['count'][i]:>4} {stat['min'][i, k]:>8.2f} "
+              f"{stat['mean'][i, k]:>8.2f} {stat['max'][i, k]:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,241 +1,348 @@
 
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from scipy import integrate, signal, interpolate
 #import matplotlib.colors as colors
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Arduino'))
+from phyphox_loader import load_phyphox
+from dead_reckoning import integrate_forced
+from time_align import Alignment
+from lane_index import index_campaign, index_session
+from lane_stream import CHUNK_ROWS, verarbeite_messungen_chunked
+import stage_timer
+from stage_timer import stage, timed
+from tile_pyramid import decimate
+from kriging import krige
+
 
 REAL_DISTANCE_Y = 1.60      # Länge der Linien-Messung (Tischlänge, entlang welcher gemessen wird)
 TARGET_POINTS = 150      # Punkte pro Bahn
+MAX_3D_PUNKTE = 200      # 3D: größere Flächen werden blockweise gemittelt gezeichnet
+KRIGING_SCHRITT = 0.01   # m, X-Raster zwischen den Bahnen mit --kriging
+
+# Bahnen werden aus dem Ordner gelesen (lane_index.py): Accelerometer_*_N.csv
+# wird mit Magnetometer_*_N.csv gepaart, start_x = (N - 1) * 0.08 m
+# (abweichender Abstand über bahnen.json im Messordner).
+MESSORDNER = 'Tisch_Scheune_magnetisch'
+
+# --- Batch-Modus: alle Datensätze, Pfade relativ zu diesem Skript ---
+BASIS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def finde_datensaetze(wurzel=BASIS_DIR):
+    """Alle Messordner mit Bahnen: {Name: [Bahnen]} (Index wird zwischengespeichert)."""
+    return index_campaign(wurzel)
 
-MESSUNGEN = [
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_1.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_1.csv', 
-        'start_x': 0.00 
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_2.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_2.csv', 
-        'start_x': 0.08
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_3.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_3.csv', 
-        'start_x': 0.16  
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_4.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_4.csv', 
-        'start_x': 0.24  
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_5.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_5.csv', 
-        'start_x': 0.32  
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_6.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_6.csv', 
-        'start_x': 0.40  
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_7.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_7.csv', 
-        'start_x': 0.48  
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_8.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_8.csv', 
-        'start_x': 0.56  
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_9.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_9.csv', 
-        'start_x': 0.64  
-    },
-    {
-        'acc_file': 'Tisch_Scheune_magnetisch/Accelerometer_Tisch_magnetisch_10.csv', 
-        'mag_file': 'Tisch_Scheune_magnetisch/Magnetometer_Tisch_magnetisch_10.csv', 
-        'start_x': 0.72  
-    },
-   
-]
+def lade_datensaetze(namen):
+    """Name eines Messordners unter BASIS_DIR oder beliebiger Pfad -> Bahnen."""
+    datensaetze = {}
+    for name in namen:
+        ordner = name if os.path.isdir(name) else os.path.join(BASIS_DIR, name)
+        datensaetze[os.path.basename(os.path.normpath(name))] = index_session(ordner)
+    return datensaetze
 
 def lade_csv_raw(pfad, typ='acc'):
     try:
-        df = pd.read_csv(pfad) 
+        # Zwischengespeichert (Cache), bereits nach Zeit sortiert
+        df = load_phyphox(pfad)[['Time', 'x', 'y', 'z']]
         if typ == 'acc':
-            df = df.iloc[:, :4]
             df.columns = ['Time', 'ax', 'ay', 'az']
         else: 
-            df = df.iloc[:, :4]
             df.columns = ['Time', 'mx', 'my', 'mz']
-        
-        df['Time'] = df['Time'].astype(float)
-        df = df.sort_values('Time')
         return df
     except Exception as e:
         print(f"Fehler bei {pfad}: {e}")
         return None
 
-def resample_to_fixed_length(df, num_points):
+def resample_bahnen(werte, offsets, num_points):
     """
-    Nimmt eine Bahn beliebiger Länge und interpoliert sie auf exakt 'num_points'.
+    Resampelt alle Bahnen auf einmal: werte ist die Aneinanderreihung aller
+    Bahnen, Bahn i liegt in werte[offsets[i]:offsets[i+1]]. Gibt die Matrix
+    (Bahnen x num_points) zurück. Lineare Interpolation auf der Index-Achse
+    0..n-1 wie interp1d im früheren resample_to_fixed_length (jetzt Referenz
+    in benchmarks/run_suite.py); gleich bis auf Rundung (~1e-16), nicht
+    bitgleich. Bahnen mit einem Punkt werden konstant fortgesetzt.
     """
-    if len(df) < 2: return df 
-
-    
-    old_indices = np.arange(len(df))
-    new_indices = np.linspace(0, len(df) - 1, num_points)
-    df_new = pd.DataFrame()
-
-   
-    for col in ['global_x', 'global_y', 'Magnet_Betrag']:
-        if col in df.columns:
-            f = interpolate.interp1d(old_indices, df[col], kind='linear')
-            df_new[col] = f(new_indices)
-
-    return df_new
-
-
+    werte = np.asarray(werte, dtype=float)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n = np.diff(offsets)
+    out = np.empty((len(n), num_points))
+    if len(n) == 0:
+        return out
+
+    # Neue Indizes wie np.linspace(0, n-1, num_points) je Bahn
+    schritt = (n - 1) / max(num_points - 1, 1)
+    t = np.arange(num_points) * schritt[:, None]
+    t[:, -1] = n - 1
+
+    # Intervall wie interp1d: searchsorted(side='left') - 1, begrenzt auf [0, n-2]
+    lo = np.clip(np.ceil(t).astype(np.int64) - 1, 0, np.maximum(n - 2, 0)[:, None])
+    hi = np.minimum(lo + 1, (n - 1)[:, None])
+    y_lo = werte[offsets[:-1, None] + lo]
+    y_hi = werte[offsets[:-1, None] + hi]
+    np.multiply(y_hi - y_lo, t - lo, out=out)
+    out += y_lo
+    return out
+
+
+@timed('integrate', samples=len)
 def berechne_pfad_y_forced(df_acc):
     dt = df_acc['Time'].diff().mean()
     if pd.isna(dt) or dt == 0: dt = 0.002
     
     df_acc['pos_x'] = 0.0 # Keine X-Bewegung
     
-    
-    vy = integrate.cumulative_trapezoid(df_acc['ay'], dx=dt, initial=0)
-    vy = signal.detrend(vy, type='linear')
-    py_raw = integrate.cumulative_trapezoid(vy, dx=dt, initial=0)
-    
-   
-    if abs(py_raw[-1]) > 0.01:
-        scale_factor = REAL_DISTANCE_Y / py_raw[-1]
-        py_corrected = py_raw * scale_factor
-        if py_corrected[-1] < 0: py_corrected *= -1
-        df_acc['pos_y'] = py_corrected
-    else:
-        df_acc['pos_y'] = np.linspace(0, REAL_DISTANCE_Y, len(df_acc))
+    # Integration, Detrend und Skalierung auf REAL_DISTANCE_Y (dead_reckoning.py)
+    df_acc['pos_y'] = integrate_forced(df_acc['ay'].to_numpy(), dt, REAL_DISTANCE_Y)
     
     return df_acc
 
-def main():
-    magnet_matrix_list = []
-    x_positions = []
-
-    print(f"Verarbeite Bahnen (Ziel: {TARGET_POINTS} Punkte auf {REAL_DISTANCE_Y}m)...")
-
-    for i, bahn in enumerate(MESSUNGEN):
+def verarbeite_bahn(bahn):
+    """
+    Laden, Integration und Synchronisation einer Bahn.
+    Gibt die Magnetwerte (Rohpunkte) zurück, oder None wenn leer.
+    """
+    with stage('load') as st:
         df_acc = lade_csv_raw(bahn['acc_file'], typ='acc')
         df_mag = lade_csv_raw(bahn['mag_file'], typ='mag')
+        if df_acc is None or df_mag is None:
+            return None
+        st.samples = len(df_acc) + len(df_mag)
+
+    df_acc = berechne_pfad_y_forced(df_acc)
+    with stage('sync', len(df_mag)):
+        df_mag['Magnet_Betrag'] = np.sqrt(df_mag['mx']**2 + df_mag['my']**2 + df_mag['mz']**2)
         
-        if df_acc is not None and df_mag is not None:
-            df_acc = berechne_pfad_y_forced(df_acc)
-            df_mag['Magnet_Betrag'] = np.sqrt(df_mag['mx']**2 + df_mag['my']**2 + df_mag['mz']**2)
-            
-            df_final = pd.merge_asof(
-                df_mag, df_acc[['Time', 'pos_x', 'pos_y']], 
-                on='Time', direction='nearest', tolerance=0.1
-            ).dropna(subset=['pos_y'])
-
-            if not df_final.empty:
-                df_final['global_x'] = bahn['start_x']
-                df_final['global_y'] = df_final['pos_y']
-
-                df_resampled = resample_to_fixed_length(df_final, TARGET_POINTS)
-                magnet_matrix_list.append(df_resampled['Magnet_Betrag'].values)
-                x_positions.append(bahn['start_x'])
-                
-                print(f" -> Bahn {i+1}: {len(df_final)} -> {len(df_resampled)} Punkte resampled.")
-            else:
-                print(f" -> Bahn {i+1}: Leer.")
-
-    if not magnet_matrix_list:
-        print("Keine Daten.")
+        # Nächster acc-Zeitpunkt je Magnetometer-Zeile (wie merge_asof nearest, tolerance=0.1)
+        pos_y = Alignment(df_acc['Time'].to_numpy(), df_mag['Time'].to_numpy()).nearest(
+            df_acc['pos_y'].to_numpy(), tolerance=0.1)
+        gueltig = ~np.isnan(pos_y)
+
+    if not gueltig.any():
+        return None
+
+    return df_mag['Magnet_Betrag'].to_numpy()[gueltig]
+
+def berechne_bahnen(messungen, workers=1):
+    """verarbeite_bahn für alle Bahnen, bei workers > 1 parallel in einem Prozess-Pool."""
+    if workers > 1 and len(messungen) > 1:
+        chunksize = max(1, len(messungen) // (4 * workers))
+        # Stufen in den Worker-Prozessen werden nicht erfasst, nur der Pool als Ganzes
+        with stage('bahnen_pool', len(messungen)), ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() liefert die Ergebnisse in Bahn-Reihenfolge
+            return list(pool.map(verarbeite_bahn, messungen, chunksize=chunksize))
+    return [verarbeite_bahn(bahn) for bahn in messungen]
+
+def verarbeite_messungen(messungen, workers=1, ergebnisse=None):
+    """Setzt die Heatmap-Matrix (Bahnen x TARGET_POINTS) in Bahn-Reihenfolge zusammen."""
+    if ergebnisse is None:
+        ergebnisse = berechne_bahnen(messungen, workers)
+
+    bahnen = []
+    x_positions = []
+    for i, (bahn, werte) in enumerate(zip(messungen, ergebnisse)):
+        if werte is None:
+            print(f" -> Bahn {i+1}: Leer.")
+            continue
+        bahnen.append(werte)
+        x_positions.append(bahn['start_x'])
+        print(f" -> Bahn {i+1}: {len(werte)} -> {TARGET_POINTS} Punkte resampled.")
+
+    with stage('resample') as st:
+        offsets = np.zeros(len(bahnen) + 1, dtype=np.int64)
+        np.cumsum([len(w) for w in bahnen], out=offsets[1:])
+        werte = np.concatenate(bahnen) if bahnen else np.empty(0)
+        st.samples = len(werte)
+        return resample_bahnen(werte, offsets, TARGET_POINTS), x_positions
+
+def fuelle_zwischen_bahnen(magnet_matrix, x_positions, schritt=KRIGING_SCHRITT, laenge=None):
+    """
+    Kriging der Bahnpunkte auf ein feines X-Raster zwischen den Bahnen
+    (kriging.py, Nachbarn aus den Bahnen links und rechts). Gibt Mittelwert
+    und Varianz (µT²) als Matrizen (len(x_fein) x Punkte pro Bahn) und x_fein zurück.
+    """
+    laenge = REAL_DISTANCE_Y if laenge is None else laenge
+    y_vals = np.linspace(0, laenge, magnet_matrix.shape[1])
+    x_positions = np.asarray(x_positions, dtype=float)
+    x_fein = np.arange(x_positions.min(), x_positions.max() + schritt / 2, schritt)
+    X, Y = np.meshgrid(x_positions, y_vals, indexing='ij')
+    Xf, Yf = np.meshgrid(x_fein, y_vals, indexing='ij')
+    with stage('kriging', Xf.size):
+        mittel, varianz = krige(X, Y, magnet_matrix, Xf, Yf)
+    return mittel, varianz, x_fein
+
+def speichere_matrix(pfad, magnet_matrix, x_positions, kriging=None):
+    """Matrix als .npz; mit kriging (Schritt in m) zusätzlich die Kriging-Karte und ihre Varianz."""
+    daten = dict(magnet_matrix=magnet_matrix, x_positions=np.array(x_positions),
+                 y=np.linspace(0, REAL_DISTANCE_Y, TARGET_POINTS))
+    if kriging:
+        daten['kriging_mittel'], daten['kriging_varianz'], daten['kriging_x'] = fuelle_zwischen_bahnen(
+            magnet_matrix, x_positions, kriging)
+    with stage('save', magnet_matrix.size):
+        np.savez(pfad, **daten)
+    print(f"Gespeichert: {pfad}")
+
+def batch(namen, workers=1, out_dir='.', chunked=False, chunk_rows=CHUNK_ROWS, kriging=None):
+    """Verarbeitet mehrere Datensätze ohne Rückfragen und speichert die Matrizen."""
+    os.makedirs(out_dir, exist_ok=True)
+    with stage('index'):
+        datensaetze = lade_datensaetze(namen)
+    if chunked:
+        # Sehr lange Bahnen: blockweise, eine Bahn nach der anderen (lane_stream.py)
+        for name, messungen in datensaetze.items():
+            print(f"\n=== {name} (blockweise) ===")
+            with stage('chunked', len(messungen)):
+                magnet_matrix, x_positions = verarbeite_messungen_chunked(
+                    messungen, os.path.join(out_dir, name), REAL_DISTANCE_Y, TARGET_POINTS, chunk_rows)
+            if len(magnet_matrix) == 0:
+                print("Keine Daten.")
+                continue
+            speichere_matrix(os.path.join(out_dir, f"{name}_matrix.npz"), magnet_matrix, x_positions, kriging)
         return
 
+    # Ein Pool für die Bahnen aller Datensätze
+    alle = [bahn for messungen in datensaetze.values() for bahn in messungen]
+    ergebnisse = berechne_bahnen(alle, workers)
+
+    start = 0
+    for name, messungen in datensaetze.items():
+        print(f"\n=== {name} ===")
+        magnet_matrix, x_positions = verarbeite_messungen(
+            messungen, ergebnisse=ergebnisse[start:start + len(messungen)])
+        start += len(messungen)
+        if len(magnet_matrix) == 0:
+            print("Keine Daten.")
+            continue
+        speichere_matrix(os.path.join(out_dir, f"{name}_matrix.npz"), magnet_matrix, x_positions, kriging)
+
+def messe_speedup(namen, kerne):
+    """Laufzeit aller gewählten Datensätze je Anzahl Prozesse; Speed-up relativ zum gemessenen seriellen Lauf."""
+    messungen = [bahn for lanes in lade_datensaetze(namen).values() for bahn in lanes]
+    berechne_bahnen(messungen)   # Aufwärmen (Cache füllen)
+    kerne = sorted(set(kerne) | {1})   # seriell immer mitmessen
+    zeiten = {}
+    for n in kerne:
+        t0 = time.perf_counter()
+        berechne_bahnen(messungen, n)
+        zeiten[n] = time.perf_counter() - t0
+    basis = zeiten[1]
+    print(f"\n{'Prozesse':>8} {'Zeit (s)':>9} {'Speed-up':>9}  ({len(messungen)} Bahnen)")
+    for n in kerne:
+        print(f"{n:>8} {zeiten[n]:>9.3f} {basis / zeiten[n]:>8.2f}x")
+    return zeiten
+
+def zeichne_2d(fig, magnet_matrix, x_positions, laenge=None):
+    """2D-Heatmap auf fig (wird vorher geleert, damit eine Figur wiederverwendet werden kann)."""
+    laenge = REAL_DISTANCE_Y if laenge is None else laenge
+    punkte = magnet_matrix.shape[1]
+    fig.clf()
+    fig.set_size_inches(8, 6)
+    ax = fig.add_subplot(111)
+
+    heatmap_data = magnet_matrix 
     
-    def zweiD():
+    sns.heatmap(
+        heatmap_data,
+        ax=ax,
+        cmap='inferno',
+        cbar_kws={'label': 'Magnetfeld (µT)'},
+        xticklabels=False,
+        yticklabels=False
+    )
+    
+    xticks = np.linspace(0, punkte, 6)
+    xlabels = np.linspace(0, laenge, 6)
+    ax.set_xticks(xticks)
+    ax.set_xticklabels([f"{x:.2f}m" for x in xlabels])
+    
+    ax.set_yticks(np.arange(len(x_positions)) + 0.5)
+    ax.set_yticklabels([f"{y:.2f}m" for y in x_positions], rotation=0) 
 
-        def on_key(event):
-            if event.key == ' ':
-                plt.close(fig)
+    ax.set_title(f"Magnetfeld ({punkte} Punkte pro Bahn)")
+    
+    ax.set_xlabel("Y-Position (Länge)")
+    ax.set_ylabel("X-Position (Bahn)")
+    
+    fig.tight_layout()
+    
+    ax.invert_yaxis() 
+    return fig
 
-        heatmap_data = np.array(magnet_matrix_list) 
-        
-        fig = plt.figure(figsize=(8, 6))
-        
-        ax = sns.heatmap(
-            heatmap_data,
-            cmap='inferno',
-            cbar_kws={'label': 'Magnetfeld (µT)'},
-            xticklabels=False,
-            yticklabels=False
-        )
-        
-        xticks = np.linspace(0, TARGET_POINTS, 6)
-        xlabels = np.linspace(0, REAL_DISTANCE_Y, 6)
-        ax.set_xticks(xticks)
-        ax.set_xticklabels([f"{x:.2f}m" for x in xlabels])
-        
-        ax.set_yticks(np.arange(len(x_positions)) + 0.5)
-        ax.set_yticklabels([f"{y:.2f}m" for y in x_positions], rotation=0) 
+def zeichne_3d(fig, magnet_matrix, x_positions):
+    """3D-Oberfläche auf fig (wird vorher geleert)."""
+    from mpl_toolkits.mplot3d import Axes3D
 
-        plt.title(f"Magnetfeld ({TARGET_POINTS} Punkte pro Bahn)")
-        
-        plt.xlabel("Y-Position (Länge)")
-        plt.ylabel("X-Position (Bahn)")
-        
-        fig.canvas.mpl_connect('key_press_event', on_key)
-        plt.tight_layout()
-        
-        plt.gca().invert_yaxis() 
-        
-        plt.show()
+    fig.clf()
+    fig.set_size_inches(10, 8)
 
+    Z = magnet_matrix 
+    x_vals = np.array(x_positions)
+    y_vals = np.linspace(0, REAL_DISTANCE_Y, Z.shape[1])
 
-    def dreiD():
-        from mpl_toolkits.mplot3d import Axes3D
-        from matplotlib import cm
+    X, Y = np.meshgrid(x_vals, y_vals, indexing='ij')
+    # Große Flächen vergröbert (wie die Stufen von tile_pyramid.py), rstride=1 bleibt
+    X, Y, Z = (decimate(a, (MAX_3D_PUNKTE, MAX_3D_PUNKTE)) for a in (X, Y, Z))
 
-        def on_key(event):
-            if event.key == ' ':
-                plt.close(fig)
+    ax = fig.add_subplot(111, projection='3d')
+
+    surf = ax.plot_surface(
+        X, Y, Z,         
+        cmap='inferno',     
+        linewidth=0,      
+        antialiased=True,  
+        rstride=1, cstride=1, 
+        
+    )
 
-        Z = np.array(magnet_matrix_list) 
-        x_vals = np.array(x_positions)
-        y_vals = np.linspace(0, REAL_DISTANCE_Y, TARGET_POINTS)
+    ax.set_title(f"3D Magnetfeld-Topologie ({REAL_DISTANCE_Y}m)")
+    ax.set_xlabel('X: Bahn-Position (m)')
+    ax.set_ylabel('Y: Scan-Länge (m)')
+    ax.set_zlabel('Magnetfeld (µT)')
 
-        X, Y = np.meshgrid(x_vals, y_vals, indexing='ij')
+    ax.view_init(elev=30, azim=-135) 
 
-        fig = plt.figure(figsize=(10, 8))
-        ax = fig.add_subplot(111, projection='3d')
+    fig.colorbar(surf, shrink=0.5, aspect=10, label='Magnetfeld (µT)')
 
-        surf = ax.plot_surface(
-            X, Y, Z,         
-            cmap='inferno',     
-            linewidth=0,      
-            antialiased=True,  
-            rstride=1, cstride=1, 
-            
-        )
+    fig.tight_layout()
+    ax.invert_yaxis()  
+    return fig
 
-        ax.set_title(f"3D Magnetfeld-Topologie ({REAL_DISTANCE_Y}m)")
-        ax.set_xlabel('X: Bahn-Position (m)')
-        ax.set_ylabel('Y: Scan-Länge (m)')
-        ax.set_zlabel('Magnetfeld (µT)')
+def main(ordner=MESSORDNER, kriging=None):
+    with stage('index'):
+        messungen = lade_datensaetze([ordner]).popitem()[1]
+    print(f"Verarbeite {len(messungen)} Bahnen aus {ordner} (Ziel: {TARGET_POINTS} Punkte auf {REAL_DISTANCE_Y}m)...")
+
+    magnet_matrix, x_positions = verarbeite_messungen(messungen)
+
+    if len(magnet_matrix) == 0:
+        print("Keine Daten.")
+        return
 
-        ax.view_init(elev=30, azim=-135) 
+    def on_key(event):
+        if event.key == ' ':
+            plt.close(event.canvas.figure)
 
-        fig.colorbar(surf, shrink=0.5, aspect=10, label='Magnetfeld (µT)')
+    def zweiD():
+        with stage('plot_2d', magnet_matrix.size):
+            fig = zeichne_2d(plt.figure(figsize=(8, 6)), magnet_matrix, x_positions)
+        fig.canvas.mpl_connect('key_press_event', on_key)
+        plt.show()
 
+    def dreiD():
+        matrix, x_werte = magnet_matrix, x_positions
+        if kriging:
+            # Fläche zwischen den Bahnen gefüllt
+            matrix, _, x_werte = fuelle_zwischen_bahnen(magnet_matrix, x_positions, kriging)
+        with stage('plot_3d', matrix.size):
+            fig = zeichne_3d(plt.figure(figsize=(10, 8)), matrix, x_werte)
         fig.canvas.mpl_connect('key_press_event', on_key)
-        plt.tight_layout()
-        plt.gca().invert_yaxis()  
         plt.show()
 
     if (input("2 D? (y/n): ").lower() == 'y'):
@@ -245,7 +352,39 @@ def main():
             dreiD()
 
 if __name__ == "__main__":
-        main()
+    parser = argparse.ArgumentParser(description="Heatmap Tisch Scheune (ohne Argumente: interaktiv)")
+    parser.add_argument('--batch', action='store_true', help="alle/gewählte Datensätze ohne Rückfragen verarbeiten")
+    parser.add_argument('--datensatz', nargs='+',
+                        help="Messordner (Name unter diesem Skript oder Pfad); Standard: alle gefundenen")
+    parser.add_argument('--ordner', default=MESSORDNER, help="Messordner für den interaktiven Modus")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--out', default='batch_output')
+    parser.add_argument('--chunked', action='store_true',
+                        help="Batch blockweise (für sehr lange Aufnahmen, begrenzter Speicher)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--speedup', type=int, nargs='+', metavar='N',
+                        help="Laufzeit für diese Prozess-Anzahlen messen, z.B. --speedup 1 2 4")
+    parser.add_argument('--kriging', type=float, nargs='?', const=KRIGING_SCHRITT, metavar='SCHRITT',
+                        help="Kriging zwischen den Bahnen auf ein X-Raster von SCHRITT m (Standard 0.01): "
+                             "Batch speichert Karte und Varianz, 3D zeigt die gefüllte Fläche")
+    parser.add_argument('--profile', metavar='JSON',
+                        help="Laufzeit, Punkte und Speicher je Stufe als JSON speichern (stage_timer.py); "
+                             "Stufen in Worker-Prozessen nur mit --workers 1")
+    parser.add_argument('--cprofile', action='store_true', help="mit --profile: zusätzlich cProfile je Stufe")
+    args = parser.parse_args()
+    if args.profile:
+        stage_timer.start('heatmap_Tisch_Scheune_magnetisch', cprofile=args.cprofile, out=args.profile)
+    else:
+        stage_timer.from_env('heatmap_Tisch_Scheune_magnetisch')
+    if not args.datensatz:
+        args.datensatz = list(finde_datensaetze())
+
+    if args.speedup:
+        messe_speedup(args.datensatz, args.speedup)
+    elif args.batch:
+        batch(args.datensatz, args.workers, args.out, args.chunked, args.chunk_rows, args.kriging)
+    else:
+        main(args.ordner, args.kriging)
 
 
 
@@ -0,0 +1,142 @@
+import json
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import phyphox_loader
+
+# Accelerometer_Scheune_1.csv, Magnetometer_Tisch_magnetisch_langsam_10.csv,
+# Accelerometer_1548_1.csv (Tisch_ETZ: Uhrzeit vor der Bahnnummer)
+LANE_PATTERN = re.compile(r'^(Accelerometer|Magnetometer)_(?:(.+)_)?(\d+)\.csv$')
+
+DEFAULT_SPACING = 0.08      # Abstand der Bahnen (m)
+SIDECAR = 'bahnen.json'     # optional: {"abstand": 0.1, "start_x": 0.0}
+
+
+def _lane_files(ordner):
+    """Sucht Lane-CSVs im Ordner, sonst eine Ebene tiefer (Tisch_X/Tisch_X/...)."""
+    entries = [e for e in os.scandir(ordner) if e.is_file() and LANE_PATTERN.match(e.name)]
+    if entries:
+        return ordner, entries
+    for sub in sorted(os.scandir(ordner), key=lambda e: e.name):
+        if sub.is_dir():
+            entries = [e for e in os.scandir(sub.path) if e.is_file() and LANE_PATTERN.match(e.name)]
+            if entries:
+                return sub.path, entries
+    return ordner, []
+
+
+def _sidecars(ordner, daten_ordner):
+    """Mögliche bahnen.json: im Sitzungsordner, dann im Datenordner."""
+    return [os.path.join(ordner, SIDECAR), os.path.join(daten_ordner, SIDECAR)]
+
+
+def _stand(pfad):
+    """mtime und Größe für den Cache-Schlüssel, 'fehlt' wenn es die Datei nicht gibt."""
+    try:
+        st = os.stat(pfad)
+    except FileNotFoundError:
+        return 'fehlt'
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def scan_session(ordner, abstand=None):
+    """
+    Paart Accelerometer_*_N.csv mit Magnetometer_*_N.csv ohne die Dateien zu
+    öffnen. Reihenfolge nach Bahnnummer N; start_x = (N - N_min) * Abstand,
+    d.h. Lücken in der Nummerierung bleiben als Lücken erhalten.
+    """
+    ordner = os.path.abspath(ordner)
+    daten_ordner, entries = _lane_files(ordner)
+
+    params = {}
+    for kandidat in _sidecars(ordner, daten_ordner):
+        if os.path.exists(kandidat):
+            with open(kandidat) as f:
+                params = json.load(f)
+            break
+    if abstand is None:
+        abstand = params.get('abstand', DEFAULT_SPACING)
+    start = params.get('start_x', 0.0)
+
+    paare = {}
+    for e in entries:
+        typ, kennung, nummer = LANE_PATTERN.match(e.name).groups()
+        key = (int(nummer), kennung or '')
+        paare.setdefault(key, {})[typ] = e
+
+    lanes = []
+    nummern = [n for (n, _), p in paare.items() if len(p) == 2]
+    n_min = min(nummern) if nummern else 0
+    for (nummer, kennung), p in sorted(paare.items()):
+        if len(p) != 2:
+            fehlt = 'Magnetometer' if 'Accelerometer' in p else 'Accelerometer'
+            print(f"Warnung: Bahn {nummer} ({kennung}) ohne {fehlt}-Datei, übersprungen.")
+            continue
+        acc, mag = p['Accelerometer'], p['Magnetometer']
+        lanes.append({
+            'lane': nummer,
+            'kennung': kennung,
+            'acc_file': acc.path,
+            'mag_file': mag.path,
+            'start_x': round(start + (nummer - n_min) * abstand, 6),
+            'bytes': acc.stat().st_size + mag.stat().st_size,
+        })
+    return lanes
+
+
+def index_session(ordner, abstand=None, use_cache=True):
+    """
+    Wie scan_session, aber mit zwischengespeichertem Index (JSON im
+    phyphox_loader-Cache). Der Schlüssel enthält die mtime des Daten- und des
+    Sitzungsordners, die sich ändern, sobald Dateien hinzukommen oder
+    verschwinden, sowie mtime und Größe beider möglicher bahnen.json.
+    """
+    ordner = os.path.abspath(ordner)
+    daten_ordner, _ = _lane_files(ordner)
+    if not use_cache:
+        return scan_session(ordner, abstand)
+
+    stand = '|'.join(_stand(p) for p in [ordner] + _sidecars(ordner, daten_ordner))
+    key = phyphox_loader.cache_key(daten_ordner, tag=f'lanes|{abstand}|{stand}')
+    pfad = phyphox_loader.cache_path(key, '.json')
+    if os.path.exists(pfad):
+        try:
+            with open(pfad) as f:
+                lanes = json.load(f)
+            phyphox_loader.touch(pfad)
+            return lanes
+        except (OSError, ValueError):
+            pass
+
+    lanes = scan_session(ordner, abstand)
+    try:
+        os.makedirs(phyphox_loader.CACHE_DIR, exist_ok=True)
+        tmp = f"{pfad}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(lanes, f)
+        os.replace(tmp, pfad)
+        phyphox_loader.evict()
+    except OSError as e:
+        print(f"Warnung: Index für {ordner} nicht gespeichert: {e}")
+    return lanes
+
+
+def index_campaign(wurzel, use_cache=True):
+    """Alle Sitzungsordner unter wurzel, die Bahnen enthalten: {Name: [Bahnen]}."""
+    kampagne = {}
+    for e in sorted(os.scandir(wurzel), key=lambda e: e.name):
+        if e.is_dir() and not e.name.startswith('.'):
+            lanes = index_session(e.path, use_cache=use_cache)
+            if lanes:
+                kampagne[e.name] = lanes
+    return kampagne
+
+
+if __name__ == "__main__":
+    ordner = sys.argv[1] if len(sys.argv) > 1 else os.path.dirname(os.path.abspath(__file__))
+    for name, lanes in index_campaign(ordner).items():
+        print(f"{name}: {len(lanes)} Bahnen, "
+              f"x = {lanes[0]['start_x']:.2f} .. {lanes[-1]['start_x']:.2f} m, "
+              f"{sum(l['bytes'] for l in lanes) / 1e6:.1f} MB")
@@ -0,0 +1,254 @@
+"""
+Out-of-core Variante von verarbeite_bahn für sehr lange Bahnen: die CSVs
+werden in Blöcken gelesen, Integration und Zuordnung tragen ihren Zustand
+über Blockgrenzen, die resampelte Bahn wird direkt in die Ausgabe geschrieben.
+Der Speicherbedarf hängt nur von chunk_rows ab, nicht von der Bahnlänge.
+
+Zwei Durchläufe über beide Dateien, gleiche Rechnung wie
+berechne_pfad_y_forced + merge_asof + resample_bahnen:
+  1. Laufende Summen über vy (linearer Detrend und Skalierung aus
+     geschlossenen Formeln) und Anzahl der zugeordneten Magnetometer-Zeilen.
+  2. Position blockweise, Nearest-Join, Resampling auf num_points.
+Voraussetzung: beide CSVs sind nach Zeit sortiert (wie Phyphox exportiert).
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from time_align import Alignment
+
+TARGET_POINTS = 150
+TOLERANCE = 0.1           # merge_asof(direction='nearest', tolerance=0.1)
+CHUNK_ROWS = 65536
+
+
+def read_chunks(pfad, usecols, chunk_rows=CHUNK_ROWS):
+    """Phyphox-CSV blockweise als float64-Arrays (Spalten in Datei-Reihenfolge)."""
+    for chunk in pd.read_csv(pfad, usecols=sorted(usecols), chunksize=chunk_rows, engine='c'):
+        yield chunk.to_numpy(dtype=np.float64)
+
+
+def _cumtrapz(y, dt, y_prev, start):
+    """cumulative_trapezoid(initial=0) eines Blocks, fortgesetzt ab (y_prev, start)."""
+    inc = np.empty_like(y)
+    inc[0] = 0.0 if y_prev is None else (y[0] + y_prev) * dt / 2
+    inc[1:] = (y[1:] + y[:-1]) * dt / 2
+    return start + np.cumsum(inc)
+
+
+# --- Nearest-Join ---
+
+def nearest_join(acc_chunks, mag_chunks, tolerance=TOLERANCE):
+    """
+    Streaming-Version von merge_asof(mag, acc, direction='nearest') + dropna:
+    acc_chunks liefert (Zeit, Wert), mag_chunks (Zeit, Wert); ausgegeben
+    werden (Wert_acc, Wert_mag) der zugeordneten Magnetometer-Zeilen.
+    Gleichstand geht wie bei pandas an den früheren acc-Wert.
+    """
+    acc_t = np.empty(0)
+    acc_v = np.empty(0)
+    acc_iter = iter(acc_chunks)
+    acc_done = False
+
+    for mag_t, mag_v in mag_chunks:
+        if len(mag_t) == 0:
+            continue
+        # acc-Puffer bis hinter die letzte Magnetometer-Zeit füllen
+        while not acc_done and (len(acc_t) == 0 or acc_t[-1] < mag_t[-1]):
+            try:
+                t, v = next(acc_iter)
+            except StopIteration:
+                acc_done = True
+                break
+            acc_t = np.concatenate((acc_t, t))
+            acc_v = np.concatenate((acc_v, v))
+        if len(acc_t) == 0:
+            continue
+
+        al = Alignment(acc_t, mag_t)
+        ok = al.matched(tolerance)
+        if ok.any():
+            yield acc_v[al.nearest_idx[ok]], mag_v[ok]
+
+        # Nur ab dem Rückwärts-Kandidaten der letzten Zeit weiter nötig
+        keep = max(al.lo[-1], 0)
+        acc_t, acc_v = acc_t[keep:], acc_v[keep:]
+
+
+# --- Resampling ---
+
+class StreamResampler:
+    """
+    Index-Resampling wie resample_bahnen (linear auf 0..n-1),
+    wobei die n Werte blockweise ankommen. n muss vorher bekannt sein.
+    """
+
+    def __init__(self, n, num_points, n_cols):
+        self.n = n
+        self.num_points = num_points
+        if n >= 2:
+            t = np.arange(num_points) * ((n - 1) / max(num_points - 1, 1))
+            t[-1] = n - 1
+            self.t = t
+            self.lo = np.clip(np.ceil(t).astype(np.int64) - 1, 0, n - 2)
+        else:
+            self.t = np.zeros(num_points)
+            self.lo = np.zeros(num_points, dtype=np.int64)
+        self.out = np.empty((num_points, n_cols))
+        self.offset = 0          # globaler Index des ersten Werts im aktuellen Block
+        self.last = None         # letzter Wert des vorigen Blocks
+        self.done = 0            # Anzahl fertiger Ausgabepunkte
+
+    def feed(self, werte):
+        """Nimmt einen Block (m, n_cols) und berechnet die damit fertigen Ausgabepunkte."""
+        m = len(werte)
+        if m == 0:
+            return
+        # Fertig sind alle Punkte, deren oberer Stützwert im Puffer liegt
+        end = self.offset + m
+        hi_needed = np.minimum(self.lo + 1, max(self.n - 1, 0))
+        stop = int(np.searchsorted(hi_needed, end - 1, side='right'))
+        k = np.arange(self.done, stop)
+        if len(k):
+            buf = werte if self.last is None else np.vstack((self.last, werte))
+            base = self.offset - (0 if self.last is None else 1)
+            lo = self.lo[k]
+            hi = hi_needed[k]
+            y_lo = buf[lo - base]
+            y_hi = buf[hi - base]
+            self.out[k] = (y_hi - y_lo) * (self.t[k] - lo)[:, None] + y_lo
+        self.offset = end
+        self.last = werte[-1:]
+        self.done = stop
+
+
+# --- Bahn ---
+
+def verarbeite_bahn_chunked(bahn, length, num_points=TARGET_POINTS, chunk_rows=CHUNK_ROWS,
+                            tolerance=TOLERANCE):
+    """
+    Wie verarbeite_bahn + resample_bahnen, aber blockweise; length ist
+    die Bahnlänge in m (REAL_DISTANCE_Y des aufrufenden Skripts). Gibt ein Array (num_points, 2) mit Magnet_Betrag und global_y zurück,
+    None wenn keine Zeile zugeordnet wurde.
+    """
+    # --- Durchlauf 1 ---
+    # vy ist linear in dt: Summen mit dt = 1 sammeln, dt erst am Ende bekannt
+    st = {'n': 0, 't0': None, 't1': None, 's_u': 0.0, 's_iu': 0.0, 'u0': None, 'u1': None}
+
+    def acc_zeiten():
+        a_prev, u_end = None, 0.0
+        for block in read_chunks(bahn['acc_file'], [0, 2], chunk_rows):
+            u = _cumtrapz(block[:, 1], 1.0, a_prev, u_end)
+            i = np.arange(st['n'], st['n'] + len(u), dtype=np.float64)
+            st['s_u'] += u.sum()
+            st['s_iu'] += (i * u).sum()
+            if st['t0'] is None:
+                st['t0'], st['u0'] = block[0, 0], u[0]
+            st['t1'], st['u1'] = block[-1, 0], u[-1]
+            st['n'] += len(u)
+            a_prev, u_end = block[-1, 1], u[-1]
+            yield block[:, 0], block[:, 0]
+
+    def mag_zeiten():
+        for block in read_chunks(bahn['mag_file'], [0], chunk_rows):
+            yield block[:, 0], block[:, 0]
+
+    acc = acc_zeiten()
+    n_matched = sum(len(m) for m, _ in nearest_join(acc, mag_zeiten(), tolerance))
+    for _ in acc:
+        pass   # Rest nach der letzten Magnetometer-Zeit (für die Summen)
+    n = st['n']
+    if n_matched == 0 or n == 0:
+        return None
+
+    # df['Time'].diff().mean() (bis auf Rundung)
+    dt = (st['t1'] - st['t0']) / (n - 1) if n > 1 else np.nan
+    if np.isnan(dt) or dt == 0:
+        dt = 0.002
+
+    # signal.detrend(type='linear'): Kleinste-Quadrate-Gerade a + b*i durch vy
+    s_v, s_iv = dt * st['s_u'], dt * st['s_iu']
+    s_i = n * (n - 1) / 2
+    s_ii = (n - 1) * n * (2 * n - 1) / 6
+    denom = n * s_ii - s_i ** 2
+    b = (n * s_iv - s_i * s_v) / denom if denom else 0.0
+    a = (s_v - b * s_i) / n
+    # py_raw[-1] = dt * (Summe vd - (vd[0] + vd[-1]) / 2)
+    s_vd = s_v - n * a - b * s_i
+    p_end = dt * (s_vd - ((dt * st['u0'] - a) + (dt * st['u1'] - a - b * (n - 1))) / 2)
+    scale = length / p_end if abs(p_end) > 0.01 else None   # sonst linspace(0, length, n)
+
+    # --- Durchlauf 2 ---
+    def acc_positionen():
+        a_prev, v_end, vd_prev, p_end_, i0 = None, 0.0, None, 0.0, 0
+        for block in read_chunks(bahn['acc_file'], [0, 2], chunk_rows):
+            i = np.arange(i0, i0 + len(block), dtype=np.float64)
+            if scale is None:
+                p = i * (length / (n - 1)) if n > 1 else np.zeros(len(block))
+            else:
+                v = _cumtrapz(block[:, 1], dt, a_prev, v_end)
+                vd = v - (a + b * i)
+                p_raw = _cumtrapz(vd, dt, vd_prev, p_end_)
+                a_prev, v_end, vd_prev, p_end_ = block[-1, 1], v[-1], vd[-1], p_raw[-1]
+                p = p_raw * scale
+            i0 += len(block)
+            yield block[:, 0], p
+
+    def mag_betrag():
+        for block in read_chunks(bahn['mag_file'], [0, 1, 2, 3], chunk_rows):
+            yield block[:, 0], np.sqrt(block[:, 1] ** 2 + block[:, 2] ** 2 + block[:, 3] ** 2)
+
+    res = StreamResampler(n_matched, num_points, 2)
+    for pos, betrag in nearest_join(acc_positionen(), mag_betrag(), tolerance):
+        res.feed(np.column_stack((betrag, pos)))
+    return res.out
+
+
+def _kuerze(tmp, pfad, zeilen):
+    """Schreibt die ersten zeilen Zeilen der .npy tmp nach pfad und löscht tmp."""
+    quelle = np.load(tmp, mmap_mode='r')
+    if zeilen == len(quelle):
+        del quelle
+        os.replace(tmp, pfad)
+    else:
+        ziel = np.lib.format.open_memmap(pfad, mode='w+', shape=(zeilen,) + quelle.shape[1:])
+        ziel[:] = quelle[:zeilen]
+        ziel.flush()
+        del quelle, ziel
+        os.remove(tmp)
+    return np.load(pfad, mmap_mode='r')
+
+
+def verarbeite_messungen_chunked(messungen, out_prefix, length, num_points=TARGET_POINTS,
+                                 chunk_rows=CHUNK_ROWS):
+    """
+    Alle Bahnen nacheinander; die Matrizen (nicht leere Bahnen x num_points)
+    werden inkrementell in temporäre Dateien geschrieben und am Ende als
+    <out_prefix>_magnet.npy und <out_prefix>_y.npy ohne die Zeilen leerer
+    Bahnen abgelegt. Gibt (Magnet-Matrix als memmap, x_positions) zurück.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(out_prefix)), exist_ok=True)
+    magnet = np.lib.format.open_memmap(f"{out_prefix}_magnet.tmp.npy", mode='w+',
+                                       shape=(len(messungen), num_points))
+    pos_y = np.lib.format.open_memmap(f"{out_prefix}_y.tmp.npy", mode='w+',
+                                      shape=(len(messungen), num_points))
+    x_positions = []
+    zeile = 0
+    for i, bahn in enumerate(messungen):
+        ergebnis = verarbeite_bahn_chunked(bahn, length, num_points, chunk_rows)
+        if ergebnis is None:
+            print(f" -> Bahn {i+1}: Leer.")
+            continue
+        magnet[zeile] = ergebnis[:, 0]
+        pos_y[zeile] = ergebnis[:, 1]
+        x_positions.append(bahn['start_x'])
+        zeile += 1
+        print(f" -> Bahn {i+1}: -> {num_points} Punkte resampled (blockweise).")
+    magnet.flush()
+    pos_y.flush()
+    del magnet, pos_y
+    _kuerze(f"{out_prefix}_y.tmp.npy", f"{out_prefix}_y.npy", zeile)
+    return _kuerze(f"{out_prefix}_magnet.tmp.npy", f"{out_prefix}_magnet.npy", zeile), x_positions
@@ -0,0 +1,127 @@
+"""
+Benchmark: region and time-window queries on campaign_store.py vs. scanning,
+on a synthetic campaign of many table scans (raster paths in cm, 100 Hz
+magnetometer stream per session):
+
+  region   "all |B| samples inside this rectangle across all sessions":
+           spatial grid index vs. a full scan of every session's memory-mapped
+           points vs. re-reading one CSV per session (pd.read_csv)
+  time     one time window of one stream: binary search vs. loading + masking
+
+    python benchmarks/bench_campaign_store.py --sessions 20 100 --points 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from campaign_store import CampaignStore  # noqa: E402
+
+
+def best_of(fn, repeat):
+    best, result = np.inf, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def synthetic_store(root, sessions, points, csv_dir=None, seed=0):
+    rng = np.random.default_rng(seed)
+    store = CampaignStore(root)
+    for k in range(sessions):
+        t = np.arange(points) * 0.01
+        # Raster over a 160 x 100 cm table with a little jitter per session
+        x = 60 + 160 * np.abs(((t / 8.0) % 2) - 1) + rng.normal(0, 0.5, points)
+        y = 10 + 100 * (t / t[-1]) + rng.normal(0, 0.5, points)
+        b = 48 + 20 * np.exp(-((x - 130) ** 2 + (y - 60) ** 2) / 400) + rng.normal(0, 0.3, points)
+        name = f"scan{k:04d}"
+        store.add_stream(name, 'magnetometer', {'Time': t, 'x': b, 'y': b, 'z': b, 'abs': b}, 'Time', kind='table')
+        store.add_points(name, x, y, b, t, frame='table_cm')
+        if csv_dir:
+            pd.DataFrame({'Time_s': t, 'S1': x, 'S2': y, 'B_abs': b}).to_csv(
+                os.path.join(csv_dir, name + '.csv'), index=False)
+    store.commit()
+    return store
+
+
+def region_scan(store, rect):
+    xmin, xmax, ymin, ymax = rect
+    out = []
+    for s in store.sessions():
+        x, y = store.column(s, 'points', 'x'), store.column(s, 'points', 'y')
+        keep = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+        out.append(np.asarray(store.column(s, 'points', 'b'))[keep])
+    return np.concatenate(out)
+
+
+def region_csv(csv_dir, rect):
+    xmin, xmax, ymin, ymax = rect
+    out = []
+    for name in sorted(os.listdir(csv_dir)):
+        df = pd.read_csv(os.path.join(csv_dir, name))
+        keep = df['S1'].between(xmin, xmax) & df['S2'].between(ymin, ymax)
+        out.append(df.loc[keep, 'B_abs'].to_numpy())
+    return np.concatenate(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[20, 100])
+    parser.add_argument('--points', type=int, default=100000, help="points per session")
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--csv-limit', type=int, default=20, help="only time the CSV path up to this many sessions")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    print(f"{'sessions':>8} {'points':>10} {'build (s)':>9} {'hits':>8} {'index (ms)':>10} {'scan (ms)':>10} "
+          f"{'CSV (ms)':>9} {'vs scan':>8} {'time idx (ms)':>13} {'load+mask (ms)':>14}")
+    for sessions in args.sessions:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_dir = os.path.join(tmp, 'csv') if sessions <= args.csv_limit else None
+            if csv_dir:
+                os.makedirs(csv_dir)
+            t0 = time.perf_counter()
+            store = synthetic_store(os.path.join(tmp, 'db'), sessions, args.points, csv_dir)
+            t_build = time.perf_counter() - t0
+            store = CampaignStore(store.root)
+
+            # Rectangles of ~20 x 10 cm
+            rects = [(x, x + 20, y, y + 10) for x, y in zip(rng.uniform(60, 200, args.queries),
+                                                            rng.uniform(10, 100, args.queries))]
+            t_idx = t_scan = t_csv = 0.0
+            hits = 0
+            for rect in rects:
+                dt, res = best_of(lambda: store.query_region('table_cm', *rect), args.repeat)
+                t_idx += dt
+                dt, ref = best_of(lambda: region_scan(store, rect), 1)
+                t_scan += dt
+                assert np.array_equal(np.sort(res['b']), np.sort(ref))
+                hits += len(ref)
+            if csv_dir:
+                t_csv = sum(best_of(lambda: region_csv(csv_dir, rect), 1)[0] for rect in rects[:3]) / 3 * len(rects)
+
+            # Time window of 10 s in the middle of one stream
+            t_mid = args.points * 0.01 / 2
+            t_ts, _ = best_of(lambda: store.time_slice('scan0000', 'magnetometer', t_mid, t_mid + 10,
+                                                              columns=['abs']), args.repeat)
+            t_lm, _ = best_of(lambda: (lambda t: np.asarray(store.column('scan0000', 'magnetometer', 'abs'))[
+                (t >= t_mid) & (t < t_mid + 10)])(np.asarray(store.column('scan0000', 'magnetometer', 'Time'))),
+                args.repeat)
+
+            q = len(rects)
+            csv = f"{t_csv / q * 1e3:>9.1f}" if csv_dir else f"{'-':>9}"
+            print(f"{sessions:>8} {sessions * args.points:>10} {t_build:>9.1f} {hits // q:>8} "
+                  f"{t_idx / q * 1e3:>10.2f} {t_scan / q * 1e3:>10.1f} {csv} {t_scan / t_idx:>7.0f}x "
+                  f"{t_ts * 1e3:>13.3f} {t_lm * 1e3:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
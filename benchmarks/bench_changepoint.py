@@ -0,0 +1,108 @@
+"""
+Benchmark: scaling of the changepoint detection in
+EXPOM&Accelerometer/changepoint.py on synthetic walking recordings (|B| with
+level changes every ~20 s at 100 Hz plus noise): block PELT + refinement,
+exact PELT (one block per sample) and the online CUSUM fed in 64k chunks,
+against the O(n^2) optimal partitioning PELT prunes. Time per sample should
+stay flat up to 10^7 samples.
+
+    python benchmarks/bench_changepoint.py --samples 10000 100000 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'EXPOM&Accelerometer'))
+from changepoint import _Praefix, cusum, pelt, rauschen, schwelle  # noqa: E402
+
+SEGMENT = 2000        # samples per regime (20 s at 100 Hz)
+MIN_LAENGE = 100
+# wie changepoint.py --online: Mittelwert über die Mindestdauer, Streuung mit halber als lag
+CUSUM = dict(h=schwelle(1e5 * MIN_LAENGE), warmup=MIN_LAENGE, lag=MIN_LAENGE // 2)
+
+
+def best_of(fn, repeat):
+    best, result = np.inf, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def synthetic(n, seed=0):
+    rng = np.random.default_rng(seed)
+    k = -(-n // SEGMENT)
+    laengen = rng.integers(SEGMENT // 2, 3 * SEGMENT // 2, k)
+    grenzen = np.cumsum(laengen)
+    grenzen = grenzen[grenzen < n]
+    stufen = np.repeat(45 + rng.normal(0, 4, len(grenzen) + 1), np.diff(np.r_[0, grenzen, n]))
+    return stufen + rng.normal(0, 0.5, n), grenzen
+
+
+def optimal_partitioning(x, min_laenge):
+    """PELT ohne Pruning: O(n^2) Referenz."""
+    x = x[:, None]
+    x = (x - x.mean(axis=0)) / rauschen(x, min_laenge)
+    n = len(x)
+    beta = 2 * np.log(n)
+    p = _Praefix(x)
+    F = np.full(n + 1, np.inf)
+    F[0] = -beta
+    for t in range(min_laenge, n + 1):
+        s = np.arange(0, t - min_laenge + 1)
+        s = s[(s == 0) | (s >= min_laenge)]
+        F[t] = np.min(F[s] + p.kosten(s, np.full(len(s), t), 'mean')) + beta
+    return F[n]
+
+
+def treffer(gefunden, wahr, toleranz=MIN_LAENGE // 2):
+    """Anteil der wahren Grenzen mit einer gefundenen innerhalb der Toleranz."""
+    if len(wahr) == 0:
+        return 1.0
+    if len(gefunden) == 0:
+        return 0.0
+    i = np.clip(np.searchsorted(gefunden, wahr), 1, len(gefunden) - 1)
+    abstand = np.minimum(np.abs(gefunden[i] - wahr), np.abs(gefunden[i - 1] - wahr))
+    return float(np.mean(abstand <= toleranz))
+
+
+def stationaer(n=10000, seeds=20):
+    """Ohne Wechsel (reines N(0, 1)-Rauschen) darf das Online-CUSUM nie alarmieren."""
+    for seed in range(seeds):
+        g = cusum(np.random.default_rng(seed).normal(0, 1, n), **CUSUM)
+        assert len(g) == 0, f"seed {seed}: {len(g)} Fehlalarme bei {g[:5]}"
+    print(f"stationary: no CUSUM alarm in {seeds} x {n} samples of N(0, 1)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, nargs='+', default=[10000, 100000, 1000000, 10000000])
+    parser.add_argument('--exact-limit', type=int, default=1000000, help="exact PELT up to this many samples")
+    parser.add_argument('--op-limit', type=int, default=10000, help="O(n^2) reference up to this many samples")
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    stationaer()
+
+    print(f"{'samples':>9} {'changes':>7} {'PELT (s)':>9} {'ns/sample':>9} {'recall':>6} {'exact (s)':>9} "
+          f"{'same':>5} {'CUSUM (s)':>9} {'ns/sample':>9} {'recall':>6} {'O(n^2) (s)':>10}")
+    for n in args.samples:
+        x, wahr = synthetic(n)
+        t_pelt, g = best_of(lambda: pelt(x, min_laenge=MIN_LAENGE), args.repeat)
+        if n <= args.exact_limit:
+            t_ex, g_ex = best_of(lambda: pelt(x, min_laenge=MIN_LAENGE, max_bloecke=n + 1), args.repeat)
+            exact = f"{t_ex:>9.2f} {str(np.array_equal(g, g_ex)):>5}"
+        else:
+            exact = f"{'-':>9} {'-':>5}"
+        t_cu, g_cu = best_of(lambda: cusum(x, **CUSUM), args.repeat)
+        op = f"{best_of(lambda: optimal_partitioning(x, MIN_LAENGE), 1)[0]:>10.2f}" if n <= args.op_limit else f"{'-':>10}"
+        print(f"{n:>9} {len(wahr):>7} {t_pelt:>9.2f} {t_pelt / n * 1e9:>9.0f} {treffer(g, wahr):>6.2f} {exact} "
+              f"{t_cu:>9.2f} {t_cu / n * 1e9:>9.0f} {treffer(g_cu, wahr):>6.2f} {op}")
+
+
+if __name__ == "__main__":
+    main()
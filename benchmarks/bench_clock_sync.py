@@ -0,0 +1,100 @@
+"""
+Benchmark: accuracy and run time of Arduino/clock_sync.py on synthetic table
+scans with a known clock offset and drift between the ultrasonic log and
+the magnetometer (raster scan with pauses over a dipole field). The
+recorded tables are estimated by `python Arduino/clock_sync.py`.
+
+    python benchmarks/bench_clock_sync.py --offsets -7.3 -2.1 0.4 3.7 8.2 --drift-ppm 0 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Arduino'))
+from clock_sync import synchronize_scan  # noqa: E402
+from process_table import clean_positions  # noqa: E402
+
+
+def raster_path(duration, rng, speed=20.0):
+    """Back-and-forth lines along S1 (cm) with random pauses at the turns."""
+    knots_t, knots_p = [0.0], [(60.0, 20.0)]
+    s2, forward = 20.0, True
+    while knots_t[-1] < duration:
+        x0, _ = knots_p[-1]
+        x1 = 200.0 if forward else 60.0
+        knots_t.append(knots_t[-1] + abs(x1 - x0) / speed)
+        knots_p.append((x1, s2))
+        knots_t.append(knots_t[-1] + rng.uniform(0.5, 3.0))     # pause
+        knots_p.append((x1, s2))
+        s2 = 20.0 + (s2 + 5.0 - 20.0) % 100.0
+        knots_t.append(knots_t[-1] + 5.0 / speed)
+        knots_p.append((x1, s2))
+        forward = not forward
+    knots_t = np.array(knots_t)
+    knots_p = np.array(knots_p)
+    return lambda t: np.column_stack([np.interp(t, knots_t, knots_p[:, k]) for k in range(2)])
+
+
+def synthetic_scan(duration, offset, drift, seed=0):
+    rng = np.random.default_rng(seed)
+    path = raster_path(duration, rng)
+
+    # Ultrasonic: ~5 lines/s, 1 cm noise, S1 dropouts
+    t_pos = np.cumsum(rng.uniform(0.15, 0.25, int(duration * 5)))
+    t_pos = t_pos[t_pos < duration]
+    pos = path(t_pos) + rng.normal(0, 1.0, (len(t_pos), 2))
+    pos[rng.random(len(t_pos)) < 0.02, 0] = 0.0
+    pos_df = pd.DataFrame({'Time_s': t_pos - t_pos[0], 'S1': pos[:, 0], 'S2': pos[:, 1]})
+
+    # Magnetometer at 100 Hz on its own clock: t_mag = t_pos * (1 + drift) + offset
+    t_mag = np.arange(0.0145, duration * (1 + drift) + offset, 0.01)
+    t_true = (t_mag - offset) / (1 + drift) + t_pos[0]
+    t_mag, t_true = t_mag[t_true >= 0], t_true[t_true >= 0]
+    p = path(t_true)
+    r = np.column_stack((p[:, 0] - 120.0, p[:, 1] - 70.0, np.full(len(p), 15.0)))
+    d = np.linalg.norm(r, axis=1, keepdims=True)
+    m = np.array([0.0, 0.0, 4e6])
+    dipole = (3 * r * (r @ m)[:, None] / d ** 2 - m) / d ** 3
+    field = np.array([-17.5, -23.7, -44.3]) + dipole + rng.normal(0, 0.3, (len(p), 3))
+    mag_df = pd.DataFrame({'Time': t_mag, 'x': field[:, 0], 'y': field[:, 1], 'z': field[:, 2]})
+    return pos_df, mag_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--offsets', type=float, nargs='+', default=[-7.3, -2.1, 0.4, 3.7, 8.2])
+    parser.add_argument('--drift-ppm', type=float, nargs='+', default=[0.0, 1000.0])
+    parser.add_argument('--duration', type=float, default=600.0, help="scan length for the accuracy table (s)")
+    parser.add_argument('--durations', type=float, nargs='+', default=[200.0, 600.0, 3600.0],
+                        help="scan lengths for the run time")
+    args = parser.parse_args()
+
+    print(f"Accuracy, {args.duration:.0f} s scans")
+    print(f"{'offset':>7} {'drift ppm':>9} {'est. offset':>11} {'est. ppm':>9} {'max error (s)':>13} {'confidence':>10}")
+    for drift_ppm in args.drift_ppm:
+        for k, offset in enumerate(args.offsets):
+            pos_df, mag_df = synthetic_scan(args.duration, offset, drift_ppm * 1e-6, seed=k)
+            sync = synchronize_scan(clean_positions(pos_df), mag_df, drift=drift_ppm != 0)
+            # Worst timing error over the scan
+            t = np.array([0.0, pos_df['Time_s'].iloc[-1]])
+            err = np.abs((sync['offset'] + sync['drift'] * t) - (offset + drift_ppm * 1e-6 * t)).max()
+            print(f"{offset:>7.2f} {drift_ppm:>9.0f} {sync['offset']:>11.3f} {sync['drift'] * 1e6:>9.0f} "
+                  f"{err:>13.3f} {sync['confidence']:>10.2f}")
+
+    print("\nRun time per scan (offset + drift)")
+    for duration in args.durations:
+        pos_df, mag_df = synthetic_scan(duration, 2.5, 5e-4)
+        pos_df = clean_positions(pos_df)
+        t0 = time.perf_counter()
+        sync = synchronize_scan(pos_df, mag_df, drift=True)
+        ms = (time.perf_counter() - t0) * 1e3
+        print(f"{duration:>6.0f} s scan ({len(mag_df)} magnetometer rows): {ms:.1f} ms, "
+              f"{sync['segments']} segments, offset {sync['offset']:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
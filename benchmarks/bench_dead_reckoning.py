@@ -0,0 +1,137 @@
+"""
+Benchmark: accuracy of the causal streaming dead reckoning against the
+existing batch methods on the recorded data, and chunk throughput / memory
+of the streaming mode on a long synthetic recording.
+
+    python benchmarks/bench_dead_reckoning.py --samples 10000000 --chunks 256 4096 65536
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import integrate
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'EXPOM&Accelerometer'))
+from dead_reckoning import DeadReckoner, integrate_filtered, integrate_forced, reckon_stream  # noqa: E402
+from lane_index import index_campaign  # noqa: E402
+from phyphox_loader import load_phyphox  # noqa: E402
+
+REAL_DISTANCE_Y = 1.60
+
+
+def scale_to_lane(p):
+    """The forced scaling of integrate_forced (known lane length)."""
+    return p * (REAL_DISTANCE_Y / p[-1]) if abs(p[-1]) > 0.01 else np.linspace(0, REAL_DISTANCE_Y, len(p))
+
+
+def lane_accuracy(chunk_size):
+    """
+    Per session: RMSE of the causal streaming path against the batch lane path
+    (both scaled to the lane length). For scale, the second column compares a
+    batch variant that only swaps the least-squares velocity detrend for an
+    endpoint detrend: the spread between equally plausible batch methods.
+    """
+    print(f"\nTisch_Scheune lanes vs. integrate_forced (RMSE in cm, stream chunk {chunk_size})")
+    print(f"{'session':<34} {'lanes':>5} {'stream':>8} {'endpoint-detrend batch':>23}")
+    for name, lanes in index_campaign(os.path.join(ROOT, 'EXPOM&Accelerometer')).items():
+        e_stream, e_variant = [], []
+        for lane in lanes:
+            acc = load_phyphox(lane['acc_file'])
+            dt = acc['Time'].diff().mean()
+            ay = acc['y'].to_numpy()
+            ref = integrate_forced(ay, dt, REAL_DISTANCE_Y)
+
+            # Lanes start moving immediately, so there is no standstill to correct against
+            _, _, p, _ = reckon_stream(ay, dt, chunk_size, zupt_threshold=0)
+            e_stream.append(scale_to_lane(p) - ref)
+
+            v = integrate.cumulative_trapezoid(ay, dx=dt, initial=0)
+            v = v - np.linspace(0, v[-1], len(v))
+            e_variant.append(scale_to_lane(integrate.cumulative_trapezoid(v, dx=dt, initial=0)) - ref)
+        rmse = [np.sqrt(np.mean(np.concatenate(e) ** 2)) * 100 for e in (e_stream, e_variant)]
+        print(f"{name:<34} {len(lanes):>5} {rmse[0]:>8.2f} {rmse[1]:>23.2f}")
+
+
+def trajectory_accuracy(chunk_size):
+    """Arduino/heatmap.py recording: causal sosfilt path vs. filtfilt batch path."""
+    path = os.path.join(ROOT, 'Arduino', 'Linear Acceleration.csv')
+    acc = load_phyphox(path)
+    t = acc['Time'].to_numpy()
+    dt = np.mean(np.diff(t))
+    xy = acc[['x', 'y']].to_numpy()
+    ref = np.column_stack([integrate_filtered(xy[:, k], dt)[2] for k in range(2)])
+    _, _, p, _ = reckon_stream(xy, dt, chunk_size, cutoff=2.0, vel_threshold=0.02)
+    e = np.linalg.norm(p - ref, axis=1)
+    span = np.ptp(ref, axis=0).max()
+    print(f"\nheatmap.py trajectory ({len(t)} samples): mean deviation {e.mean() * 100:.2f} cm, "
+          f"max {e.max() * 100:.2f} cm (trajectory extent {span * 100:.1f} cm)")
+
+
+def synthetic_chunks(n, chunk_size, dt, seed=0):
+    """Stop-and-go motion on two axes with sensor bias and noise, generated chunk by chunk."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, n, chunk_size):
+        t = (np.arange(start, min(start + chunk_size, n)) * dt)[:, None]
+        phase = (t % 10.0)
+        a = np.where(phase < 1, 0.5, np.where(phase < 2, -0.5, 0.0)) * np.array([1.0, 0.6])
+        yield a + np.array([0.02, -0.01]) + rng.normal(0, 0.01, (len(t), 2))
+
+
+def chunk_invariance(chunk_sizes, n=200_000, dt=0.002):
+    """With ZUPT and bias correction on, any chunking must give the single-chunk result."""
+    a = np.concatenate(list(synthetic_chunks(n, 65536, dt)))
+    results = {}
+    for chunk_size in [n] + list(chunk_sizes) + [1000, 7]:
+        dr = DeadReckoner(dt, cutoff=2.0, zupt_threshold=0.05, zupt_samples=100)
+        p = np.concatenate([dr.update(a[i:i + chunk_size])[2] for i in range(0, n, chunk_size)])
+        results[chunk_size] = (p, dr.finish(), dr.n_zupt)
+    p0, final0, zupt0 = results[n]
+    for chunk_size, (p, final, zupt) in results.items():
+        assert zupt == zupt0, f"chunk {chunk_size}: {zupt} ZUPTs vs {zupt0}"
+        assert np.allclose(p, p0, rtol=0, atol=1e-9), f"chunk {chunk_size}: positions differ"
+        assert np.allclose(final, final0, rtol=0, atol=1e-9), f"chunk {chunk_size}: final position differs"
+    print(f"\nChunk invariance with ZUPT ({n} samples, {zupt0} ZUPTs, chunks {sorted(results)}): "
+          f"final position {np.round(final0, 4)} for every chunk size")
+
+
+def throughput(n, chunk_sizes, dt=0.002):
+    print(f"\nStreaming throughput, {n} samples x 2 axes")
+    print(f"{'chunk':>7} {'samples/s':>12} {'peak mem (MB)':>14} {'ZUPTs':>6}")
+    for chunk_size in chunk_sizes:
+        dr = DeadReckoner(dt, cutoff=2.0, zupt_threshold=0.05, zupt_samples=100)
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        for chunk in synthetic_chunks(n, chunk_size, dt):
+            dr.update(chunk)
+        elapsed = time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"{chunk_size:>7} {n / elapsed:>12.3g} {peak / 1e6:>14.2f} {dr.n_zupt:>6}")
+
+    a = np.concatenate(list(synthetic_chunks(min(n, 2_000_000), 65536, dt)))
+    t0 = time.perf_counter()
+    for k in range(2):
+        integrate_filtered(a[:, k], dt)
+    elapsed = time.perf_counter() - t0
+    print(f"batch integrate_filtered (in memory, {len(a)} samples): {len(a) / elapsed:.3g} samples/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=10_000_000)
+    parser.add_argument('--chunks', type=int, nargs='+', default=[256, 4096, 65536])
+    args = parser.parse_args()
+
+    lane_accuracy(256)
+    trajectory_accuracy(256)
+    chunk_invariance(args.chunks)
+    throughput(args.samples, args.chunks)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark: Expom-ELF ingestion and windowed aggregation with
+EXPOM&Accelerometer/elf_export.py vs. naive pandas.
+
+  real files   pd.read_csv(skiprows=2, dayfirst dates) / pd.read_excel vs.
+               parse_elf_csv / parse_elf_xlsx and the cached load
+  synthetic    --days daily exports (one row per ~4 s): loading all files,
+               min/mean/max per band over --window s (DataFrame.resample)
+               and over --queries random overlapping intervals
+
+    python benchmarks/bench_elf_export.py --days 30 --window 3600 --queries 10000
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+EXPOM = os.path.join(ROOT, 'EXPOM&Accelerometer')
+CACHE = tempfile.mkdtemp(prefix='elf_cache_')
+os.environ['PS_MAGFIELD_CACHE'] = CACHE          # cold and warm cache under our control
+os.environ['PS_MAGFIELD_CACHE_MB'] = '100000'
+sys.path.insert(0, ROOT)
+sys.path.insert(0, EXPOM)
+import phyphox_loader  # noqa: E402
+from elf_export import SPALTEN, ElfArchive, load_elf_array, parse_elf_csv, parse_elf_xlsx  # noqa: E402
+
+HEADER = list(SPALTEN)[:11] + ['Exposure Index: None', 'GPS Fix', 'GPS Lat', 'GPS Lon', 'GPS Altitude',
+                               'GPS HDOP', 'GPS# Satellites', 'GPS Speed', 'Marker', 'Battery charge %',
+                               'Measurement Mode', 'Movement Index', '']
+BAND_COLS = list(SPALTEN)[2:11]
+
+
+def best_of(fn, repeat):
+    best, result = np.inf, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def naive_csv(path):
+    return pd.read_csv(path, skiprows=2, parse_dates=['Date and Time'], dayfirst=True).dropna(subset=['Date and Time'])
+
+
+def naive_xlsx(path):
+    return pd.read_excel(path, skiprows=2).dropna(subset=['Date and Time'])
+
+
+def write_day(folder, day, rng):
+    """One day of Logger exports in the Expom-ELF CSV layout (quoted, NUL bytes in the GPS fields)."""
+    t0 = np.datetime64('2025-11-01T00:00:00') + np.timedelta64(day, 'D')
+    t = t0 + np.cumsum(rng.integers(3, 6, 86400 // 4)).astype('timedelta64[s]')
+    t = t[t < t0 + np.timedelta64(1, 'D')]
+    n = len(t)
+    df = pd.DataFrame({'Date and Time': pd.to_datetime(t).strftime('%d/%m/%Y %H:%M:%S'),
+                       'Sequence number': np.arange(n)})
+    for k, col in enumerate(BAND_COLS):
+        df[col] = -40 + 10 * np.sin(np.arange(n) / (500 + 50 * k)) + rng.normal(0, 3, n)
+    for col, val in zip(HEADER[11:], ['', 'no fix', '0000.0000X', '00000.0000Y', '     ', '   \x00\x00',
+                                      '0 ', '0.00\x00', '', '90', 'Logger', '0.00', '']):
+        df[col] = val
+    path = os.path.join(folder, f"Export_ELF_{str(t0)[:10]}_0000_Synthetisch.csv")
+    with open(path, 'w', newline='') as f:
+        f.write('"Device ID: EELF17002 / Expom-ELF Utility v.1.3.5.0"' + ',""' * 23 + '\n')
+        f.write('"FFT Window: None (rectangular)"' + ',""' * 23 + '\n')
+        df.to_csv(f, index=False, quoting=csv.QUOTE_ALL, lineterminator='\n')
+        f.write(','.join(['""'] * 24) + '\n')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=30, help="synthetic daily exports")
+    parser.add_argument('--window', type=int, default=3600, help="resample window (s)")
+    parser.add_argument('--queries', type=int, default=10000, help="random intervals")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print("Real exports (per file)")
+    print(f"{'file':<48} {'rows':>5} {'naive (ms)':>11} {'parse (ms)':>11} {'cached (ms)':>12} {'speedup':>8}")
+    for path in sorted(glob.glob(os.path.join(EXPOM, 'Export_ELF_*'))):
+        if path.endswith('.xlsx'):
+            try:
+                import openpyxl  # noqa: F401
+            except ImportError:
+                print(f"{os.path.basename(path):<48} skipped (read_excel needs openpyxl)")
+                continue
+            naive, parse = naive_xlsx, parse_elf_xlsx
+        else:
+            naive, parse = naive_csv, parse_elf_csv
+        t_naive, ref = best_of(lambda: naive(path), args.repeat)
+        t_parse, arr = best_of(lambda: parse(path), args.repeat)
+        load_elf_array(path)
+        t_cache, _ = best_of(lambda: load_elf_array(path), args.repeat)
+        assert np.allclose(arr['50Hz'], ref['Mains 50Hz (49-51 Hz)'].astype(float))
+        print(f"{os.path.basename(path):<48} {len(arr):>5} {t_naive * 1e3:>11.2f} {t_parse * 1e3:>11.2f} "
+              f"{t_cache * 1e3:>12.2f} {t_naive / t_cache:>7.0f}x")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rng = np.random.default_rng(0)
+        paths = [write_day(tmp, d, rng) for d in range(args.days)]
+        mb = sum(os.path.getsize(p) for p in paths) / 1e6
+
+        t0 = time.perf_counter()
+        df = pd.concat([naive_csv(p) for p in paths]).set_index('Date and Time')[BAND_COLS]
+        t_naive_load = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        archiv = ElfArchive(paths)
+        t_cold = time.perf_counter() - t0
+        t_warm, archiv = best_of(lambda: ElfArchive(paths), args.repeat)
+
+        print(f"\nSynthetic: {args.days} exports, {len(archiv)} rows, {mb:.0f} MB CSV")
+        print(f"{'load all files':<34} naive {t_naive_load * 1e3:>9.1f} ms   "
+              f"first parse {t_cold * 1e3:>8.1f} ms   cached {t_warm * 1e3:>7.1f} ms")
+
+        t_pd, ref = best_of(lambda: df.resample(f'{args.window}s').agg(['min', 'mean', 'max']), args.repeat)
+        start = np.datetime64(ref.index[0].to_datetime64(), 's')
+        t_el, (_, stat) = best_of(lambda: archiv.resample(args.window, start=start), args.repeat)
+        m = len(ref)
+        diff = max(np.nanmax(np.abs(ref.xs(a, axis=1, level=1).to_numpy() - stat[a][:m])) for a in ('min', 'mean', 'max'))
+        print(f"{'resample ' + str(args.window) + ' s, min/mean/max':<34} pandas {t_pd * 1e3:>8.1f} ms   "
+              f"window_stats {t_el * 1e3:>7.1f} ms   {t_pd / t_el:>5.1f}x   max diff {diff:.1e}")
+
+        # Random overlapping intervals: pandas slices one interval at a time
+        t_lo, t_hi = archiv.zeit[0], archiv.zeit[-1]
+        s = rng.integers(t_lo, t_hi, args.queries)
+        e = s + rng.integers(60, 3 * 86400, args.queries)
+        t_el, stat = best_of(lambda: archiv.aggregate(s, e), args.repeat)
+        k = min(args.queries, 200)
+        s_dt, e_dt = s.astype('datetime64[s]'), (e - 1).astype('datetime64[s]')
+        t0 = time.perf_counter()
+        means = [df.loc[s_dt[i]:e_dt[i]].mean().to_numpy() for i in range(k)]
+        t_pd = (time.perf_counter() - t0) / k * args.queries
+        diff = np.nanmax(np.abs(np.array(means) - stat['mean'][:k]))
+        print(f"{str(args.queries) + ' random intervals':<34} pandas {t_pd * 1e3:>8.1f} ms*  "
+              f"window_stats {t_el * 1e3:>7.1f} ms   {t_pd / t_el:>5.0f}x   max diff {diff:.1e}")
+        print(f"  * mean only, extrapolated from {k} intervals")
+
+    phyphox_loader.evict(0)
+    os.rmdir(CACHE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: accuracy and runtime of the gridding backends in gridding.py
+across point counts, on the 300x300 map grid.
+
+    python benchmarks/bench_gridding.py --counts 1000 10000 100000 300000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Arduino'))
+from gridding import BACKENDS, grid_map  # noqa: E402
+
+XLIM = (55.0, 210.0)
+YLIM = (20.0, 160.0)
+
+
+def field(x, y):
+    """Smooth background plus a local dipole-like anomaly (µT)."""
+    r2 = (x - 130) ** 2 + (y - 90) ** 2 + 100
+    return 50 + 4000 / r2 + 0.02 * x
+
+
+def samples(n, seed=0, noise=0.2):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(*XLIM, n)
+    y = rng.uniform(*YLIM, n)
+    return x, y, field(x, y) + rng.normal(0, noise, n)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[1000, 10000, 100000, 300000])
+    parser.add_argument('--grid', type=int, default=300)
+    parser.add_argument('--methods', nargs='+', default=list(BACKENDS))
+    args = parser.parse_args()
+
+    xi, yi = np.meshgrid(np.linspace(*XLIM, args.grid), np.linspace(*YLIM, args.grid))
+    truth = field(xi, yi)
+
+    print(f"{'points':>8} {'method':>11} {'time (s)':>9} {'RMSE (µT)':>10} {'coverage':>9}")
+    for n in args.counts:
+        x, y, z = samples(n)
+        for method in args.methods:
+            t0 = time.perf_counter()
+            zi = grid_map(x, y, z, xi, yi, method=method)
+            elapsed = time.perf_counter() - t0
+            ok = np.isfinite(zi)
+            rmse = np.sqrt(np.mean((zi[ok] - truth[ok]) ** 2)) if ok.any() else np.nan
+            print(f"{n:>8} {method:>11} {elapsed:>9.3f} {rmse:>10.3f} {ok.mean():>8.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark: per-batch update latency of IncrementalGrid vs. a full
+griddata(method='linear') recomputation on the 300x300 map grid, plus an
+equivalence check on the real table scans (process_table.merge_points)
+streamed in batches.
+
+    python benchmarks/bench_incremental_grid.py --samples 20000 --batch 200
+    python benchmarks/bench_incremental_grid.py --tables 1 3 4 5 --table-batch 100
+"""
+import argparse
+import io
+import os
+import sys
+import time
+import warnings
+from contextlib import redirect_stdout
+
+import numpy as np
+from scipy.interpolate import griddata
+
+ARDUINO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Arduino')
+sys.path.insert(0, ARDUINO_DIR)
+from incremental_grid import IncrementalGrid  # noqa: E402
+from process_table import merge_points  # noqa: E402
+
+XLIM = (55.0, 210.0)   # S1 range of the table scans (cm)
+YLIM = (20.0, 160.0)   # S2 range (cm)
+
+
+def synthetic_scan(n, seed=0):
+    """Serpentine traversal of the table with a dipole-like field on top of 50 µT."""
+    rng = np.random.default_rng(seed)
+    u = np.linspace(0, 1, n)
+    passes = 12
+    s2 = YLIM[0] + (YLIM[1] - YLIM[0]) * u
+    phase = (u * passes) % 2
+    s1 = XLIM[0] + (XLIM[1] - XLIM[0]) * np.where(phase < 1, phase, 2 - phase)
+    s1 = s1 + rng.normal(0, 0.5, n)
+    s2 = s2 + rng.normal(0, 0.5, n)
+    r2 = (s1 - 130) ** 2 + (s2 - 90) ** 2 + 100
+    b = 50 + 4000 / r2 + rng.normal(0, 0.2, n)
+    return s1, s2, b
+
+
+def reference(x, y, z, xi, yi):
+    """griddata on the samples with repeated positions merged into their mean, like IncrementalGrid."""
+    pts, inv = np.unique(np.column_stack((x, y)), axis=0, return_inverse=True)
+    inv = inv.ravel()
+    mean = np.bincount(inv, weights=z) / np.bincount(inv)
+    return griddata((pts[:, 0], pts[:, 1]), mean, (xi, yi), method='linear')
+
+
+def compare(grid, ref):
+    both = ~np.isnan(ref) & ~np.isnan(grid.zi)
+    nan_mismatch = int((np.isnan(ref) != np.isnan(grid.zi)).sum())
+    max_err = np.abs(ref[both] - grid.zi[both]).max() if both.any() else 0.0
+    return max_err, nan_mismatch
+
+
+def real_tables(tables, batch):
+    """
+    Streams the merged points of the real table scans into an IncrementalGrid
+    and checks the final map against griddata. The scans repeat positions and
+    run along straight lines, so local windows are often collinear and local
+    triangles can be flat; any RuntimeWarning counts as a failure.
+    """
+    print(f"\nReal scans in batches of {batch}")
+    print(f"{'table':>6} {'samples':>8} {'median (ms)':>12} {'max (ms)':>9} {'max |diff|':>11} {'NaN diff':>9}")
+    for sel in tables:
+        with redirect_stdout(io.StringIO()):
+            merged = merge_points(sel, ARDUINO_DIR)
+        if merged is None:
+            print(f"{sel:>6} {'missing':>8}")
+            continue
+        df = merged[0]
+        x, y, z = (df[c].to_numpy() for c in ('S1', 'S2', 'B_abs'))
+        grid = IncrementalGrid((x.min(), x.max()), (y.min(), y.max()))
+        times = []
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)
+            for start in range(0, len(z), batch):
+                t0 = time.perf_counter()
+                grid.add_samples(x[start:start + batch], y[start:start + batch], z[start:start + batch])
+                times.append(time.perf_counter() - t0)
+        max_err, nan_mismatch = compare(grid, reference(x, y, z, *grid.meshgrid()))
+        print(f"{sel:>6} {len(z):>8} {np.median(times) * 1e3:>12.2f} {max(times) * 1e3:>9.1f} "
+              f"{max_err:>11.1e} {nan_mismatch:>9}")
+        assert max_err < 1e-8 and nan_mismatch == 0, f"table {sel}: incremental map differs from griddata"
+
+
+def run_phase(grid, s1, s2, b, batch, full_every, label, history):
+    """Streams one scan into the grid; history holds all samples seen so far."""
+    xi, yi = grid.meshgrid()
+    print(f"\n{label}")
+    print(f"{'samples':>9} {'incremental (ms)':>17} {'cells':>7} {'griddata (ms)':>14}")
+    inc_times, full_times = [], []
+    for k, start in enumerate(range(0, len(b), batch)):
+        sl = slice(start, start + batch)
+        history.append((s1[sl], s2[sl], b[sl]))
+        t0 = time.perf_counter()
+        cells = grid.add_samples(s1[sl], s2[sl], b[sl])
+        t_inc = time.perf_counter() - t0
+        inc_times.append(t_inc)
+
+        if (k + 1) % full_every == 0:
+            x, y, z = (np.concatenate(c) for c in zip(*history))
+            t0 = time.perf_counter()
+            griddata((x, y), z, (xi, yi), method='linear')
+            t_full = time.perf_counter() - t0
+            full_times.append(t_full)
+            print(f"{grid.n_samples:>9} {t_inc * 1e3:>17.2f} {cells:>7} {t_full * 1e3:>14.2f}")
+
+    print(f"Median update latency: incremental {np.median(inc_times) * 1e3:.2f} ms/batch, "
+          f"full griddata {np.median(full_times) * 1e3:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, default=20000, help="samples per scan")
+    parser.add_argument('--batch', type=int, default=200)
+    parser.add_argument('--full-every', type=int, default=10,
+                        help="time the full griddata recomputation every N batches")
+    parser.add_argument('--tables', nargs='*', default=['1', '3', '4', '5'],
+                        help="process_table datasets for the equivalence check (none: skip)")
+    parser.add_argument('--table-batch', type=int, default=100)
+    args = parser.parse_args()
+
+    grid = IncrementalGrid(XLIM, YLIM)
+    history = []
+    # A live first scan grows the covered area, a repeated scan refines it
+    run_phase(grid, *synthetic_scan(args.samples, seed=0), args.batch, args.full_every,
+              "First scan (growing coverage)", history)
+    run_phase(grid, *synthetic_scan(args.samples, seed=1), args.batch, args.full_every,
+              "Repeated scan (same table)", history)
+
+    x, y, z = (np.concatenate(c) for c in zip(*history))
+    max_err, nan_mismatch = compare(grid, reference(x, y, z, *grid.meshgrid()))
+    print(f"\nFinal map vs griddata: max |diff| = {max_err:.2e} µT, NaN mismatches = {nan_mismatch}")
+
+    real_tables(args.tables, args.table_batch)
+
+
+if __name__ == "__main__":
+    main()
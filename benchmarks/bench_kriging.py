@@ -0,0 +1,118 @@
+"""
+Benchmark: local kriging (kriging.py) against a global kriging solve and the
+other gridding backends - runtime over sample counts, hold-out accuracy and
+how well the kriging std predicts the actual error.
+
+    python benchmarks/bench_kriging.py --counts 10000 100000 1000000 --workers 1 4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Arduino'))
+from gridding import grid_map  # noqa: E402
+from kriging import covariance, fit_variogram, krige  # noqa: E402
+
+XLIM = (55.0, 210.0)
+YLIM = (20.0, 160.0)
+LANE_SPACING = 8.0  # cm, like the EXPOM table walks
+
+
+def field(x, y):
+    """Smooth background plus a local dipole-like anomaly (µT)."""
+    r2 = (x - 130) ** 2 + (y - 90) ** 2 + 100
+    return 50 + 4000 / r2 + 0.02 * x
+
+
+def samples(n, seed=0, noise=0.2, lanes=False):
+    """n scattered samples, or n samples along x lanes LANE_SPACING apart."""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(*XLIM, n)
+    if lanes:
+        y = rng.choice(np.arange(YLIM[0], YLIM[1] + 1e-9, LANE_SPACING), n)
+    else:
+        y = rng.uniform(*YLIM, n)
+    return x, y, field(x, y) + rng.normal(0, noise, n)
+
+
+def global_krige(x, y, z, xi, yi, model):
+    """Ordinary kriging with all samples in one dense system (O(n^3))."""
+    pts = np.column_stack((x, y))
+    targets = np.column_stack((xi.ravel(), yi.ravel()))
+    n = len(z)
+    a = np.ones((n + 1, n + 1))
+    a[:n, :n] = covariance(cdist(pts, pts), model)
+    a[np.arange(n), np.arange(n)] += model['nugget']
+    a[n, n] = 0.0
+    b = np.ones((n + 1, len(targets)))
+    b[:n] = covariance(cdist(pts, targets), model)
+    sol = np.linalg.solve(a, b)
+    return (sol[:n].T @ z).reshape(xi.shape)
+
+
+def best_of(fn, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--counts', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--grid', type=int, default=300)
+    parser.add_argument('--k', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    parser.add_argument('--global-counts', type=int, nargs='+', default=[500, 1000, 2000])
+    parser.add_argument('--holdout', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    xi, yi = np.meshgrid(np.linspace(*XLIM, args.grid), np.linspace(*YLIM, args.grid))
+    print(f"cpu_count: {os.cpu_count()}, grid {args.grid}x{args.grid}, k={args.k}")
+
+    # --- Scaling over sample counts and thread workers ---
+    print(f"\n{'samples':>8} {'fit (s)':>8} {'workers':>8} {'krige (s)':>10} {'cells/s':>10}")
+    for n in args.counts:
+        x, y, z = samples(n)
+        t_fit, model = best_of(lambda: fit_variogram(x, y, z), args.repeat)
+        for w in dict.fromkeys(args.workers):
+            t, _ = best_of(lambda: krige(x, y, z, xi, yi, args.k, model, workers=w), args.repeat)
+            print(f"{n:>8} {t_fit:>8.3f} {w:>8} {t:>10.3f} {xi.size / t:>10,.0f}")
+
+    # --- Local vs global solve ---
+    print(f"\n{'samples':>8} {'global (s)':>11} {'local (s)':>10} {'max |diff| (µT)':>16}")
+    gx, gy = np.meshgrid(np.linspace(*XLIM, 60), np.linspace(*YLIM, 60))
+    for n in args.global_counts:
+        x, y, z = samples(n)
+        model = fit_variogram(x, y, z)
+        t_glob, zg = best_of(lambda: global_krige(x, y, z, gx, gy, model), args.repeat)
+        t_loc, (zl, _) = best_of(lambda: krige(x, y, z, gx, gy, args.k, model), args.repeat)
+        print(f"{n:>8} {t_glob:>11.3f} {t_loc:>10.3f} {np.max(np.abs(zl - zg)):>16.4f}")
+
+    # --- Hold-out accuracy and calibration (scattered and lane layouts) ---
+    print(f"\n{'layout':>8} {'method':>10} {'RMSE (µT)':>10} {'coverage':>9} {'|err| < 2 std':>14}")
+    for lanes in (False, True):
+        x, y, z = samples(min(args.counts), seed=1, lanes=lanes)
+        rng = np.random.default_rng(2)
+        hx, hy = rng.uniform(*XLIM, args.holdout), rng.uniform(*YLIM, args.holdout)
+        truth = field(hx, hy)
+        for method in ('linear', 'idw', 'kriging'):
+            if method == 'kriging':
+                zi, var = krige(x, y, z, hx, hy, args.k)
+                within = f"{np.mean(np.abs(zi - truth) < 2 * np.sqrt(var)):.1%}"
+            else:
+                zi, within = grid_map(x, y, z, hx, hy, method=method), '-'
+            ok = np.isfinite(zi)
+            rmse = np.sqrt(np.mean((zi[ok] - truth[ok]) ** 2))
+            print(f"{'lanes' if lanes else 'scatter':>8} {method:>10} {rmse:>10.3f} {ok.mean():>8.1%} {within:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: peak memory (RSS) and run time of one very long lane, in-memory
+path of heatmap_Tisch_Scheune_magnetisch.py (verarbeite_bahn +
+resample_bahnen) vs. the chunked lane_stream.py path. Every run happens in
+its own subprocess so ru_maxrss is the peak of that run alone.
+
+    python benchmarks/bench_lane_stream.py --rows 100000 1000000 4000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+EXPOM = os.path.join(ROOT, 'EXPOM&Accelerometer')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, EXPOM)
+
+ACC_HEADER = '"Time (s)","Acceleration x (m/s^2)","Acceleration y (m/s^2)","Acceleration z (m/s^2)"'
+MAG_HEADER = '"Time (s)","Magnetic field x (µT)","Magnetic field y (µT)","Magnetic field z (µT)"'
+
+
+def write_lane(folder, acc_rows, block=500_000, seed=0):
+    """Phyphox-like lane: accelerometer at 500 Hz, magnetometer at 100 Hz, slow back-and-forth motion."""
+    rng = np.random.default_rng(seed)
+    acc_file = os.path.join(folder, 'Accelerometer_lang_1.csv')
+    mag_file = os.path.join(folder, 'Magnetometer_lang_1.csv')
+    with open(acc_file, 'w') as fa, open(mag_file, 'w', encoding='utf-8') as fm:
+        fa.write(ACC_HEADER + '\n')
+        fm.write(MAG_HEADER + '\n')
+        for start in range(0, acc_rows, block):
+            i = np.arange(start, min(start + block, acc_rows))
+            t = 0.018 + i * 0.002
+            ay = 0.3 * np.sin(2 * np.pi * t / 8.0) + rng.normal(0, 0.05, len(i))
+            acc = np.column_stack((t, rng.normal(0, 0.05, len(i)), ay, 9.81 + rng.normal(0, 0.05, len(i))))
+            np.savetxt(fa, acc, fmt='%.9E', delimiter=',')
+
+            tm = t[::5] + 0.024
+            field = np.column_stack((-9 + 5 * np.sin(tm / 3), -15 + 5 * np.cos(tm / 5), -47 + rng.normal(0, 0.3, len(tm))))
+            np.savetxt(fm, np.column_stack((tm, field)), fmt='%.9E', delimiter=',')
+    return {'lane': 1, 'kennung': 'lang', 'acc_file': acc_file, 'mag_file': mag_file, 'start_x': 0.0}
+
+
+def child(mode, acc_file, mag_file, out, chunk_rows):
+    """Runs one path on one lane and reports time and peak RSS as JSON."""
+    import heatmap_Tisch_Scheune_magnetisch as hm
+    from lane_stream import verarbeite_bahn_chunked
+
+    bahn = {'acc_file': acc_file, 'mag_file': mag_file, 'start_x': 0.0}
+    t0 = time.perf_counter()
+    if mode == 'memory':
+        werte = hm.verarbeite_bahn(bahn)
+        zeile = hm.resample_bahnen(werte, np.array([0, len(werte)]), hm.TARGET_POINTS)[0]
+    else:
+        zeile = verarbeite_bahn_chunked(bahn, hm.REAL_DISTANCE_Y, hm.TARGET_POINTS, chunk_rows)[:, 0]
+    elapsed = time.perf_counter() - t0
+    np.save(out, zeile)
+    # ru_maxrss is in kB on Linux
+    print(json.dumps({'time': elapsed, 'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def run(mode, bahn, out, chunk_rows):
+    cmd = [sys.executable, os.path.abspath(__file__), '--child', mode,
+           bahn['acc_file'], bahn['mag_file'], out, '--chunk-rows', str(chunk_rows)]
+    res = subprocess.run(cmd, capture_output=True, text=True, check=True,
+                         env=dict(os.environ, MPLBACKEND='Agg'))
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 4_000_000],
+                        help="accelerometer rows per lane (500 Hz)")
+    parser.add_argument('--chunk-rows', type=int, default=65536)
+    parser.add_argument('--child', nargs=4, metavar=('MODE', 'ACC', 'MAG', 'OUT'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child, args.chunk_rows)
+        return
+
+    print(f"{'acc rows':>9} {'CSV (MB)':>9} {'in-memory (s)':>14} {'peak RSS (MB)':>14} "
+          f"{'chunked (s)':>12} {'peak RSS (MB)':>14} {'max diff':>9}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            bahn = write_lane(tmp, rows)
+            size = (os.path.getsize(bahn['acc_file']) + os.path.getsize(bahn['mag_file'])) / 1e6
+            out_mem, out_chunk = os.path.join(tmp, 'memory.npy'), os.path.join(tmp, 'chunked.npy')
+            mem = run('memory', bahn, out_mem, args.chunk_rows)
+            chunk = run('chunked', bahn, out_chunk, args.chunk_rows)
+            diff = np.abs(np.load(out_mem) - np.load(out_chunk)).max()
+            print(f"{rows:>9} {size:>9.0f} {mem['time']:>14.2f} {mem['rss_mb']:>14.0f} "
+                  f"{chunk['time']:>12.2f} {chunk['rss_mb']:>14.0f} {diff:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: stacking many scans of one surface with map_stack.py vs. the naive
+way (grid every session, keep all maps, np.nanmean / np.nanstd over the
+stack), on synthetic raster scans of a 160 x 100 cm table: time per session
+(should stay flat as sessions grow) and peak memory (tracemalloc).
+
+    python benchmarks/bench_map_stack.py --sessions 10 100 1000 --points 5000 --method bin_mean
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from map_stack import MapStack, stack_sessions  # noqa: E402
+
+XLIM, YLIM = (60.0, 220.0), (10.0, 110.0)
+
+
+def synthetic(sessions, points, seed=0):
+    """Yields one jittered raster scan at a time (same field, new noise and path)."""
+    rng = np.random.default_rng(seed)
+    for k in range(sessions):
+        t = np.linspace(0, 1, points)
+        x = XLIM[0] + (XLIM[1] - XLIM[0]) * np.abs(((t * 12 + rng.random()) % 2) - 1)
+        y = YLIM[0] + (YLIM[1] - YLIM[0]) * t + rng.normal(0, 1.0, points)
+        b = 48 + 20 * np.exp(-((x - 130) ** 2 + (y - 60) ** 2) / 400) + rng.normal(0, 0.5, points)
+        yield f"scan{k}", x, y, b
+
+
+def naive(sessions, points, shape, method):
+    tmp = MapStack(XLIM, YLIM, shape, method)
+    maps = np.array([tmp.grid(x, y, b) for _, x, y, b in synthetic(sessions, points)])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return np.nanmean(maps, axis=0), np.nanstd(maps, axis=0, ddof=1), np.isfinite(maps).sum(axis=0)
+
+
+def measured(fn):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = fn()
+    dt = time.perf_counter() - t0
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return dt, peak / 1e6, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--points', type=int, default=5000, help="samples per session")
+    parser.add_argument('--shape', type=int, nargs=2, default=(300, 300))
+    parser.add_argument('--method', default='bin_mean', help="gridding backend")
+    parser.add_argument('--naive-limit', type=int, default=500, help="skip the naive path above this many sessions")
+    args = parser.parse_args()
+
+    print(f"{'sessions':>8} {'stack (s)':>10} {'ms/session':>11} {'peak (MB)':>10} "
+          f"{'naive (s)':>10} {'peak (MB)':>10} {'max diff':>9}")
+    for n in args.sessions:
+        t_s, mem_s, stack = measured(lambda: stack_sessions(MapStack(XLIM, YLIM, args.shape, args.method),
+                                                            synthetic(n, args.points)))
+        if n <= args.naive_limit:
+            t_n, mem_n, (mean, std, count) = measured(lambda: naive(n, args.points, args.shape, args.method))
+            assert np.array_equal(count, stack.count)
+            diff = max(np.nanmax(np.abs(mean - stack.mean)), np.nanmax(np.abs(std - stack.std)))
+            ref = f"{t_n:>10.2f} {mem_n:>10.1f} {diff:>9.1e}"
+        else:
+            ref = f"{'-':>10} {'-':>10} {'-':>9}"
+        print(f"{n:>8} {t_s:>10.2f} {t_s / n * 1e3:>11.2f} {mem_s:>10.1f} {ref}")
+
+
+if __name__ == "__main__":
+    main()
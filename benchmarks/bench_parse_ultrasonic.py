@@ -0,0 +1,81 @@
+"""
+Benchmark: parse_ultrasonic_robust vs. parse_ultrasonic_fast on synthetic
+serial-monitor logs (default 10^6 lines).
+
+    python benchmarks/bench_parse_ultrasonic.py --lines 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Arduino'))
+from process_table import parse_ultrasonic_robust  # noqa: E402
+from ultrasonic_parser import parse_ultrasonic_fast  # noqa: E402
+
+
+def synthetic_log(n_lines, seed=0, start="23:50:00.000"):
+    """
+    Mixes the formats seen in table1-3: '/ms,s1,s2' triplet lines (table2/3)
+    and jammed pair lines (table1). Starts shortly before midnight so the
+    wrap-around is exercised.
+    """
+    rng = np.random.default_rng(seed)
+    h, m, s = start.split(':')
+    t0 = (int(h) * 60 + int(m)) * 60 + float(s)
+    t = (t0 + np.cumsum(rng.uniform(0.05, 0.5, n_lines))) % 86400
+    s1 = rng.integers(50, 220, n_lines)
+    s2 = rng.integers(20, 160, n_lines)
+    ms = np.arange(n_lines) * 200
+    pairs = rng.random(n_lines) < 0.2
+
+    out = ["%02d:%02d:%06.3f -> --- STARTED ---\n" % (t0 // 3600, t0 % 3600 // 60, t0 % 60)]
+    for i in range(n_lines):
+        ti = t[i]
+        stamp = "%02d:%02d:%06.3f" % (ti // 3600, ti % 3600 // 60, ti % 60)
+        if pairs[i]:
+            out.append(f"{stamp} -> {s1[i]}.00,{s2[i]}.00{s1[i] + 1}.00,{s2[i] + 2}.00\n")
+        else:
+            out.append(f"{stamp} -> /{ms[i]},{s1[i]}.00,{s2[i]}.00\n")
+    out.append(f"{stamp} -> /--- STOPPED ---\n")
+    return "".join(out)
+
+
+def best_of(func, path, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = func(path)
+        times.append(time.perf_counter() - t0)
+    return min(times), df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lines', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'synthetic.txt')
+        with open(path, 'w') as f:
+            f.write(synthetic_log(args.lines))
+        size_mb = os.path.getsize(path) / 1e6
+
+        t_ref, df_ref = best_of(parse_ultrasonic_robust, path, 1)
+        t_fast, df_fast = best_of(parse_ultrasonic_fast, path, args.repeat)
+
+    same = df_ref.shape == df_fast.shape and all(
+        np.array_equal(df_ref[c].values, df_fast[c].values) for c in df_ref.columns)
+
+    print(f"Lines: {args.lines:,}  ({size_mb:.1f} MB, {len(df_ref):,} points)")
+    print(f"parse_ultrasonic_robust: {t_ref:8.3f} s  ({args.lines / t_ref:,.0f} lines/s)")
+    print(f"parse_ultrasonic_fast:   {t_fast:8.3f} s  ({args.lines / t_fast:,.0f} lines/s)")
+    print(f"Speed-up: {t_ref / t_fast:.1f}x   identical output: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: parameter sweeps through pipeline_dag.py with memoized stages vs.
+rerunning the whole chain for every value (same graph, memory tier of 0 MB),
+on the real datasets. One sweep per parameter; the later in the chain the
+parameter enters, the more of the chain is reused.
+
+    python benchmarks/bench_pipeline_dag.py --values 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from pipeline_dag import StageCache, table_graph, tisch_graph, trajectory_graph  # noqa: E402
+
+SWEEPS = [
+    # graph, target, parameter, values
+    ('table', 'grid', 'filter_s1_threshold', lambda n: np.unique(np.linspace(40, 80, n).round().astype(int))),
+    ('table', 'grid', 'jump_threshold', lambda n: np.linspace(10.0, 40.0, n)),
+    ('tisch', 'resample', 'target_points', lambda n: np.unique(np.linspace(50, 300, n).round().astype(int))),
+    ('tisch', 'resample', 'real_distance_y', lambda n: np.linspace(1.2, 2.0, n)),
+    ('trajectory', 'integrate', 'vel_threshold', lambda n: np.linspace(0.005, 0.05, n)),
+]
+GRAPHS = {'table': lambda c: table_graph('3', c), 'tisch': lambda c: tisch_graph(cache=c),
+          'trajectory': lambda c: trajectory_graph(cache=c)}
+
+
+def sweep(graph, target, param, values):
+    t0 = time.perf_counter()
+    outs = [graph.get(target, **{param: v.item()}) for v in values]
+    return time.perf_counter() - t0, outs
+
+
+def same(a, b):
+    if isinstance(a, dict):
+        return all(same(a[k], b[k]) for k in a)
+    if isinstance(a, (tuple, list)):
+        return all(same(x, y) for x, y in zip(a, b))
+    return np.array_equal(a, b, equal_nan=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--values', type=int, default=50, help="values per sweep")
+    args = parser.parse_args()
+
+    print(f"{'graph':<11} {'parameter':<20} {'runs':>4} {'uncached (s)':>12} {'cached (s)':>11} {'speedup':>8} "
+          f"{'hits':>5} {'misses':>6} {'equal':>6}")
+    for name, target, param, values in SWEEPS:
+        values = values(args.values)
+        t_ref, ref = sweep(GRAPHS[name](StageCache(memory_mb=0)), target, param, values)
+        g = GRAPHS[name](StageCache())
+        t_dag, res = sweep(g, target, param, values)
+        stats = g.stats().values()
+        hits = sum(c['memory_hits'] for c in stats)
+        misses = sum(c['misses'] for c in stats)
+        ok = all(same(a, b) for a, b in zip(ref, res))
+        print(f"{name:<11} {param:<20} {len(values):>4} {t_ref:>12.2f} {t_dag:>11.2f} {t_ref / t_dag:>7.1f}x "
+              f"{hits:>5} {misses:>6} {str(ok):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: throughput of the S1/S2 cleaning, pandas/medfilt path of
+process_table.py vs. Arduino/position_filter.py in batch (clean_tracks) and
+streaming mode (PositionFilter, chunk by chunk), plus the running median
+alone (medfilt vs. selection network), on synthetic ultrasonic tracks with
+dropouts and jumps.
+
+    python benchmarks/bench_position_filter.py --samples 1000 100000 1000000 10000000 --chunk 256
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.signal import medfilt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Arduino'))
+from position_filter import DENSE_MIN_POINTS, PositionFilter, clean_tracks, median_valid  # noqa: E402
+
+
+def best_of(fn, repeat):
+    best, result = np.inf, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def synthetic(n, seed=0):
+    """Random-walk tracks in cm with 5 % S1 dropouts (0) and 1 % jumps."""
+    rng = np.random.default_rng(seed)
+    s1 = np.round(120 + np.cumsum(rng.normal(0, 0.5, n)), 2)
+    s2 = np.round(70 + np.cumsum(rng.normal(0, 0.5, n)), 2)
+    s1[rng.random(n) < 0.05] = 0.0
+    s1[rng.random(n) < 0.01] += 80.0
+    s2[rng.random(n) < 0.01] -= 60.0
+    return np.arange(n) * 0.02, s1, s2
+
+
+def clean_pandas(s1, s2):
+    """The cleaning process_table.py did before position_filter.py."""
+    pos_df = pd.DataFrame({'S1': s1, 'S2': s2})
+    pos_df['S1'] = pos_df['S1'].replace(0, np.nan)
+    pos_df['S1'] = pos_df['S1'].interpolate(method='linear', limit_direction='both')
+
+    def clean_jumps(series, threshold=25):
+        diff = series.diff().abs()
+        series[diff > threshold] = np.nan
+        return series.interpolate(method='linear', limit_direction='both')
+
+    pos_df['S1'] = clean_jumps(pos_df['S1'])
+    pos_df['S2'] = clean_jumps(pos_df['S2'])
+    if len(pos_df) > DENSE_MIN_POINTS:
+        pos_df['S1'] = medfilt(pos_df['S1'], kernel_size=7)
+        pos_df['S2'] = medfilt(pos_df['S2'], kernel_size=7)
+        pos_df['S1'] = pos_df['S1'].rolling(window=5, center=True, min_periods=1).mean()
+        pos_df['S2'] = pos_df['S2'].rolling(window=5, center=True, min_periods=1).mean()
+    else:
+        pos_df['S1'] = medfilt(pos_df['S1'], kernel_size=3)
+        pos_df['S2'] = medfilt(pos_df['S2'], kernel_size=3)
+    return pos_df['S1'].to_numpy(), pos_df['S2'].to_numpy()
+
+
+def clean_streaming(t, s1, s2, chunk, dense):
+    filt = PositionFilter(dense)
+    parts = [filt.push(t[i:i + chunk], s1[i:i + chunk], s2[i:i + chunk]) for i in range(0, len(t), chunk)]
+    parts.append(filt.flush())
+    return tuple(np.concatenate([p[k] for p in parts]) for k in range(3))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--chunk', type=int, default=256, help="rows per chunk in streaming mode")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'samples':>9} {'pandas (ms)':>12} {'batch (ms)':>11} {'speedup':>8} {'Msamples/s':>11} "
+          f"{'stream (ms)':>12} {'max diff':>9} {'stream = batch':>15}")
+    for n in args.samples:
+        t, s1, s2 = synthetic(n)
+        dense = n > DENSE_MIN_POINTS
+        t_old, (r1, r2) = best_of(lambda: clean_pandas(s1, s2), args.repeat)
+        t_new, (b1, b2) = best_of(lambda: clean_tracks(s1, s2), args.repeat)
+        t_str, (_, c1, c2) = best_of(lambda: clean_streaming(t, s1, s2, args.chunk, dense), args.repeat)
+        diff = max(np.abs(r1 - b1).max(), np.abs(r2 - b2).max())
+        same = np.array_equal(b1, c1) and np.array_equal(b2, c2)
+        print(f"{n:>9} {t_old * 1e3:>12.2f} {t_new * 1e3:>11.2f} {t_old / t_new:>7.1f}x "
+              f"{2 * n / t_new / 1e6:>11.1f} {t_str * 1e3:>12.2f} {diff:>9.1e} {str(same):>15}")
+
+    print("\nRunning median alone")
+    print(f"{'samples':>9} {'k':>2} {'medfilt (ms)':>13} {'network (ms)':>13} {'speedup':>8} {'equal':>6}")
+    for n in args.samples:
+        x = synthetic(n)[1]
+        for k in (3, 7):
+            p = np.concatenate((np.zeros(k // 2), x, np.zeros(k // 2)))
+            t_old, ref = best_of(lambda: medfilt(x, k), args.repeat)
+            t_new, res = best_of(lambda: median_valid(p, k), args.repeat)
+            print(f"{n:>9} {k:>2} {t_old * 1e3:>13.2f} {t_new * 1e3:>13.2f} {t_old / t_new:>7.1f}x "
+                  f"{str(np.array_equal(ref, res)):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Benchmark: throughput and dropped samples of recorder.py with the local
+stand-in devices: the Arduino log replayed through a pseudo-terminal plus N
+magnetometer feeds replaying a Phyphox export over TCP, at increasing replay
+speed (0 = as fast as possible) and ring capacity. Every run checks that the
+written files hold exactly the received samples.
+
+    python benchmarks/bench_recorder.py --feeds 1 4 8 --speeds 20 100 0 --capacity 1024 65536
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+from recorder import replay_session  # noqa: E402
+from phyphox_loader import load_phyphox_array  # noqa: E402
+
+ARDUINO_LOG = os.path.join(ROOT, 'Arduino', 'table3.txt')
+FEED_CSV = os.path.join(ROOT, 'Arduino', 'table3.csv')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--feeds', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--speeds', type=float, nargs='+', default=[20, 100, 0])
+    parser.add_argument('--capacity', type=int, nargs='+', default=[1024, 65536])
+    parser.add_argument('--flush-interval', type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f"{'feeds':>5} {'speed':>6} {'capacity':>8} {'sent':>9} {'written':>9} {'dropped':>8} {'wall (s)':>8} "
+          f"{'samples/s':>10} {'max fill':>8}")
+    for feeds in args.feeds:
+        for speed in args.speeds:
+            for capacity in args.capacity:
+                with tempfile.TemporaryDirectory() as tmp:
+                    session, sent, wall = asyncio.run(replay_session(
+                        tmp, ARDUINO_LOG, [(f"magnetometer{k}", FEED_CSV) for k in range(feeds)], speed,
+                        capacity, args.flush_interval))
+                    ch = session['channels']
+                    for k in range(feeds):
+                        rows = load_phyphox_array(os.path.join(tmp, f"magnetometer{k}.csv"), use_cache=False)
+                        assert len(rows) == ch[f"magnetometer{k}"]['written']
+                    n_sent = sum(sent.values())
+                    written = sum(c['written'] for c in ch.values())
+                    dropped = sum(c['dropped'] for c in ch.values())
+                    assert written + dropped == sum(c['received'] for c in ch.values())
+                    fill = max(c['max_fill'] for c in ch.values())
+                    print(f"{feeds:>5} {speed or 'max':>6} {capacity:>8} {n_sent:>9} {written:>9} {dropped:>8} "
+                          f"{wall:>8.2f} {written / wall:>10,.0f} {fill:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark: per-lane resample_to_fixed_length (interp1d + DataFrame) vs. the
+batched resample_bahnen for many lanes of ragged length. Both interpolate
+on the index axis; they agree to rounding (~1e-16), not bit for bit.
+
+    python benchmarks/bench_resample.py --lanes 1000 --points 150 1500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'EXPOM&Accelerometer'))
+from heatmap_Tisch_Scheune_magnetisch import resample_bahnen  # noqa: E402
+from run_suite import resample_to_fixed_length  # noqa: E402
+
+
+def synthetic_lanes(n_lanes, seed=0, min_len=600, max_len=3000):
+    """Ragged lanes like the Tisch_Scheune exports (|B| around 50 µT)."""
+    rng = np.random.default_rng(seed)
+    laengen = rng.integers(min_len, max_len, n_lanes)
+    offsets = np.zeros(n_lanes + 1, dtype=np.int64)
+    np.cumsum(laengen, out=offsets[1:])
+    werte = 50 + np.cumsum(rng.normal(0, 0.05, offsets[-1]))
+    return werte, offsets
+
+
+def per_lane(werte, offsets, num_points):
+    """Original path: one DataFrame and interp1d per lane, list -> np.array."""
+    matrix = []
+    for i in range(len(offsets) - 1):
+        df = pd.DataFrame({'Magnet_Betrag': werte[offsets[i]:offsets[i + 1]]})
+        matrix.append(resample_to_fixed_length(df, num_points)['Magnet_Betrag'].values)
+    return np.array(matrix)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--lanes', type=int, default=1000)
+    parser.add_argument('--points', type=int, nargs='+', default=[150, 1500])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    werte, offsets = synthetic_lanes(args.lanes)
+    print(f"{args.lanes} lanes, {len(werte)} samples")
+    print(f"{'points':>7} {'per-lane (s)':>13} {'batched (s)':>12} {'speed-up':>9} {'max |diff|':>11}")
+    for p in args.points:
+        t_ref, t_new = [], []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            ref = per_lane(werte, offsets, p)
+            t_ref.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            new = resample_bahnen(werte, offsets, p)
+            t_new.append(time.perf_counter() - t0)
+        diff = np.abs(ref - new).max()
+        print(f"{p:>7} {min(t_ref):>13.3f} {min(t_new):>12.4f} {min(t_ref) / min(t_new):>8.1f}x {diff:>11.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: frames per second of the time-scrub slider in Arduino/heatmap.py,
+original full redraw vs. blitting + min/max decimation + LOD scatter, on
+synthetic recordings of growing length (Agg canvas, so only rendering is
+measured, not the GUI event loop).
+
+    python benchmarks/bench_scrub_view.py --samples 1000 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+from matplotlib.widgets import Slider  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Arduino'))
+from heatmap import build_scrub_view  # noqa: E402
+
+MAP_SIZE = (9.6, 8.6)
+GRAPHS_SIZE = (7.7, 8.6)
+
+
+def synthetic_recording(n, seed=0):
+    """Random-walk trajectory over a table with a dipole-like field, 200 Hz."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / 200.0
+    traces = [np.cumsum(rng.normal(0, 0.01, n)) for _ in range(4)]
+    px = np.cumsum(traces[0]) / 200.0
+    py = np.cumsum(traces[1]) / 200.0
+    mag = 50 + 20 / (1 + (px - px.mean()) ** 2 + (py - py.mean()) ** 2)
+    return t, px, py, mag, traces
+
+
+def legacy_view(t, px, py, mag, traces):
+    """The original slider setup: full scatter, full lines, draw both figures per tick."""
+    fig_map = plt.figure(figsize=MAP_SIZE)
+    ax_map = fig_map.add_subplot(111)
+    ax_map.scatter(px, py, c=mag, cmap='plasma', s=30, alpha=0.6)
+    point_path, = ax_map.plot([], [], marker='o', color='lime', markersize=14, markeredgecolor='black')
+
+    fig_graphs = plt.figure(figsize=GRAPHS_SIZE)
+    lines, points = [], []
+    for k, y in enumerate(traces):
+        ax = fig_graphs.add_subplot(411 + k)
+        ax.set_xlim(t[0], t[-1])
+        ax.set_ylim(y.min(), y.max())
+        lines.append(ax.plot([], [], linewidth=2)[0])
+        points.append(ax.plot([], [], marker='o', color='red', markersize=5)[0])
+        ax.plot(t, y, alpha=0.2)
+    slider = Slider(ax=plt.axes([0.2, 0.02, 0.6, 0.03]), label='Time Scrub ',
+                    valmin=0, valmax=len(t) - 1, valinit=0, valstep=1)
+
+    def update(val):
+        idx = int(slider.val)
+        point_path.set_data([px[idx]], [py[idx]])
+        for line, point, y in zip(lines, points, traces):
+            line.set_data(t[:idx], y[:idx])
+            point.set_data([t[idx]], [y[idx]])
+        fig_map.canvas.draw()
+        fig_graphs.canvas.draw()
+
+    slider.on_changed(update)
+    return {'fig_map': fig_map, 'fig_graphs': fig_graphs, 'slider': slider}
+
+
+def fps(view, n, frames):
+    view['fig_map'].canvas.draw()
+    view['fig_graphs'].canvas.draw()
+    ticks = np.linspace(1, n - 1, frames).astype(int)
+    t0 = time.perf_counter()
+    for idx in ticks:
+        view['slider'].set_val(idx)
+    elapsed = time.perf_counter() - t0
+    plt.close('all')
+    return frames / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--legacy-max', type=int, default=100000,
+                        help="skip the original path above this many samples (too slow)")
+    args = parser.parse_args()
+
+    print(f"{'samples':>9} {'original (fps)':>15} {'blitted (fps)':>14}")
+    for n in args.samples:
+        t, px, py, mag, traces = synthetic_recording(n)
+        old = fps(legacy_view(t, px, py, mag, traces), n, args.frames) if n <= args.legacy_max else np.nan
+        new = fps(build_scrub_view(t, px, py, mag, *traces, map_size=MAP_SIZE, graphs_size=GRAPHS_SIZE),
+                  n, args.frames)
+        print(f"{n:>9} {old:>15.1f} {new:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark: drawing large |B| maps through tile_pyramid.py vs. at full
+resolution, on synthetic square maps (smooth field plus noise, unmeasured
+holes) stored as memory-mapped .npy:
+
+  build    level 0 + all coarser levels, strip by strip
+  view     800 x 600 px viewport, whole map and a 5 % zoom: tiles read, fetch
+           and Agg draw time vs. imshow / pcolormesh of the full array
+  3-D      plot_surface of the full matrix vs. decimated to 200 x 200
+
+    python benchmarks/bench_tile_pyramid.py --sizes 1024 4096 8192
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tile_pyramid import TilePyramid, decimate, from_array  # noqa: E402
+
+PIXELS = (800, 600)
+
+
+def best_of(fn, repeat):
+    best, result = np.inf, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def synthetic_map(path, n, seed=0):
+    """n x n map over 0..1.6 m, written strip by strip."""
+    rng = np.random.default_rng(seed)
+    z = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(n, n))
+    x = np.linspace(0, 1.6, n)
+    for r0 in range(0, n, 1024):
+        y = np.linspace(0, 1.6, n)[r0:r0 + 1024, None]
+        strip = 48 + 15 * np.exp(-((x - 0.5) ** 2 + (y - 1.0) ** 2) / 0.02) + 3 * np.sin(40 * x) * np.cos(30 * y)
+        strip = strip + rng.normal(0, 0.3, strip.shape)
+        strip[rng.random(strip.shape) < 0.02] = np.nan
+        z[r0:r0 + 1024] = strip
+    z.flush()
+    return np.load(path, mmap_mode='r')
+
+
+def draw(data, extent, mesh=False):
+    fig = plt.figure(figsize=(PIXELS[0] / 100, PIXELS[1] / 100), dpi=100)
+    ax = fig.add_axes([0, 0, 1, 1])
+    if mesh:
+        ax.pcolormesh(np.asarray(data), cmap='inferno', shading='auto')
+    else:
+        ax.imshow(data, extent=extent, origin='lower', cmap='inferno', interpolation='nearest', aspect='auto')
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def view(pyr, xlim, ylim):
+    pyr.tiles_read = 0
+    data, extent, level = pyr.window(xlim, ylim, PIXELS)
+    draw(data, extent)
+    return level, pyr.tiles_read
+
+
+def surface(z):
+    fig = plt.figure(figsize=(8, 6))
+    ax = fig.add_subplot(111, projection='3d')
+    X, Y = np.meshgrid(np.arange(z.shape[0]), np.arange(z.shape[1]), indexing='ij')
+    ax.plot_surface(X, Y, z, cmap='inferno', linewidth=0, rstride=1, cstride=1)
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1024, 4096, 8192])
+    parser.add_argument('--full-limit', type=int, default=4096, help="full-resolution imshow up to this size")
+    parser.add_argument('--mesh-limit', type=int, default=1024, help="full-resolution pcolormesh up to this size")
+    parser.add_argument('--surface-sizes', type=int, nargs='*', default=[150, 400, 800])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'cells':>11} {'levels':>6} {'build (s)':>9} {'full: lvl':>9} {'tiles':>5} {'draw (ms)':>9} "
+          f"{'zoom: lvl':>9} {'tiles':>5} {'draw (ms)':>9} {'imshow (ms)':>11} {'pcolormesh (ms)':>15}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            z = synthetic_map(os.path.join(tmp, 'map.npy'), n)
+            extent = (0, 1.6, 0, 1.6)
+            t_build, _ = best_of(lambda: from_array(os.path.join(tmp, 'pyr'), z, extent), 1)
+            pyr = TilePyramid(os.path.join(tmp, 'pyr'))
+            t_full, (l_full, n_full) = best_of(lambda: view(pyr, (0, 1.6), (0, 1.6)), args.repeat)
+            t_zoom, (l_zoom, n_zoom) = best_of(lambda: view(pyr, (0.4, 0.76), (0.9, 1.17)), args.repeat)
+            t_im = f"{best_of(lambda: draw(np.asarray(z), extent), 1)[0] * 1e3:>11.0f}" \
+                if n <= args.full_limit else f"{'-':>11}"
+            t_pm = f"{best_of(lambda: draw(z, extent, mesh=True), 1)[0] * 1e3:>15.0f}" \
+                if n <= args.mesh_limit else f"{'-':>15}"
+            print(f"{n * n:>11} {len(pyr.levels):>6} {t_build:>9.2f} {l_full:>9} {n_full:>5} {t_full * 1e3:>9.0f} "
+                  f"{l_zoom:>9} {n_zoom:>5} {t_zoom * 1e3:>9.0f} {t_im} {t_pm}")
+
+    if args.surface_sizes:
+        print(f"\n{'surface':>9} {'full (s)':>9} {'decimated (s)':>13}")
+        rng = np.random.default_rng(1)
+        for n in args.surface_sizes:
+            z = rng.normal(50, 3, (n, n))
+            t_full, _ = best_of(lambda: surface(z), 1)
+            t_dec, _ = best_of(lambda: surface(decimate(z, (200, 200))), 1)
+            print(f"{n:>4}x{n:<4} {t_full:>9.2f} {t_dec:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
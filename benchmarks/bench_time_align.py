@@ -0,0 +1,100 @@
+"""
+Benchmark: time alignment with time_align.Alignment vs. the pandas/scipy
+paths it replaces, on synthetic lanes (accelerometer 500 Hz, magnetometer
+100 Hz with an offset clock):
+
+  nearest  merge_asof(direction='nearest', tolerance=0.1) + dropna  (EXPOM lanes)
+  interp1d two interp1d(bounds_error=False) + dropna               (process_table.py)
+  np.interp three np.interp calls                                  (heatmap.py)
+
+    python benchmarks/bench_time_align.py --samples 1000 10000 100000 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import interp1d
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from time_align import Alignment  # noqa: E402
+
+OFFSET = 0.137   # magnetometer clock ahead of the accelerometer clock (s)
+
+
+def best_of(fn, repeat):
+    best, result = np.inf, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def synthetic(n, seed=0):
+    """Jittered, sorted timestamps with a dropout gap, plus channels."""
+    rng = np.random.default_rng(seed)
+    t_acc = np.cumsum(rng.uniform(0.0015, 0.0025, n))
+    t_acc[n // 2:] += 0.5                                    # dropout
+    m = max(n // 5, 2)
+    t_mag = np.sort(rng.uniform(t_acc[0], t_acc[-1], m)) + OFFSET
+    return t_acc, rng.normal(size=(n, 3)), t_mag, rng.normal(size=(m, 3))
+
+
+def nearest_pandas(t_acc, acc, t_mag):
+    df_acc = pd.DataFrame({'Time': t_acc, 'pos_y': acc[:, 0]})
+    df_mag = pd.DataFrame({'Time': t_mag - OFFSET})
+    df = pd.merge_asof(df_mag, df_acc, on='Time', direction='nearest', tolerance=0.1).dropna(subset=['pos_y'])
+    return df['pos_y'].to_numpy()
+
+
+def nearest_kernel(t_acc, acc, t_mag):
+    pos = Alignment(t_acc, t_mag, offset=OFFSET).nearest(acc[:, 0], tolerance=0.1)
+    return pos[~np.isnan(pos)]
+
+
+def interp1d_scipy(t_acc, acc, t_mag):
+    q = t_mag - OFFSET
+    s1 = interp1d(t_acc, acc[:, 0], bounds_error=False, fill_value=np.nan)(q)
+    s2 = interp1d(t_acc, acc[:, 1], bounds_error=False, fill_value=np.nan)(q)
+    df = pd.DataFrame({'S1': s1, 'S2': s2}).dropna(subset=['S1', 'S2'])
+    return df.to_numpy()
+
+
+def interp1d_kernel(t_acc, acc, t_mag):
+    s12 = Alignment(t_acc, t_mag, offset=OFFSET).linear(acc[:, :2], outside='nan')
+    return s12[~np.isnan(s12).any(axis=1)]
+
+
+def interp_numpy(t_mag, mag, t_acc):
+    return np.column_stack([np.interp(t_acc, t_mag, mag[:, k]) for k in range(3)])
+
+
+def interp_kernel(t_mag, mag, t_acc):
+    return Alignment(t_mag, t_acc).linear(mag)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--samples', type=int, nargs='+', default=[1000, 10000, 100000, 1000000, 10000000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'samples':>9} {'case':>9} {'original (ms)':>14} {'kernel (ms)':>12} {'speedup':>8} {'max diff':>9}")
+    for n in args.samples:
+        t_acc, acc, t_mag, mag = synthetic(n)
+        cases = [('nearest', nearest_pandas, nearest_kernel, (t_acc, acc, t_mag)),
+                 ('interp1d', interp1d_scipy, interp1d_kernel, (t_acc, acc, t_mag)),
+                 ('np.interp', interp_numpy, interp_kernel, (t_mag, mag, t_acc))]
+        for name, old, new, data in cases:
+            t_old, r_old = best_of(lambda: old(*data), args.repeat)
+            t_new, r_new = best_of(lambda: new(*data), args.repeat)
+            diff = np.abs(r_old - r_new).max() if len(r_old) else 0.0
+            print(f"{n:>9} {name:>9} {t_old * 1e3:>14.2f} {t_new * 1e3:>12.2f} "
+                  f"{t_old / t_new:>7.1f}x {diff:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
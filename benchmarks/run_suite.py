@@ -0,0 +1,533 @@
+"""
+End-to-end benchmark and regression suite: runs every pipeline stage
+headlessly over the bundled datasets (Arduino table1/2/3, 30s/10s_table3,
+all Tisch_Scheune* lane sets, the Inside_Outside walks) and over synthetic
+copies of table3, Tisch_Scheune_magnetisch and Inside_Outside scaled up
+10x-1000x (recordings repeated back to back in time).
+
+Stage times come from the stage_timer.py marks in the scripts. Every case
+is appended to a JSON-lines history; a stage slower than --threshold times
+the median of its last --window runs on the same host raises an alert.
+Outputs (maps, lane matrices, changepoints) are compared with the golden
+.npz files committed in benchmarks/golden (every array thinned to at most
+GOLDEN_VALUES values); a missing golden is a failure, --update-golden
+writes them. --reference also runs the original implementations
+(parse_ultrasonic_robust, pandas cleaning, interp1d, merge_asof,
+resample_to_fixed_length, griddata; optimal partitioning without pruning
+for the walks) and checks that the current pipeline gives the same
+numbers. Exit status 1 on any mismatch, missing golden or alert. CSV loading is measured cold (private, emptied
+Phyphox cache).
+
+    python benchmarks/run_suite.py
+    python benchmarks/run_suite.py --reference --only "table*" --scales 10 100 1000
+    python benchmarks/run_suite.py --update-golden --scales
+"""
+import argparse
+import fnmatch
+import functools
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from scipy import integrate, interpolate, signal
+from scipy.interpolate import griddata
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+ARDUINO_DIR = os.path.join(ROOT, 'Arduino')
+EXPOM_DIR = os.path.join(ROOT, 'EXPOM&Accelerometer')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, ARDUINO_DIR)
+sys.path.insert(0, EXPOM_DIR)
+import phyphox_loader  # noqa: E402
+import process_table  # noqa: E402
+import stage_timer  # noqa: E402
+from changepoint import load_recording, pelt, rauschen, segment_stats  # noqa: E402
+from lane_index import index_campaign, index_session  # noqa: E402
+from recorder import format_rows  # noqa: E402
+from ultrasonic_parser import parse_ultrasonic_fast  # noqa: E402
+import heatmap_Tisch_Scheune_magnetisch as tisch  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+GOLDEN_VALUES = 4096   # values kept per golden array (regular thinning)
+SYNTHETIC_BASE = {'table': '3', 'lanes': 'Tisch_Scheune_magnetisch', 'walk': 'Inside_Outside.csv'}
+WRITE_ROWS = 100_000   # rows per format_rows call when writing synthetic CSVs
+MIN_HISTORY = 3        # past runs of a case needed before regression alerts
+
+
+# --- Pipelines (current implementation) ---
+def run_table(key, base_dir=ARDUINO_DIR):
+    merged = process_table.merge_points(key, base_dir)
+    if merged is None:
+        return None
+    clean_df, _ = merged
+    x, y, z = clean_df['S1'], clean_df['S2'], clean_df['B_abs']
+    with stage_timer.stage('grid', len(z)):
+        xi, yi = np.meshgrid(np.linspace(x.min(), x.max(), 300), np.linspace(y.min(), y.max(), 300))
+        zi = process_table.grid_map(x, y, z, xi, yi, method='linear')
+    return {'points': clean_df[['Time_s', 'S1', 'S2', 'B_abs']].to_numpy(), 'zi': zi}
+
+
+def run_lanes(ordner):
+    messungen = index_session(ordner)
+    magnet_matrix, x_positions = tisch.verarbeite_messungen(messungen)
+    return {'magnet_matrix': magnet_matrix, 'x_positions': np.array(x_positions)}
+
+
+def run_walk(pfad):
+    with stage_timer.stage('load') as st:
+        zeit, werte = load_recording(pfad)
+        st.samples = len(zeit)
+    rate = (len(zeit) - 1) / (zeit[-1] - zeit[0]) if len(zeit) > 1 else 1.0
+    with stage_timer.stage('pelt', len(werte)):
+        grenzen = pelt(werte, None, max(2, int(rate)), 'linear')
+    with stage_timer.stage('segment_stats', len(werte)):
+        stat = segment_stats(werte, grenzen, zeit)
+    return {'grenzen': np.asarray(grenzen), 'mean': stat['mean'], 'std': stat['std']}
+
+
+# --- Original implementations (baseline scripts) for --reference ---
+def reference_table(key, base_dir=ARDUINO_DIR):
+    pos_file, mag_file, _ = process_table.DATASETS[key]
+    pos_df = process_table.parse_ultrasonic_robust(os.path.join(base_dir, pos_file))
+    mag_df = pd.read_csv(os.path.join(base_dir, mag_file))
+    mag_df.columns = [c.split('(')[0].strip() for c in mag_df.columns]
+    mag_df.rename(columns={'Time': 'Time_s', 'Absolute field': 'B_abs'}, inplace=True)
+
+    pos_df['S1'] = pos_df['S1'].replace(0, np.nan)
+    pos_df['S1'] = pos_df['S1'].interpolate(method='linear', limit_direction='both')
+
+    def clean_jumps(series, threshold=25):
+        diff = series.diff().abs()
+        series[diff > threshold] = np.nan
+        return series.interpolate(method='linear', limit_direction='both')
+
+    pos_df['S1'] = clean_jumps(pos_df['S1'])
+    pos_df['S2'] = clean_jumps(pos_df['S2'])
+    if len(pos_df) > 500:
+        pos_df['S1'] = signal.medfilt(pos_df['S1'], kernel_size=7)
+        pos_df['S2'] = signal.medfilt(pos_df['S2'], kernel_size=7)
+        pos_df['S1'] = pos_df['S1'].rolling(window=5, center=True, min_periods=1).mean()
+        pos_df['S2'] = pos_df['S2'].rolling(window=5, center=True, min_periods=1).mean()
+    else:
+        pos_df['S1'] = signal.medfilt(pos_df['S1'], kernel_size=3)
+        pos_df['S2'] = signal.medfilt(pos_df['S2'], kernel_size=3)
+
+    for col in ('S1', 'S2'):
+        f = interpolate.interp1d(pos_df['Time_s'], pos_df[col], kind='linear', bounds_error=False, fill_value=np.nan)
+        mag_df[col] = f(mag_df['Time_s'])
+    merged_df = mag_df.dropna(subset=['S1', 'S2'])
+    clean_df = merged_df[merged_df['S1'] > process_table.FILTER_S1_THRESHOLD]
+    x, y, z = clean_df['S1'], clean_df['S2'], clean_df['B_abs']
+    xi, yi = np.meshgrid(np.linspace(x.min(), x.max(), 300), np.linspace(y.min(), y.max(), 300))
+    zi = griddata((x, y), z, (xi, yi), method='linear')
+    return {'points': clean_df[['Time_s', 'S1', 'S2', 'B_abs']].to_numpy(), 'zi': zi}
+
+
+def resample_to_fixed_length(df, num_points):
+    """Original lane resampling: interp1d on the index axis 0..n-1, one DataFrame per lane."""
+    if len(df) < 2:
+        return df
+    old_indices = np.arange(len(df))
+    new_indices = np.linspace(0, len(df) - 1, num_points)
+    df_new = pd.DataFrame()
+    for col in ['global_x', 'global_y', 'Magnet_Betrag']:
+        if col in df.columns:
+            f = interpolate.interp1d(old_indices, df[col], kind='linear')
+            df_new[col] = f(new_indices)
+    return df_new
+
+
+def reference_lanes(ordner):
+    def lade(pfad, namen):
+        df = pd.read_csv(pfad).iloc[:, :4]
+        df.columns = namen
+        df['Time'] = df['Time'].astype(float)
+        return df.sort_values('Time')
+
+    matrix, x_positions = [], []
+    for bahn in index_session(ordner):
+        df_acc = lade(bahn['acc_file'], ['Time', 'ax', 'ay', 'az'])
+        df_mag = lade(bahn['mag_file'], ['Time', 'mx', 'my', 'mz'])
+        dt = df_acc['Time'].diff().mean()
+        if pd.isna(dt) or dt == 0:
+            dt = 0.002
+        df_acc['pos_x'] = 0.0
+        vy = integrate.cumulative_trapezoid(df_acc['ay'], dx=dt, initial=0)
+        vy = signal.detrend(vy, type='linear')
+        py_raw = integrate.cumulative_trapezoid(vy, dx=dt, initial=0)
+        if abs(py_raw[-1]) > 0.01:
+            py = py_raw * (tisch.REAL_DISTANCE_Y / py_raw[-1])
+            df_acc['pos_y'] = -py if py[-1] < 0 else py
+        else:
+            df_acc['pos_y'] = np.linspace(0, tisch.REAL_DISTANCE_Y, len(df_acc))
+        df_mag['Magnet_Betrag'] = np.sqrt(df_mag['mx'] ** 2 + df_mag['my'] ** 2 + df_mag['mz'] ** 2)
+        df_final = pd.merge_asof(df_mag, df_acc[['Time', 'pos_x', 'pos_y']], on='Time', direction='nearest',
+                                 tolerance=0.1).dropna(subset=['pos_y'])
+        if df_final.empty:
+            continue
+        df_resampled = resample_to_fixed_length(df_final, tisch.TARGET_POINTS)
+        matrix.append(df_resampled['Magnet_Betrag'].values)
+        x_positions.append(bahn['start_x'])
+    return {'magnet_matrix': np.array(matrix), 'x_positions': np.array(x_positions)}
+
+
+def reference_walk(pfad):
+    """Optimal partitioning (no pruning, no blocks) with the level+slope cost, statistics with numpy per segment."""
+    zeit, werte = load_recording(pfad)
+    rate = (len(zeit) - 1) / (zeit[-1] - zeit[0]) if len(zeit) > 1 else 1.0
+    min_laenge = max(2, int(rate))
+    x = (werte - werte.mean(axis=0)) / rauschen(werte, min_laenge)
+    n, d = x.shape
+    beta = (2 * d + 1) * np.log(n)
+    F = np.full(n + 1, np.inf)
+    F[0] = -beta
+    letzte = np.zeros(n + 1, dtype=np.int64)
+    for t in range(min_laenge, n + 1):
+        s = np.arange(0, t - min_laenge + 1)
+        s = s[(s == 0) | (s >= min_laenge)]
+        # Least-squares line through x[s:t] for every start s: sums counted back from t
+        y = x[t - 1::-1]
+        j = np.arange(t, dtype=np.float64)[:, None]
+        m = j + 1
+        S, Q, J = np.cumsum(y, axis=0), np.cumsum(y * y, axis=0), np.cumsum(j * y, axis=0)
+        sxx = m * (m * m - 1) / 12
+        sxy = J - j / 2 * S
+        rss = Q - S * S / m - np.divide(sxy * sxy, sxx, out=np.zeros_like(sxy), where=sxx > 0)
+        kosten = np.maximum(rss, 0).sum(axis=1)[t - s - 1]
+        best = np.argmin(F[s] + kosten)
+        F[t] = F[s[best]] + kosten[best] + beta
+        letzte[t] = s[best]
+    grenzen, t = [], n
+    while t > 0:
+        t = letzte[t]
+        if t > 0:
+            grenzen.append(t)
+    grenzen = np.array(grenzen[::-1], dtype=np.int64)
+    teile = np.split(werte, grenzen)
+    return {'grenzen': grenzen, 'mean': np.array([t.mean(axis=0) for t in teile]),
+            'std': np.array([t.std(axis=0) for t in teile])}
+
+
+# --- Synthetic datasets ---
+def _read_csv_rows(pfad):
+    with open(pfad) as f:
+        header = f.readline()
+    return header, pd.read_csv(pfad).to_numpy(dtype=np.float64)
+
+
+def _span(t):
+    """Length of a recording including one sample interval, so copies do not overlap."""
+    return float(t[-1] - t[0] + np.median(np.diff(t))) if len(t) > 1 else 1.0
+
+
+def tile_csv(src, dst, copies, period=None):
+    """Writes the Phyphox CSV src copies times back to back in time. Returns the period used."""
+    header, rows = _read_csv_rows(src)
+    period = _span(rows[:, 0]) if period is None else period
+    with open(dst, 'w') as f:
+        f.write(header)
+        for k in range(copies):
+            block = rows.copy()
+            block[:, 0] += k * period
+            for i in range(0, len(block), WRITE_ROWS):
+                f.write(format_rows(block[i:i + WRITE_ROWS]))
+    return period
+
+
+def tile_log(src, dst, copies, period):
+    """Writes the serial-monitor log src copies times, the HH:MM:SS.fff prefixes shifted by period."""
+    stamps, rest = [], []
+    with open(src) as f:
+        for line in f:
+            head, sep, tail = line.partition('->')
+            try:
+                hh, mm, ss = head.strip().split(':')
+                stamps.append((int(hh) * 60 + int(mm)) * 60 + float(ss))
+            except ValueError:
+                continue
+            rest.append(sep + tail if tail.endswith('\n') else sep + tail + '\n')
+    stamps = np.array(stamps)
+    with open(dst, 'w') as f:
+        for k in range(copies):
+            t = np.round((stamps + k * period) % 86400, 3)
+            f.writelines("%02d:%02d:%06.3f %s" % (s // 3600, s % 3600 // 60, s % 60, r) for s, r in zip(t, rest))
+
+
+# synthetic_* write one dataset into tmp and return the arguments for run_* / reference_*
+def synthetic_table(tmp, scale):
+    pos_file, mag_file, display_name = process_table.DATASETS[SYNTHETIC_BASE['table']]
+    pos_src, mag_src = os.path.join(ARDUINO_DIR, pos_file), os.path.join(ARDUINO_DIR, mag_file)
+    # One period for both sensors keeps every copy aligned like the original
+    with redirect_stdout(io.StringIO()):
+        t_pos = parse_ultrasonic_fast(pos_src)['Time_s'].to_numpy()
+    period = max(_span(t_pos), _span(_read_csv_rows(mag_src)[1][:, 0])) + 1.0
+    tile_log(pos_src, os.path.join(tmp, pos_file), scale, period)
+    tile_csv(mag_src, os.path.join(tmp, mag_file), scale, period)
+    key = f"x{scale}"
+    process_table.DATASETS[key] = (pos_file, mag_file, f"{display_name} x{scale}")
+    return key, tmp
+
+
+def synthetic_lanes(tmp, scale):
+    name = SYNTHETIC_BASE['lanes']
+    ordner = os.path.join(tmp, name)
+    os.makedirs(ordner, exist_ok=True)
+    for bahn in index_campaign(EXPOM_DIR)[name]:
+        for key in ('acc_file', 'mag_file'):
+            tile_csv(bahn[key], os.path.join(ordner, os.path.basename(bahn[key])), scale)
+    return (ordner,)
+
+
+def synthetic_walk(tmp, scale):
+    dst = os.path.join(tmp, SYNTHETIC_BASE['walk'])
+    tile_csv(os.path.join(EXPOM_DIR, SYNTHETIC_BASE['walk']), dst, scale)
+    return (dst,)
+
+
+# --- Cases ---
+def build_cases(scales, tmp):
+    """Case dicts: name, kind, scale, run (callable) and reference (callable); synthetic data is written lazily."""
+    cases = []
+    for key, (pos_file, _, _) in process_table.DATASETS.items():
+        cases.append({'name': os.path.splitext(pos_file)[0], 'kind': 'table', 'scale': 1,
+                      'run': functools.partial(run_table, key), 'reference': functools.partial(reference_table, key)})
+    for name, messungen in index_campaign(EXPOM_DIR).items():
+        ordner = os.path.dirname(messungen[0]['acc_file'])
+        cases.append({'name': name, 'kind': 'lanes', 'scale': 1, 'run': functools.partial(run_lanes, ordner),
+                      'reference': functools.partial(reference_lanes, ordner)})
+    for datei in sorted(f for f in os.listdir(EXPOM_DIR) if fnmatch.fnmatch(f.lower(), 'inside_outside*.csv')):
+        cases.append({'name': os.path.splitext(datei)[0], 'kind': 'walk', 'scale': 1,
+                      'run': functools.partial(run_walk, os.path.join(EXPOM_DIR, datei)),
+                      'reference': functools.partial(reference_walk, os.path.join(EXPOM_DIR, datei))})
+
+    base_table = os.path.splitext(process_table.DATASETS[SYNTHETIC_BASE['table']][0])[0]
+    synthetic = (('table', synthetic_table, run_table, reference_table, base_table),
+                 ('lanes', synthetic_lanes, run_lanes, reference_lanes, SYNTHETIC_BASE['lanes']),
+                 ('walk', synthetic_walk, run_walk, None, os.path.splitext(SYNTHETIC_BASE['walk'])[0]))
+    for scale in scales:
+        for kind, make, run, reference, base in synthetic:
+            cases.append({'name': f"{base}_x{scale}", 'kind': kind, 'scale': scale,
+                          'prepare': functools.partial(_prepare, make, run, reference,
+                                                       os.path.join(tmp, f"x{scale}"), scale)})
+    return cases
+
+
+def _prepare(make, run, reference, folder, scale):
+    """Writes one synthetic dataset; returns run and reference bound to it."""
+    os.makedirs(folder, exist_ok=True)
+    target = make(folder, scale)
+    return functools.partial(run, *target), reference and functools.partial(reference, *target)
+
+
+# --- Checks ---
+def compare(out, ref, rtol, atol):
+    """Numerical equivalence of two output dicts (NaN where the other has NaN)."""
+    worst = 0.0
+    for key in ref:
+        if key not in out:
+            return {'status': 'mismatch', 'detail': f"missing '{key}'"}
+        a, b = np.asarray(out[key], dtype=float), np.asarray(ref[key], dtype=float)
+        if a.shape != b.shape:
+            return {'status': 'mismatch', 'detail': f"{key}: shape {a.shape} != {b.shape}"}
+        if not np.array_equal(np.isnan(a), np.isnan(b)):
+            return {'status': 'mismatch', 'detail': f"{key}: {int(np.sum(np.isnan(a) != np.isnan(b)))} NaN cells differ"}
+        diff = np.abs(a - b)
+        if diff.size and np.isfinite(diff).any():
+            worst = max(worst, float(np.nanmax(diff)))
+        if not np.allclose(a, b, rtol=rtol, atol=atol, equal_nan=True):
+            return {'status': 'mismatch', 'detail': f"{key}: max |diff| {np.nanmax(diff):.3g}", 'max_abs_diff': worst}
+    return {'status': 'ok', 'max_abs_diff': worst}
+
+
+def thin(a, budget=GOLDEN_VALUES):
+    """Every k-th element along each axis longer than 16, so that about budget values remain."""
+    a = np.asarray(a)
+    lang = [i for i, m in enumerate(a.shape) if m > 16]
+    if a.size <= budget or not lang:
+        return a
+    k = int(np.ceil((a.size / budget) ** (1 / len(lang))))
+    return a[tuple(slice(None, None, k) if i in lang else slice(None) for i in range(a.ndim))]
+
+
+def check_golden(name, out, golden_dir, update, rtol, atol):
+    """Compares the thinned outputs with <golden_dir>/<name>.npz; missing goldens fail unless update."""
+    path = os.path.join(golden_dir, f"{name}.npz")
+    out = {key: thin(value) for key, value in out.items()}
+    if update:
+        os.makedirs(golden_dir, exist_ok=True)
+        np.savez_compressed(path, **out)
+        return {'status': 'updated'}
+    if not os.path.exists(path):
+        return {'status': 'missing', 'detail': f"no golden {os.path.relpath(path)} (run with --update-golden)"}
+    with np.load(path) as golden:
+        return compare(out, dict(golden), rtol, atol)
+
+
+def regressions(entry, history, threshold, min_time, window):
+    """Stages slower than threshold x the median of the last window runs of the case on this host."""
+    past = [h for h in history if h['case'] == entry['case'] and h['host'] == entry['host'] and h.get('stages')]
+    past = past[-window:]
+    if len(past) < MIN_HISTORY:
+        return []
+    alerts = []
+    timings = dict(entry['stages'], total={'wall_s': entry['total_s']})
+    for path, st in timings.items():
+        before = [h['total_s'] if path == 'total' else h['stages'].get(path, {}).get('wall_s') for h in past]
+        before = [b for b in before if b is not None]
+        if len(before) < MIN_HISTORY:
+            continue
+        base = float(np.median(before))
+        if st['wall_s'] > threshold * base and st['wall_s'] - base > min_time:
+            alerts.append(f"{path}: {st['wall_s']:.3f} s vs median {base:.3f} s ({st['wall_s'] / base:.2f}x)")
+    return alerts
+
+
+# --- Running ---
+def timed_run(fn, repeat, memory):
+    """Best-of-repeat stage times (cold Phyphox cache every time) and the output of the last run."""
+    best, out = None, None
+    for _ in range(repeat):
+        shutil.rmtree(phyphox_loader.CACHE_DIR, ignore_errors=True)
+        timer = stage_timer.start('suite', memory=memory)
+        t0 = time.perf_counter()
+        try:
+            with redirect_stdout(io.StringIO()):
+                out = fn()
+        finally:
+            stage_timer.stop()
+        total = time.perf_counter() - t0
+        stages = {path: {'wall_s': a['wall_s'], 'cpu_s': a['cpu_s'], 'samples': a['samples'], 'peak_mb': a['peak_mb']}
+                  for path, a in timer.summary().items()}
+        if best is None or total < best[0]:
+            best = (total, stages)
+    return best[0], best[1], out
+
+
+def git_commit():
+    try:
+        head = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True).stdout.strip()
+        return head + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--only', nargs='+', help="case name patterns (fnmatch), e.g. 'table*' '*_x100'")
+    parser.add_argument('--scales', type=int, nargs='*', default=[10, 100],
+                        help="synthetic scale factors (1000 needs a few GB of RAM for table3; none: real data only)")
+    parser.add_argument('--repeat', type=int, default=1, help="best-of runs per case")
+    parser.add_argument('--reference', action='store_true', help="also run the original implementations and compare")
+    parser.add_argument('--update-golden', action='store_true', help="overwrite the golden outputs with this run")
+    parser.add_argument('--rtol', type=float, default=1e-9)
+    parser.add_argument('--atol', type=float, default=1e-9)
+    parser.add_argument('--threshold', type=float, default=1.25, help="alert above this x the historical median")
+    parser.add_argument('--min-time', type=float, default=0.05, help="ignore slowdowns smaller than this (s)")
+    parser.add_argument('--window', type=int, default=5, help="past runs in the historical median")
+    parser.add_argument('--history', default=os.path.join(RESULTS_DIR, 'history.jsonl'))
+    parser.add_argument('--golden', default=GOLDEN_DIR)
+    parser.add_argument('--memory', action='store_true', help="trace peak memory per stage (slows allocation)")
+    parser.add_argument('--list', action='store_true', help="list the cases and exit")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='ps_magfield_suite_')
+    phyphox_loader.CACHE_DIR = os.path.join(tmp, 'cache')
+    cases = build_cases(args.scales, tmp)
+    if args.only:
+        cases = [c for c in cases if any(fnmatch.fnmatch(c['name'], p) for p in args.only)]
+    if args.list:
+        for c in cases:
+            print(f"{c['name']:<40} {c['kind']:<6} x{c['scale']}")
+        shutil.rmtree(tmp, ignore_errors=True)
+        return 0
+
+    history = load_history(args.history)
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    meta = {'run': datetime.now().isoformat(timespec='seconds'), 'commit': git_commit(), 'host': platform.node(),
+            'cpu_count': os.cpu_count(), 'python': platform.python_version(), 'numpy': np.__version__}
+    print(f"Suite run {meta['run']} at {meta['commit']} on {meta['host']} ({meta['cpu_count']} CPUs)")
+    print(f"\n{'case':<36} {'scale':>6} {'samples':>10} {'total (s)':>10} {'slowest stage':<24} "
+          f"{'golden':>9} {'reference':>10}")
+
+    failures = 0
+    try:
+        for case in cases:
+            entry = dict(meta, case=case['name'], kind=case['kind'], scale=case['scale'])
+            run, reference = case.get('run'), case.get('reference')
+            if 'prepare' in case:
+                t0 = time.perf_counter()
+                run, reference = case['prepare']()
+                entry['prepare_s'] = time.perf_counter() - t0
+            try:
+                total, stages, out = timed_run(run, args.repeat, args.memory)
+            except FileNotFoundError as e:
+                out, entry['error'] = None, str(e)
+            if out is None:
+                entry['status'] = 'skipped'
+                print(f"{case['name']:<36} {case['scale']:>6} {'skipped (missing data)':>10}")
+                with open(args.history, 'a') as f:
+                    f.write(json.dumps(entry) + '\n')
+                continue
+
+            entry.update(status='done', total_s=total, stages=stages,
+                         samples=max((s['samples'] or 0 for s in stages.values()), default=0))
+            entry['golden'] = check_golden(case['name'], out, args.golden, args.update_golden, args.rtol, args.atol)
+            if args.reference and reference is not None:
+                t0 = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    ref = reference()
+                entry['reference'] = dict(compare(out, ref, args.rtol, args.atol),
+                                          time_s=time.perf_counter() - t0)
+                entry['reference']['speedup'] = entry['reference']['time_s'] / total
+            entry['alerts'] = regressions(entry, history, args.threshold, args.min_time, args.window)
+            history.append(entry)
+            with open(args.history, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+            slowest = max(stages.items(), key=lambda kv: kv[1]['wall_s'] if '/' not in kv[0] else 0,
+                          default=('-', None))[0]
+            ref_text = '-'
+            if 'reference' in entry:
+                ref_text = (f"{entry['reference']['speedup']:.1f}x" if entry['reference']['status'] == 'ok'
+                            else 'MISMATCH')
+            print(f"{case['name']:<36} {case['scale']:>6} {entry['samples']:>10} {total:>10.3f} {slowest:<24} "
+                  f"{entry['golden']['status']:>9} {ref_text:>10}")
+            for problem in (entry['golden'], entry.get('reference', {})):
+                if problem.get('status') in ('mismatch', 'missing'):
+                    print(f"    {problem['status']}: {problem['detail']}")
+                    failures += 1
+            for alert in entry['alerts']:
+                print(f"    REGRESSION {alert}")
+                failures += 1
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print(f"\nHistory: {args.history}")
+    if failures:
+        print(f"{failures} problem(s) found")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Columnar on-disk store for the whole measurement campaign: Phyphox lanes
+(magnetometer, accelerometer), ultrasonic tracks and the processed
+(x, y, |B|) points of every session, one memory-mapped .npy file per column
+plus a JSON index.
+
+    <root>/index.json                                  sessions, streams, spatial grids
+    <root>/sessions/<session>/<stream>/<column>.npy    sorted by the stream's time column
+    <root>/spatial/<frame>/<column>.npy                processed points of all sessions,
+                                                       sorted by grid cell (CSR offsets in cells.npy)
+
+Every stream is sorted by time, so a time window is two binary searches on
+the memory-mapped time column and the rest are zero-copy slices. Processed
+points live in one spatial index per coordinate frame ('table_cm' for the
+ultrasonic tables, 'tisch_m' for the Tisch_Scheune sessions): a region query
+reads only the cells the rectangle overlaps, one contiguous slice per grid
+row, instead of scanning every session.
+
+    python campaign_store.py build campaign_db
+    python campaign_store.py query campaign_db --frame table_cm --region 100 150 40 80
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+POINT_COLUMNS = ('x', 'y', 'b', 't')
+POINTS_STREAM = 'points'
+TARGET_PER_CELL = 32      # average processed points per cell of the spatial grid
+MAX_CELLS = 1 << 20
+
+
+def _atomic_save(path, arr):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, arr)
+    os.replace(tmp, path)
+
+
+def _load(path, rows):
+    # np.load cannot memory-map an empty array
+    return np.load(path, mmap_mode='r') if rows else np.load(path)
+
+
+class CampaignStore:
+    """
+    A campaign directory (created on first write). Add streams and points with
+    add_stream / add_points, then call commit() to rebuild the spatial
+    indexes and write index.json.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        try:
+            with open(os.path.join(self.root, 'index.json')) as f:
+                self.index = json.load(f)
+        except FileNotFoundError:
+            self.index = {'sessions': {}, 'spatial': {}}
+        self._dirty = set()
+
+    # --- Writing ---
+    def _dir(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def add_stream(self, session, stream, columns, time_col, source=None, **meta):
+        """
+        Stores one stream (dict column -> 1-D array of equal length), sorted
+        by time_col. Replaces an existing stream of the same name.
+        """
+        t = np.asarray(columns[time_col], dtype=np.float64)
+        # argsort puts NaN times last
+        order = None if np.all(t[1:] >= t[:-1]) else np.argsort(t, kind='stable')
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if len(values) != len(t):
+                raise ValueError(f"{session}/{stream}: column {name} has {len(values)} rows, expected {len(t)}")
+            _atomic_save(self._dir('sessions', session, stream, name + '.npy'),
+                         values if order is None else values[order])
+
+        finite = bool(np.isfinite(t).any())
+        entry = self.index['sessions'].setdefault(session, {'streams': {}})
+        entry['streams'][stream] = {
+            'rows': len(t), 'columns': list(columns), 'time_col': time_col,
+            't_min': float(np.nanmin(t)) if finite else None, 't_max': float(np.nanmax(t)) if finite else None,
+            'source': source,
+        }
+        entry.update(meta)
+
+    def add_points(self, session, x, y, b, t=None, frame='table_cm', source=None):
+        """Processed points of a session in the coordinates of frame (t: NaN if unknown)."""
+        x = np.asarray(x, dtype=np.float64)
+        t = np.full(len(x), np.nan) if t is None else np.asarray(t, dtype=np.float64)
+        cols = {'x': x, 'y': np.asarray(y, dtype=np.float64), 'b': np.asarray(b, dtype=np.float64), 't': t}
+        self.add_stream(session, POINTS_STREAM, cols, 't', source, frame=frame)
+        self._dirty.add(frame)
+
+    def commit(self, target_per_cell=TARGET_PER_CELL):
+        """Rebuilds the spatial indexes of changed frames and writes index.json."""
+        for frame in sorted(self._dirty):
+            self._build_spatial(frame, target_per_cell)
+        self._dirty.clear()
+        os.makedirs(self.root, exist_ok=True)
+        path = self._dir('index.json')
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp, path)
+
+    def _build_spatial(self, frame, target_per_cell):
+        names = [s for s in self.sessions() if self.index['sessions'][s].get('frame') == frame
+                 and POINTS_STREAM in self.index['sessions'][s]['streams']]
+        parts = {c: [] for c in POINT_COLUMNS}
+        sid = []
+        for k, s in enumerate(names):
+            for c in POINT_COLUMNS:
+                parts[c].append(np.asarray(self.column(s, POINTS_STREAM, c)))
+            sid.append(np.full(len(parts['x'][-1]), k, dtype=np.int32))
+        cols = {c: np.concatenate(v) if v else np.empty(0) for c, v in parts.items()}
+        cols['session'] = np.concatenate(sid) if sid else np.empty(0, dtype=np.int32)
+        ok = np.isfinite(cols['x']) & np.isfinite(cols['y'])
+        cols = {c: v[ok] for c, v in cols.items()}
+        n = len(cols['x'])
+
+        # Square-ish grid over the bounds with ~target_per_cell points per cell
+        if n:
+            x0, x1 = cols['x'].min(), cols['x'].max()
+            y0, y1 = cols['y'].min(), cols['y'].max()
+        else:
+            x0 = x1 = y0 = y1 = 0.0
+        w, h = max(x1 - x0, 1e-9), max(y1 - y0, 1e-9)
+        cells = int(np.clip(n / target_per_cell, 1, MAX_CELLS))
+        size = np.sqrt(w * h / cells)
+        nx, ny = max(int(np.ceil(w / size)), 1), max(int(np.ceil(h / size)), 1)
+        dx, dy = w / nx, h / ny
+
+        cell = self._cell_of(cols['x'], cols['y'], x0, y0, dx, dy, nx, ny)
+        order = np.argsort(cell, kind='stable')
+        offsets = np.zeros(nx * ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=nx * ny), out=offsets[1:])
+
+        out = self._dir('spatial', frame)
+        for c, v in cols.items():
+            _atomic_save(os.path.join(out, c + '.npy'), v[order])
+        _atomic_save(os.path.join(out, 'cells.npy'), offsets)
+        self.index['spatial'][frame] = {'sessions': names, 'points': n, 'x0': float(x0), 'y0': float(y0),
+                                        'dx': float(dx), 'dy': float(dy), 'nx': nx, 'ny': ny}
+
+    @staticmethod
+    def _cell_of(x, y, x0, y0, dx, dy, nx, ny):
+        ix = np.clip(((x - x0) / dx).astype(np.int64), 0, nx - 1)
+        iy = np.clip(((y - y0) / dy).astype(np.int64), 0, ny - 1)
+        return iy * nx + ix
+
+    # --- Reading ---
+    def sessions(self, kind=None):
+        return [s for s, e in self.index['sessions'].items() if kind is None or e.get('kind') == kind]
+
+    def streams(self, session):
+        return list(self.index['sessions'][session]['streams'])
+
+    def column(self, session, stream, name):
+        """One column as a read-only memory map."""
+        info = self.index['sessions'][session]['streams'][stream]
+        return _load(self._dir('sessions', session, stream, name + '.npy'), info['rows'])
+
+    def time_slice(self, session, stream, t0=-np.inf, t1=np.inf, columns=None):
+        """Columns of a stream with t0 <= time < t1 (binary search, zero-copy slices)."""
+        info = self.index['sessions'][session]['streams'][stream]
+        t = self.column(session, stream, info['time_col'])
+        lo, hi = np.searchsorted(t, [t0, t1], side='left')
+        return {c: self.column(session, stream, c)[lo:hi] for c in (columns or info['columns'])}
+
+    def frames(self):
+        return list(self.index['spatial'])
+
+    def _spatial(self, frame):
+        grid = self.index['spatial'][frame]
+        d = self._dir('spatial', frame)
+        cols = {c: _load(os.path.join(d, c + '.npy'), grid['points']) for c in POINT_COLUMNS + ('session',)}
+        return grid, cols, np.load(os.path.join(d, 'cells.npy'), mmap_mode='r')
+
+    def query_region(self, frame, xmin, xmax, ymin, ymax, sessions=None):
+        """
+        All processed points with xmin <= x <= xmax and ymin <= y <= ymax
+        (optionally only from the given sessions): dict x, y, b, t and
+        session (names). Reads only the grid rows and cells the rectangle
+        overlaps.
+        """
+        grid, cols, offsets = self._spatial(frame)
+        nx, ny = grid['nx'], grid['ny']
+        ix0, ix1 = (int(np.clip(np.floor((v - grid['x0']) / grid['dx']), 0, nx - 1)) for v in (xmin, xmax))
+        iy0, iy1 = (int(np.clip(np.floor((v - grid['y0']) / grid['dy']), 0, ny - 1)) for v in (ymin, ymax))
+        empty = xmax < grid['x0'] or ymax < grid['y0'] or xmin > grid['x0'] + nx * grid['dx'] \
+            or ymin > grid['y0'] + ny * grid['dy'] or xmin > xmax or ymin > ymax
+
+        # One contiguous run of rows per grid row
+        rows = np.arange(iy0, iy1 + 1) * nx
+        starts, ends = offsets[rows + ix0], offsets[rows + ix1 + 1]
+        idx = np.empty(0, dtype=np.int64) if empty else np.concatenate(
+            [np.arange(a, b) for a, b in zip(starts, ends)] or [np.empty(0, dtype=np.int64)])
+
+        x, y = cols['x'][idx], cols['y'][idx]
+        keep = (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+        sid = cols['session'][idx]
+        if sessions is not None:
+            keep &= np.isin(sid, [grid['sessions'].index(s) for s in sessions if s in grid['sessions']])
+        names = np.array(grid['sessions'] or [''], dtype=object)
+        return {'x': x[keep], 'y': y[keep], 'b': cols['b'][idx][keep], 't': cols['t'][idx][keep],
+                'session': names[sid[keep]]}
+
+
+# --- Ingestion of this repository ---
+def ingest_tables(store, base_dir=None):
+    """Arduino table scans: raw ultrasonic track, magnetometer and the merged points (S1, S2 in cm)."""
+    sys.path.insert(0, os.path.join(ROOT, 'Arduino'))
+    import process_table
+    from ultrasonic_parser import parse_ultrasonic_fast
+    from phyphox_loader import COLUMNS, load_phyphox_array
+
+    base_dir = base_dir or process_table.BASE_DIR
+    for key, (pos_file, mag_file, display_name) in process_table.DATASETS.items():
+        session = os.path.splitext(pos_file)[0]
+        try:
+            pos_df = parse_ultrasonic_fast(os.path.join(base_dir, pos_file))
+            mag = load_phyphox_array(os.path.join(base_dir, mag_file))
+        except FileNotFoundError:
+            print(f"{session}: missing files, skipped")
+            continue
+        store.add_stream(session, 'ultrasonic', {c: pos_df[c].to_numpy() for c in ('Time_s', 'S1', 'S2')},
+                         'Time_s', source=pos_file, kind='table', title=display_name)
+        store.add_stream(session, 'magnetometer', {c: mag[:, k] for k, c in enumerate(COLUMNS)},
+                         'Time', source=mag_file)
+        clean_df, _ = process_table.merge_points(key, base_dir)
+        store.add_points(session, clean_df['S1'], clean_df['S2'], clean_df['B_abs'], clean_df['Time_s'],
+                         frame='table_cm', source=f"process_table.merge_points('{key}')")
+
+
+def ingest_sessions(store, names=None):
+    """Tisch_Scheune sessions: every lane's accelerometer and magnetometer, heatmap points (m)."""
+    sys.path.insert(0, os.path.join(ROOT, 'EXPOM&Accelerometer'))
+    import heatmap_Tisch_Scheune_magnetisch as tisch
+    from phyphox_loader import COLUMNS, load_phyphox_array
+
+    datensaetze = tisch.lade_datensaetze(names) if names else tisch.finde_datensaetze()
+    for session, bahnen in datensaetze.items():
+        for bahn in bahnen:
+            for stream, pfad in (('accelerometer', bahn['acc_file']), ('magnetometer', bahn['mag_file'])):
+                arr = load_phyphox_array(pfad)
+                store.add_stream(session, f"lane{bahn['lane']:02d}/{stream}",
+                                 {c: arr[:, k] for k, c in enumerate(COLUMNS)}, 'Time',
+                                 source=os.path.relpath(pfad, ROOT), kind='tisch')
+        matrix, x_positions = tisch.verarbeite_messungen(bahnen)
+        if len(matrix) == 0:
+            continue
+        # Heatmap frame: x = lane start, y = resampled position along the lane
+        y = np.linspace(0, tisch.REAL_DISTANCE_Y, matrix.shape[1])
+        xx, yy = np.meshgrid(np.asarray(x_positions, dtype=np.float64), y, indexing='ij')
+        store.add_points(session, xx.ravel(), yy.ravel(), np.asarray(matrix).ravel(),
+                         frame='tisch_m', source='heatmap_Tisch_Scheune_magnetisch.verarbeite_messungen')
+
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Columnar campaign store with time and spatial indexes")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help="ingest the tables and Tisch_Scheune sessions of this repository")
+    b.add_argument('store')
+    b.add_argument('--only', choices=('tables', 'sessions'))
+    q = sub.add_parser('query', help="processed points inside a region")
+    q.add_argument('store')
+    q.add_argument('--frame', default='table_cm')
+    q.add_argument('--region', type=float, nargs=4, metavar=('XMIN', 'XMAX', 'YMIN', 'YMAX'), required=True)
+    args = parser.parse_args()
+
+    store = CampaignStore(args.store)
+    if args.cmd == 'build':
+        t0 = time.perf_counter()
+        if args.only != 'sessions':
+            ingest_tables(store)
+        if args.only != 'tables':
+            ingest_sessions(store)
+        store.commit()
+        print(f"\n{len(store.sessions())} sessions in {store.root} ({time.perf_counter() - t0:.1f} s)")
+        for frame, grid in store.index['spatial'].items():
+            print(f"  {frame}: {grid['points']} points, {grid['nx']}x{grid['ny']} cells, "
+                  f"{len(grid['sessions'])} sessions")
+        return
+
+    t0 = time.perf_counter()
+    res = store.query_region(args.frame, *args.region)
+    ms = (time.perf_counter() - t0) * 1e3
+    print(f"{len(res['b'])} points in {ms:.2f} ms")
+    for s in dict.fromkeys(res['session']):
+        b_s = res['b'][res['session'] == s]
+        print(f"  {s:<32} {len(b_s):>7} points, |B| mean {b_s.mean():.2f}, min {b_s.min():.2f}, max {b_s.max():.2f}")
+
+
+if __name__ == "__main__":
+    main()
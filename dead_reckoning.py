@@ -0,0 +1,212 @@
+"""
+Dead reckoning (acceleration -> velocity -> position) for the Phyphox
+accelerometer recordings, shared by the Tisch_Scheune lanes and
+Arduino/heatmap.py.
+
+integrate_forced and integrate_filtered are the two existing batch methods
+(whole recording in memory, non-causal). DeadReckoner is the causal
+streaming version: it takes the recording chunk by chunk with constant
+memory, low-pass filters with carried sosfilt state, integrates with carried
+sums and removes velocity drift at detected standstills (zero-velocity update).
+"""
+import numpy as np
+from scipy import integrate, signal
+
+
+# --- Batch ---
+
+def lowpass_filter(data, cutoff, fs, order=4):
+    """Zero-phase Butterworth low-pass (filtfilt)."""
+    nyquist = 0.5 * fs
+    b, a = signal.butter(order, cutoff / nyquist, btype='low', analog=False)
+    return signal.filtfilt(b, a, data)
+
+
+def detrend_endpoints(x):
+    """Removes the straight line through the first and last sample."""
+    return x - np.linspace(x[0], x[-1], len(x))
+
+
+def integrate_forced(acc, dt, length):
+    """
+    Lane method of heatmap_Tisch_Scheune_magnetisch.py: trapezoidal
+    integration, linear detrend of the velocity, second integration and
+    scaling of the path to the known lane length.
+    """
+    v = integrate.cumulative_trapezoid(acc, dx=dt, initial=0)
+    v = signal.detrend(v, type='linear')
+    p = integrate.cumulative_trapezoid(v, dx=dt, initial=0)
+
+    if abs(p[-1]) > 0.01:
+        p = p * (length / p[-1])
+        if p[-1] < 0:
+            p *= -1
+        return p
+    return np.linspace(0, length, len(acc))
+
+
+def integrate_filtered(acc, dt, cutoff=2.0, vel_threshold=0.02, detrend_position=False, order=4):
+    """
+    Trajectory method of Arduino/heatmap.py: filtfilt low-pass, rectangular
+    integration, endpoint detrend and threshold of the velocity.
+    Returns (filtered acceleration, velocity, position).
+    """
+    a_filt = lowpass_filter(acc, cutoff, 1 / dt, order)
+    v = detrend_endpoints(np.cumsum(a_filt * dt))
+    v[np.abs(v) < vel_threshold] = 0
+    p = np.cumsum(v * dt)
+    if detrend_position:
+        p = detrend_endpoints(p)
+    return a_filt, v, p
+
+
+# --- Streaming ---
+
+class DeadReckoner:
+    """
+    Causal dead reckoning for one or several axes (chunks of shape (n,) or
+    (n, k)). All state carried between chunks is O(k):
+
+    * low-pass: sosfilt with carried sections state (cutoff=None disables it)
+    * integration: trapezoidal, with the last acceleration/velocity carried
+    * ZUPT: a sample is at rest when |a - bias| < zupt_threshold on all axes
+      for zupt_samples consecutive samples; velocity is held at zero there.
+      At the start of a standstill the residual velocity v_err of the moving
+      segment (duration T) is treated as linear drift: the position is
+      corrected by -v_err*T/2 and the bias estimate by v_err/T * bias_gain.
+    * vel_threshold: velocities below it count as zero for the position
+      (same as VEL_THRESHOLD in heatmap.py)
+    """
+
+    def __init__(self, dt, cutoff=None, order=4, zupt_threshold=0.05, zupt_samples=50,
+                 vel_threshold=0.0, bias=0.0, bias_gain=1.0):
+        self.dt = dt
+        self.sos = signal.butter(order, cutoff, btype='low', fs=1 / dt, output='sos') if cutoff else None
+        self.zupt_threshold = zupt_threshold
+        self.zupt_samples = zupt_samples
+        self.vel_threshold = vel_threshold
+        self.bias_gain = bias_gain
+        self.bias = np.atleast_1d(np.asarray(bias, dtype=float))
+
+        self.zi = None
+        self.a_last = None
+        self.v = None
+        self.vo_last = None
+        self.p = None
+        self.still_run = 0
+        self.at_rest = False
+        self.moving_time = 0.0
+        self.n_samples = 0
+        self.n_zupt = 0
+
+    def _init_state(self, a):
+        k = a.shape[1]
+        self.bias = np.broadcast_to(self.bias, (k,)).copy()
+        self.v = np.zeros(k)
+        self.vo_last = np.zeros(k)
+        self.p = np.zeros(k)
+        self.a_last = a[0] - self.bias
+        if self.sos is not None:
+            self.zi = signal.sosfilt_zi(self.sos)[:, :, None] * a[0]
+
+    def _zero_velocity_update(self):
+        """Start of a standstill: remove the drift of the finished moving segment."""
+        if self.moving_time > 0:
+            v_err = self.v.copy()
+            self.p -= v_err * self.moving_time / 2
+            self.bias += self.bias_gain * v_err / self.moving_time
+        self.v[:] = 0
+        self.vo_last[:] = 0
+        self.moving_time = 0.0
+        self.n_zupt += 1
+
+    def _detect(self, a):
+        """
+        Rest flags of a with the current bias, continuing the carried run of
+        quiet samples. Returns (run lengths, flags, index of the first
+        standstill onset or None).
+        """
+        quiet = np.all(np.abs(a - self.bias) < self.zupt_threshold, axis=1)
+        idx = np.arange(len(a))
+        last_loud = np.maximum.accumulate(np.where(quiet, -1, idx))
+        run = np.where(last_loud < 0, idx + 1 + self.still_run, idx - last_loud)
+        rest = run >= self.zupt_samples
+        onsets = np.flatnonzero(rest & ~np.concatenate(([self.at_rest], rest))[:-1])
+        return run, rest, (int(onsets[0]) if len(onsets) else None)
+
+    def _integrate(self, a, s, e, r, v_out, p_out):
+        """Integrates a[s:e] (rest flags r) with the current bias into v_out / p_out."""
+        piece = a[s:e] - self.bias
+        prev = np.vstack((self.a_last, piece[:-1]))
+        inc = (piece + prev) * (self.dt / 2)
+        inc[r] = 0
+        if self.n_samples == 0 and s == 0:
+            inc[0] = 0  # v starts at 0 (cumulative_trapezoid initial=0)
+        v = self.v + np.cumsum(inc, axis=0)
+        # Held at zero while at rest, integration restarts afterwards
+        last_rest = np.maximum.accumulate(np.where(r, np.arange(e - s), -1))
+        has_rest = last_rest >= 0
+        v[has_rest] -= v[last_rest[has_rest]]
+
+        vo = np.where(np.abs(v) < self.vel_threshold, 0.0, v)
+        prev_vo = np.vstack((self.vo_last, vo[:-1]))
+        p = self.p + np.cumsum((vo + prev_vo) * (self.dt / 2), axis=0)
+
+        if has_rest[-1]:
+            self.moving_time = (e - s - 1 - last_rest[-1]) * self.dt
+        else:
+            self.moving_time += (e - s) * self.dt
+
+        v_out[s:e], p_out[s:e] = v, p
+        self.a_last, self.v, self.vo_last, self.p = piece[-1], v[-1].copy(), vo[-1], p[-1].copy()
+
+    def update(self, acc):
+        """Processes one chunk; returns (filtered acceleration, velocity, position) shaped like acc."""
+        acc = np.asarray(acc, dtype=float)
+        a = acc.reshape(len(acc), -1)
+        if len(a) == 0:
+            return acc, acc.copy(), acc.copy()
+        if self.v is None:
+            self._init_state(a)
+
+        if self.sos is not None:
+            a, self.zi = signal.sosfilt(self.sos, a, axis=0, zi=self.zi)
+
+        # Rest detection starts over after every ZUPT, because the ZUPT moves the bias;
+        # so a sample is judged with the bias of its own time, whatever the chunking
+        v_out = np.empty_like(a)
+        p_out = np.empty_like(a)
+        rest = np.empty(len(a), dtype=bool)
+        s = d = 0   # start of the integration segment, first sample not yet judged
+        while True:
+            run, rest[d:], onset = self._detect(a[d:])
+            o = d + onset if onset is not None else len(a)
+            if o > s:
+                self._integrate(a, s, o, rest[s:o], v_out, p_out)
+            if onset is None:
+                if len(run):
+                    self.still_run, self.at_rest = int(run[-1]), bool(rest[-1])
+                break
+            self.still_run, self.at_rest = int(run[onset]), True
+            self._zero_velocity_update()
+            s, d = o, o + 1
+
+        self.n_samples += len(a)
+        shape = acc.shape
+        return a.reshape(shape), v_out.reshape(shape), p_out.reshape(shape)
+
+    def finish(self):
+        """End of the recording counts as a standstill; returns the corrected final position."""
+        if self.v is None:
+            return None
+        if not self.at_rest:
+            self._zero_velocity_update()
+        return self.p.copy()
+
+
+def reckon_stream(acc, dt, chunk_size=4096, **options):
+    """Runs DeadReckoner over an array in chunks; returns (a, v, p, final_position)."""
+    dr = DeadReckoner(dt, **options)
+    parts = [dr.update(acc[i:i + chunk_size]) for i in range(0, len(acc), chunk_size)]
+    a, v, p = (np.concatenate(c) for c in zip(*parts))
+    return a, v, p, dr.finish()
@@ -0,0 +1,242 @@
+"""
+Stacks repeated scans of the same surface (e.g. table3, 30s_table3 and
+10s_table3) into one map on a shared grid: every session is gridded on its
+own and folded into per-cell running statistics (Welford), so memory stays at
+one grid no matter how many sessions are stacked and runtime grows linearly
+with their number.
+
+Outputs per cell: mean |B| over the sessions that cover the cell, their
+standard deviation (repeatability, ddof=1) and the coverage (number of
+sessions with a value there).
+
+    python map_stack.py --tables table3 30s_table3 10s_table3 --png stack_table3.png
+    python map_stack.py --store campaign_db --frame table_cm --out stack.npz
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'Arduino'))
+from gridding import grid_map  # noqa: E402
+
+GRID_SHAPE = (300, 300)     # (ny, nx), as in process_table.build_map
+
+
+class MapStack:
+    """
+    Running per-cell mean / M2 / count over session maps on the grid
+    xlim x ylim. Cells a session has no value for (NaN) are left alone.
+    """
+
+    def __init__(self, xlim, ylim, shape=GRID_SHAPE, method='linear', **options):
+        self.xlim, self.ylim = tuple(map(float, xlim)), tuple(map(float, ylim))
+        self.shape = tuple(shape)
+        self.method, self.options = method, options
+        self.count = np.zeros(self.shape, dtype=np.int64)
+        self._mean = np.zeros(self.shape)
+        self._m2 = np.zeros(self.shape)
+        self.sessions = []
+
+    def meshgrid(self):
+        ny, nx = self.shape
+        return np.meshgrid(np.linspace(*self.xlim, nx), np.linspace(*self.ylim, ny))
+
+    def grid(self, x, y, z):
+        """Grids one session's samples onto the shared frame."""
+        xi, yi = self.meshgrid()
+        return grid_map(x, y, z, xi, yi, method=self.method, **self.options)
+
+    # --- Updates ---
+    def add_map(self, zi, name=None):
+        """Welford update with one already gridded session map."""
+        zi = np.asarray(zi, float)
+        ok = np.isfinite(zi)
+        n = self.count[ok] + 1
+        v = zi[ok]
+        delta = v - self._mean[ok]
+        mean = self._mean[ok] + delta / n
+        self._m2[ok] += delta * (v - mean)
+        self._mean[ok] = mean
+        self.count[ok] = n
+        self.sessions.append(name or f"session{len(self.sessions)}")
+
+    def add_session(self, x, y, z, name=None):
+        zi = self.grid(x, y, z)
+        self.add_map(zi, name)
+        return zi
+
+    def merge(self, other):
+        """Adds the sessions of another stack on the same frame (Chan et al. pairwise update)."""
+        if (other.xlim, other.ylim, other.shape) != (self.xlim, self.ylim, self.shape):
+            raise ValueError("Stacks are on different frames")
+        na, nb = self.count, other.count
+        n = na + nb
+        ok = nb > 0
+        delta = other._mean[ok] - self._mean[ok]
+        w = nb[ok] / n[ok]
+        self._m2[ok] += other._m2[ok] + delta * delta * na[ok] * w
+        self._mean[ok] += delta * w
+        self.count = n
+        self.sessions += other.sessions
+
+    # --- Results ---
+    @property
+    def mean(self):
+        return np.where(self.count > 0, self._mean, np.nan)
+
+    @property
+    def std(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.count > 1, np.sqrt(self._m2 / (self.count - 1)), np.nan)
+
+    @property
+    def coverage(self):
+        """Fraction of the stacked sessions that cover each cell."""
+        return self.count / max(len(self.sessions), 1)
+
+    def save(self, path):
+        np.savez_compressed(path, xlim=self.xlim, ylim=self.ylim, count=self.count, mean=self._mean,
+                            m2=self._m2, sessions=np.array(self.sessions), method=self.method)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            stack = cls(f['xlim'], f['ylim'], f['count'].shape, str(f['method']))
+            stack.count, stack._mean, stack._m2 = f['count'], f['mean'], f['m2']
+            stack.sessions = f['sessions'].tolist()
+        return stack
+
+
+# --- Session sources ---
+# A source yields (name, x, y, |B|) one session at a time.
+
+def table_sessions(keys, base_dir=None):
+    """Arduino table scans via process_table.merge_points (S1, S2 in cm)."""
+    import process_table
+    for key in keys:
+        merged = process_table.merge_points(key, base_dir or process_table.BASE_DIR)
+        if merged is None:
+            continue
+        df, display_name = merged
+        yield key, df['S1'].to_numpy(), df['S2'].to_numpy(), df['B_abs'].to_numpy()
+
+
+def store_sessions(store, frame, names=None):
+    """Processed points of a campaign_store frame, read one session at a time."""
+    for s in names or store.index['spatial'][frame]['sessions']:
+        yield s, *(np.asarray(store.column(s, 'points', c)) for c in ('x', 'y', 'b'))
+
+
+def bounds(source):
+    """Union of the sessions' extents (a cheap first pass when no frame is given)."""
+    lo, hi = np.full(2, np.inf), np.full(2, -np.inf)
+    for _, x, y, _ in source:
+        if len(x):
+            lo = np.minimum(lo, [np.nanmin(x), np.nanmin(y)])
+            hi = np.maximum(hi, [np.nanmax(x), np.nanmax(y)])
+    return (lo[0], hi[0]), (lo[1], hi[1])
+
+
+def _grid_worker(frame, x, y, z):
+    xlim, ylim, shape, method, options = frame
+    return MapStack(xlim, ylim, shape, method, **options).grid(x, y, z)
+
+
+def stack_sessions(stack, source, workers=1):
+    """Feeds every session of the source into the stack; gridding optionally in parallel."""
+    if workers <= 1:
+        for name, x, y, z in source:
+            stack.add_session(x, y, z, name)
+        return stack
+    # At most 2 * workers sessions are in flight; maps are added in source order
+    frame = (stack.xlim, stack.ylim, stack.shape, stack.method, stack.options)
+    pending = deque()
+    with ProcessPoolExecutor(workers) as pool:
+        for name, x, y, z in source:
+            pending.append((name, pool.submit(_grid_worker, frame, x, y, z)))
+            if len(pending) >= 2 * workers:
+                name, fut = pending.popleft()
+                stack.add_map(fut.result(), name)
+        while pending:
+            name, fut = pending.popleft()
+            stack.add_map(fut.result(), name)
+    return stack
+
+
+def draw_stack(stack, path, title):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    xi, yi = stack.meshgrid()
+    fig, axes = plt.subplots(1, 3, figsize=(18, 5), constrained_layout=True)
+    panels = ((stack.mean, 'Mean |B| (µT)', 'jet'), (stack.std, 'Std between sessions (µT)', 'viridis'),
+              (stack.count, 'Coverage (sessions)', 'Greys'))
+    for ax, (data, label, cmap) in zip(axes, panels):
+        im = ax.pcolormesh(xi, yi, data, cmap=cmap, shading='auto')
+        fig.colorbar(im, ax=ax, label=label)
+        ax.set_aspect('equal')
+        ax.set_title(label)
+    fig.suptitle(title)
+    fig.savefig(path, dpi=120)
+    plt.close(fig)
+
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument('--tables', nargs='+', metavar='KEY', help="process_table.DATASETS keys or file stems")
+    src.add_argument('--store', help="campaign_store directory")
+    parser.add_argument('--frame', default='table_cm', help="spatial frame of the store")
+    parser.add_argument('--sessions', nargs='+', help="only these store sessions")
+    parser.add_argument('--xlim', type=float, nargs=2)
+    parser.add_argument('--ylim', type=float, nargs=2)
+    parser.add_argument('--shape', type=int, nargs=2, default=GRID_SHAPE, metavar=('NY', 'NX'))
+    parser.add_argument('--method', default='linear', help="gridding backend (see Arduino/gridding.py)")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--out', help="save the stack as .npz")
+    parser.add_argument('--png', help="save mean / std / coverage maps")
+    args = parser.parse_args()
+
+    if args.store:
+        from campaign_store import CampaignStore
+        store = CampaignStore(args.store)
+        grid = store.index['spatial'][args.frame]
+        frame = ((grid['x0'], grid['x0'] + grid['nx'] * grid['dx']),
+                 (grid['y0'], grid['y0'] + grid['ny'] * grid['dy']))
+        source = lambda: store_sessions(store, args.frame, args.sessions)  # noqa: E731
+    else:
+        import process_table
+        stems = {os.path.splitext(p)[0]: k for k, (p, _, _) in process_table.DATASETS.items()}
+        keys = [stems.get(k, k) for k in args.tables]
+        frame = None
+        source = lambda: table_sessions(keys)  # noqa: E731
+
+    if args.xlim and args.ylim:
+        frame = (args.xlim, args.ylim)
+    elif frame is None:
+        frame = bounds(source())
+
+    t0 = time.perf_counter()
+    stack = stack_sessions(MapStack(*frame, shape=args.shape, method=args.method), source(), args.workers)
+    print(f"{len(stack.sessions)} sessions stacked in {time.perf_counter() - t0:.2f} s "
+          f"on x {frame[0][0]:.2f}..{frame[0][1]:.2f}, y {frame[1][0]:.2f}..{frame[1][1]:.2f}")
+    covered = stack.count > 0
+    if covered.any():
+        print(f"  covered cells: {covered.mean():.1%}, by all sessions: {(stack.count == len(stack.sessions)).mean():.1%}")
+        print(f"  mean |B| {np.nanmean(stack.mean):.2f}, median std between sessions {np.nanmedian(stack.std):.3f}")
+    if args.out:
+        stack.save(args.out)
+    if args.png:
+        draw_stack(stack, args.png, f"Stack of {', '.join(stack.sessions)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Shared loader for Phyphox CSV exports (Magnetometer, Accelerometer, Linear
+Acceleration) with an on-disk cache.
+
+The first load parses the CSV and stores the normalized columns
+(Time, x, y, z, abs) as a float64 .npy file keyed by path, size and mtime.
+Later loads memory-map that file instead of re-parsing. The cache is capped
+in size and evicts the least recently used entries.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Time', 'x', 'y', 'z', 'abs']
+
+CACHE_DIR = os.environ.get(
+    'PS_MAGFIELD_CACHE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.phyphox_cache'))
+CACHE_MAX_BYTES = int(float(os.environ.get('PS_MAGFIELD_CACHE_MB', 512)) * 1e6)
+
+
+def cache_key(path, tag=''):
+    st = os.stat(path)
+    ident = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{tag}"
+    return hashlib.sha1(ident.encode()).hexdigest()
+
+
+def cache_path(key, suffix='.npy'):
+    return os.path.join(CACHE_DIR, key + suffix)
+
+
+def touch(path):
+    """Marks a cache entry as recently used (mtime is the LRU clock)."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict(max_bytes=None):
+    """Removes least recently used entries until the cache fits max_bytes."""
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    try:
+        entries = [e for e in os.scandir(CACHE_DIR) if e.is_file() and not e.name.endswith('.tmp')]
+    except FileNotFoundError:
+        return
+    entries = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def store(key, arr, suffix='.npy'):
+    """Writes arr atomically into the cache and enforces the size cap."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    target = cache_path(key, suffix)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        np.save(f, arr)
+    os.replace(tmp, target)
+    evict()
+    return target
+
+
+def parse_phyphox_csv(path):
+    """Parses one export into an (n, 5) array: Time, x, y, z, abs."""
+    df = pd.read_csv(path, engine='c')
+    names = [c.split('(')[0].strip() for c in df.columns]
+    values = df.iloc[:, :4].to_numpy(dtype=np.float64)
+
+    out = np.empty((len(values), 5))
+    out[:, :4] = values
+    if 'Absolute field' in names:
+        out[:, 4] = df.iloc[:, names.index('Absolute field')].to_numpy(dtype=np.float64)
+    else:
+        out[:, 4] = np.sqrt((values[:, 1:4] ** 2).sum(axis=1))
+
+    order = np.argsort(out[:, 0], kind='stable')
+    return out[order]
+
+
+def load_phyphox_array(path, use_cache=True):
+    """
+    Returns the normalized (n, 5) array for a Phyphox export. Cached loads
+    are read-only memory maps.
+    """
+    if not use_cache:
+        return parse_phyphox_csv(path)
+
+    key = cache_key(path)
+    cached = cache_path(key)
+    if os.path.exists(cached):
+        try:
+            arr = np.load(cached, mmap_mode='r')
+            touch(cached)
+            return arr
+        except (OSError, ValueError):
+            pass  # truncated or foreign file: parse again
+
+    arr = parse_phyphox_csv(path)
+    try:
+        store(key, arr)
+    except OSError as e:
+        print(f"Warning: could not write cache for {path}: {e}")
+    return arr
+
+
+def load_phyphox(path, use_cache=True):
+    """DataFrame with the columns Time, x, y, z, abs (sorted by Time)."""
+    return pd.DataFrame(np.array(load_phyphox_array(path, use_cache)), columns=COLUMNS)
@@ -0,0 +1,537 @@
+"""
+Lazily evaluated stage graph for the processing chains (load -> clean ->
+integrate -> sync -> resample -> grid -> render) with memoized stage outputs,
+so a parameter sweep only recomputes the stages downstream of the parameter
+that changes.
+
+Each stage's key is a hash of its name, version and code, the repository
+modules it reaches (size and mtime of every module its code references,
+followed through their imports, so an edit to e.g. position_filter.py
+invalidates the stages using clean_tracks), the parameters it declares and
+the keys of the stages it depends on (input files enter through their size
+and mtime, folders through all files below them). Keys
+are known before anything runs, so a request whose key is cached evaluates
+nothing upstream. Outputs are kept in memory (LRU, bounded in bytes) and
+optionally pickled to a disk tier that survives between runs.
+
+    python pipeline_dag.py table --dataset 3 --sweep filter_s1_threshold 40 80 50
+    python pipeline_dag.py tisch --ordner Tisch_Scheune_magnetisch --sweep target_points 50 300 50 --disk .dag_cache
+    python pipeline_dag.py trajectory --sweep vel_threshold 0.005 0.05 20 --render sweep_png
+
+Stage functions must not modify their inputs: cached outputs are shared.
+"""
+import argparse
+import hashlib
+import inspect
+import io
+import os
+import pickle
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+ARDUINO = os.path.join(ROOT, 'Arduino')
+EXPOM = os.path.join(ROOT, 'EXPOM&Accelerometer')
+sys.path.insert(0, ROOT)
+from phyphox_loader import cache_key  # noqa: E402
+
+MEMORY_MB = 512       # memory tier
+DISK_MB = 2048        # disk tier (LRU by mtime, like the phyphox_loader cache)
+
+
+# --- Fingerprints ---
+def _fingerprint(value):
+    """Stable text for a parameter value; files and folders by size and mtime of their content."""
+    if isinstance(value, str) and os.path.isfile(value):
+        return 'file:' + cache_key(value)
+    if isinstance(value, str) and os.path.isdir(value):
+        h = hashlib.sha1()
+        for dirpath, dirnames, filenames in os.walk(value):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            for name in sorted(filenames):
+                st = os.stat(os.path.join(dirpath, name))
+                h.update(f"{os.path.relpath(os.path.join(dirpath, name), value)}|{st.st_size}|{st.st_mtime_ns}\n".encode())
+        return f"dir:{os.path.abspath(value)}:{h.hexdigest()}"
+    if isinstance(value, np.ndarray):
+        return f"array:{value.dtype}:{value.shape}:{hashlib.sha1(np.ascontiguousarray(value).data).hexdigest()}"
+    if isinstance(value, float):
+        return repr(float(value))
+    return repr(value)
+
+
+def _nbytes(value):
+    """Rough size of a stage output for the memory budget."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if hasattr(value, 'memory_usage'):          # DataFrame / Series
+        return int(np.sum(value.memory_usage(index=True)))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value) + 8 * len(value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values()) + 64 * len(value)
+    return sys.getsizeof(value)
+
+
+def _repo_module(value):
+    """The repository module a referenced value lives in (None for stdlib / third party)."""
+    if inspect.ismodule(value):
+        module = value
+    else:
+        module = sys.modules.get(getattr(value, '__module__', None) or '')
+    path = getattr(module, '__file__', None)
+    if path and os.path.abspath(path).startswith(ROOT + os.sep) and 'site-packages' not in path:
+        return module
+    return None
+
+
+def code_fingerprint(fn):
+    """
+    Source of fn plus size and mtime of every repository module it reaches:
+    the modules of the functions, classes and modules it references, and
+    transitively the repository modules those import. Simple constants it
+    captures enter by value.
+    """
+    try:
+        parts = [inspect.getsource(fn)]
+    except (OSError, TypeError):
+        parts = [fn.__code__.co_code.hex()]
+    try:
+        refs = inspect.getclosurevars(fn)
+        values = list(refs.nonlocals.values()) + list(refs.globals.values())
+    except TypeError:
+        values = []
+    seen, todo = {}, []
+    for v in values:
+        module = _repo_module(v)
+        if module is not None:
+            todo.append(module)
+        elif isinstance(v, (int, float, str, bool, tuple)):
+            parts.append(repr(v))
+    while todo:
+        module = todo.pop()
+        if module.__file__ in seen:
+            continue
+        seen[module.__file__] = cache_key(module.__file__)
+        todo += [m for m in map(_repo_module, vars(module).values()) if m is not None]
+    parts += [f"{os.path.relpath(path, ROOT)}|{key}" for path, key in sorted(seen.items())]
+    return '\n'.join(parts)
+
+
+# --- Cache ---
+class StageCache:
+    """Memory LRU (bounded in bytes) with an optional pickle tier on disk."""
+
+    def __init__(self, memory_mb=MEMORY_MB, disk_dir=None, disk_mb=DISK_MB):
+        self.max_bytes = int(memory_mb * 1e6)
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = int(disk_mb * 1e6)
+        self._mem = OrderedDict()
+        self._bytes = 0
+
+    def get(self, key):
+        """(tier, value) with tier 'memory', 'disk' or None."""
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            return 'memory', self._mem[key][0]
+        if self.disk_dir:
+            path = os.path.join(self.disk_dir, key + '.pkl')
+            try:
+                with open(path, 'rb') as f:
+                    value = pickle.load(f)
+                os.utime(path)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return None, None
+            self._remember(key, value)
+            return 'disk', value
+        return None, None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            path = os.path.join(self.disk_dir, key + '.pkl')
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            self._evict_disk()
+
+    def _remember(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        if key in self._mem:
+            self._bytes -= self._mem.pop(key)[1]
+        self._mem[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, old) = self._mem.popitem(last=False)
+            self._bytes -= old
+
+    def _evict_disk(self):
+        entries = [e for e in os.scandir(self.disk_dir) if e.name.endswith('.pkl')]
+        entries = sorted((e.stat().st_mtime, e.stat().st_size, e.path) for e in entries)
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear_memory(self):
+        self._mem.clear()
+        self._bytes = 0
+
+
+# --- Graph ---
+class Node:
+    def __init__(self, name, fn, deps, params, version):
+        self.name, self.fn, self.deps, self.params, self.version = name, fn, tuple(deps), tuple(params), version
+        self.code_hash = hashlib.sha1(code_fingerprint(fn).encode()).hexdigest()[:12]
+
+
+class Graph:
+    """
+    Stages registered with @graph.stage(deps=..., params=...). A stage is
+    called with the outputs of its deps (in order) and its params as
+    keywords. get(name, **params) evaluates it lazily with the graph's
+    defaults overridden by params.
+    """
+
+    def __init__(self, defaults=None, cache=None):
+        self.defaults = dict(defaults or {})
+        self.cache = cache if cache is not None else StageCache()
+        self.nodes = {}
+        self.counters = {}
+
+    def stage(self, deps=(), params=(), name=None, version=1):
+        def register(fn):
+            node = Node(name or fn.__name__, fn, deps, params, version)
+            for d in node.deps:
+                if d not in self.nodes:
+                    raise ValueError(f"Stage '{node.name}' depends on unknown stage '{d}'")
+            self.nodes[node.name] = node
+            self.counters[node.name] = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'compute_s': 0.0}
+            return fn
+        return register
+
+    def _params(self, overrides):
+        unknown = set(overrides) - set(self.defaults)
+        if unknown:
+            raise ValueError(f"Unknown parameters {sorted(unknown)}, choose from {sorted(self.defaults)}")
+        return {**self.defaults, **overrides}
+
+    def key(self, name, **params):
+        return self._key(name, self._params(params), {})
+
+    def _key(self, name, params, memo):
+        if name not in memo:
+            node = self.nodes[name]
+            parts = [name, str(node.version), node.code_hash]
+            parts += [f"{p}={_fingerprint(params[p])}" for p in node.params]
+            parts += [self._key(d, params, memo) for d in node.deps]
+            memo[name] = hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+        return memo[name]
+
+    def get(self, name, **params):
+        params = self._params(params)
+        return self._get(name, params, {}, {})
+
+    def _get(self, name, params, keys, values):
+        if name in values:
+            return values[name]
+        node = self.nodes[name]
+        key = self._key(name, params, keys)
+        tier, value = self.cache.get(key)
+        c = self.counters[name]
+        if tier is not None:
+            c['memory_hits' if tier == 'memory' else 'disk_hits'] += 1
+        else:
+            inputs = [self._get(d, params, keys, values) for d in node.deps]
+            t0 = time.perf_counter()
+            value = node.fn(*inputs, **{p: params[p] for p in node.params})
+            c['compute_s'] += time.perf_counter() - t0
+            c['misses'] += 1
+            self.cache.put(key, value)
+        values[name] = value
+        return value
+
+    # --- Counters ---
+    def stats(self):
+        return {name: dict(c) for name, c in self.counters.items()}
+
+    def reset_stats(self):
+        for c in self.counters.values():
+            c.update(memory_hits=0, disk_hits=0, misses=0, compute_s=0.0)
+
+    def print_stats(self):
+        print(f"{'stage':<14} {'params':<36} {'mem hits':>8} {'disk hits':>9} {'misses':>7} {'compute (s)':>11}")
+        for name, c in self.counters.items():
+            params = ', '.join(self.nodes[name].params)
+            print(f"{name:<14} {params:<36} {c['memory_hits']:>8} {c['disk_hits']:>9} {c['misses']:>7} "
+                  f"{c['compute_s']:>11.3f}")
+
+
+def _png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+# --- process_table.py ---
+def table_graph(dataset='3', cache=None):
+    """Ultrasonic table scan: parse, clean, sync, filter, grid, render."""
+    sys.path.insert(0, ARDUINO)
+    import pandas as pd
+    import process_table as pt
+    from clock_sync import synchronize_scan
+    from gridding import grid_map
+    from phyphox_loader import load_phyphox
+    from position_filter import DENSE_MIN_POINTS, JUMP_THRESHOLD, clean_tracks
+    from time_align import Alignment
+    from ultrasonic_parser import parse_ultrasonic_fast
+
+    pos_file, mag_file, display_name = pt.DATASETS[dataset]
+    g = Graph({'pos_file': os.path.join(pt.BASE_DIR, pos_file), 'mag_file': os.path.join(pt.BASE_DIR, mag_file),
+               'title': display_name, 'jump_threshold': JUMP_THRESHOLD, 'clock_sync': pt.CLOCK_SYNC,
+               'sync_min_confidence': pt.SYNC_MIN_CONFIDENCE, 'filter_s1_threshold': pt.FILTER_S1_THRESHOLD,
+               'grid_method': pt.GRID_METHOD, 'grid_size': 300}, cache)
+
+    @g.stage(params=('pos_file',))
+    def load_pos(pos_file):
+        return parse_ultrasonic_fast(pos_file)
+
+    @g.stage(params=('mag_file',))
+    def load_mag(mag_file):
+        return load_phyphox(mag_file).rename(columns={'Time': 'Time_s', 'abs': 'B_abs'})
+
+    @g.stage(deps=('load_pos',), params=('jump_threshold',))
+    def clean(pos_df, jump_threshold):
+        dense = len(pos_df) > DENSE_MIN_POINTS
+        s1, s2 = clean_tracks(pos_df['S1'].to_numpy(dtype=np.float64), pos_df['S2'].to_numpy(dtype=np.float64),
+                              dense, jump_threshold)
+        return pd.DataFrame({'Time_s': pos_df['Time_s'].to_numpy(), 'S1': s1, 'S2': s2})
+
+    @g.stage(deps=('clean', 'load_mag'), params=('clock_sync', 'sync_min_confidence'))
+    def sync(pos_df, mag_df, clock_sync, sync_min_confidence):
+        offset, drift = 0.0, 0.0
+        if clock_sync != 'off':
+            res = synchronize_scan(pos_df, mag_df, time_col='Time_s', drift=clock_sync == 'drift')
+            if res['confidence'] >= sync_min_confidence:
+                offset, drift = res['offset'], res['drift']
+        align = Alignment(pos_df['Time_s'].to_numpy(), mag_df['Time_s'].to_numpy(), offset, drift)
+        s12 = align.linear(pos_df[['S1', 'S2']].to_numpy(), outside='nan')
+        merged = mag_df.assign(S1=s12[:, 0], S2=s12[:, 1])
+        return merged.dropna(subset=['S1', 'S2'])
+
+    @g.stage(deps=('sync',), params=('filter_s1_threshold',), name='filter')
+    def filter_points(merged_df, filter_s1_threshold):
+        return merged_df[merged_df['S1'] > filter_s1_threshold]
+
+    @g.stage(deps=('filter',), params=('grid_method', 'grid_size'))
+    def grid(clean_df, grid_method, grid_size):
+        x, y, z = clean_df['S1'], clean_df['S2'], clean_df['B_abs']
+        xi, yi = np.meshgrid(np.linspace(x.min(), x.max(), grid_size), np.linspace(y.min(), y.max(), grid_size))
+        return xi, yi, grid_map(x, y, z, xi, yi, method=grid_method)
+
+    @g.stage(deps=('grid',), params=('title',))
+    def render(grid_out, title):
+        import matplotlib.pyplot as plt
+        fig = pt.draw_map(plt.figure(), *grid_out, title)
+        png = _png(fig)
+        plt.close(fig)
+        return png
+
+    return g
+
+
+# --- heatmap_Tisch_Scheune_magnetisch.py ---
+def tisch_graph(ordner='Tisch_Scheune_magnetisch', cache=None):
+    """Tisch_Scheune lanes: load, integrate, sync, resample, render."""
+    sys.path.insert(0, EXPOM)
+    import heatmap_Tisch_Scheune_magnetisch as tisch
+    from dead_reckoning import integrate_forced
+    from lane_index import index_session
+    from phyphox_loader import load_phyphox_array
+    from time_align import Alignment
+
+    ordner = ordner if os.path.isdir(ordner) else os.path.join(tisch.BASIS_DIR, ordner)
+    g = Graph({'ordner': ordner, 'real_distance_y': tisch.REAL_DISTANCE_Y, 'target_points': tisch.TARGET_POINTS,
+               'tolerance': 0.1}, cache)
+
+    @g.stage(params=('ordner',))
+    def load(ordner):
+        bahnen = []
+        for bahn in index_session(ordner):
+            acc, mag = load_phyphox_array(bahn['acc_file']), load_phyphox_array(bahn['mag_file'])
+            bahnen.append({'start_x': bahn['start_x'], 't_acc': acc[:, 0], 'ay': acc[:, 2],
+                           't_mag': mag[:, 0], 'b': np.sqrt(mag[:, 1] ** 2 + mag[:, 2] ** 2 + mag[:, 3] ** 2)})
+        return bahnen
+
+    @g.stage(deps=('load',), params=('real_distance_y',))
+    def integrate(bahnen, real_distance_y):
+        # Wie berechne_pfad_y_forced
+        out = []
+        for b in bahnen:
+            dt = np.diff(b['t_acc']).mean() if len(b['t_acc']) > 1 else np.nan
+            if np.isnan(dt) or dt == 0:
+                dt = 0.002
+            out.append(integrate_forced(b['ay'], dt, real_distance_y))
+        return out
+
+    @g.stage(deps=('load', 'integrate'), params=('tolerance',))
+    def sync(bahnen, pos_y, tolerance):
+        # Wie verarbeite_bahn: Magnetwerte mit einer acc-Zeile innerhalb der Toleranz
+        werte = []
+        for b, y in zip(bahnen, pos_y):
+            p = Alignment(b['t_acc'], b['t_mag']).nearest(y, tolerance=tolerance)
+            gueltig = ~np.isnan(p)
+            werte.append(b['b'][gueltig] if gueltig.any() else None)
+        return werte
+
+    @g.stage(deps=('load', 'sync'), params=('target_points',))
+    def resample(bahnen, werte, target_points):
+        paare = [(b['start_x'], w) for b, w in zip(bahnen, werte) if w is not None]
+        offsets = np.zeros(len(paare) + 1, dtype=np.int64)
+        np.cumsum([len(w) for _, w in paare], out=offsets[1:])
+        alle = np.concatenate([w for _, w in paare]) if paare else np.empty(0)
+        return tisch.resample_bahnen(alle, offsets, target_points), [x for x, _ in paare]
+
+    @g.stage(deps=('resample',), params=('real_distance_y',))
+    def render(res, real_distance_y):
+        import matplotlib.pyplot as plt
+        fig = tisch.zeichne_2d(plt.figure(), res[0], res[1], real_distance_y)
+        png = _png(fig)
+        plt.close(fig)
+        return png
+
+    return g
+
+
+# --- heatmap.py ---
+def trajectory_graph(acc_file=None, mag_file=None, cache=None):
+    """Phyphox dead reckoning: load, sync, integrate (filtfilt), render the trajectory map."""
+    sys.path.insert(0, ARDUINO)
+    import pandas as pd
+    from dead_reckoning import integrate_filtered
+    from time_align import Alignment
+
+    g = Graph({'acc_file': acc_file or os.path.join(ARDUINO, 'Linear Acceleration.csv'),
+               'mag_file': mag_file or os.path.join(ARDUINO, 'Magnetometer.csv'),
+               'cutoff': 2.0, 'vel_threshold': 0.02}, cache)
+
+    @g.stage(params=('acc_file',))
+    def load_acc(acc_file):
+        df = pd.read_csv(acc_file)
+        cols = [[c for c in df.columns if 'Time' in c][0],
+                [c for c in df.columns if 'x' in c and 'Acceleration' in c][0],
+                [c for c in df.columns if 'y' in c and 'Acceleration' in c][0]]
+        return df[cols].to_numpy()
+
+    @g.stage(params=('mag_file',))
+    def load_mag(mag_file):
+        df = pd.read_csv(mag_file)
+        cols = [[c for c in df.columns if 'Time' in c][0]] + \
+               [[c for c in df.columns if a in c and 'field' in c][0] for a in ('x', 'y', 'z')]
+        return df[cols].to_numpy()
+
+    @g.stage(deps=('load_acc', 'load_mag'))
+    def sync(acc, mag):
+        xyz = Alignment(mag[:, 0], acc[:, 0]).linear(mag[:, 1:])
+        return np.sqrt((xyz ** 2).sum(axis=1))
+
+    @g.stage(deps=('load_acc',), params=('cutoff', 'vel_threshold'))
+    def integrate(acc, cutoff, vel_threshold):
+        dt = np.mean(np.diff(acc[:, 0]))
+        ax_filt, vx, px = integrate_filtered(acc[:, 1], dt, cutoff, vel_threshold)
+        ay_filt, vy, py = integrate_filtered(acc[:, 2], dt, cutoff, vel_threshold)
+        return {'px': px, 'py': py, 'vx': vx, 'vy': vy, 'ax': ax_filt, 'ay': ay_filt}
+
+    @g.stage(deps=('load_acc', 'sync', 'integrate'))
+    def render(acc, b, tr):
+        import matplotlib.pyplot as plt
+        from heatmap import build_scrub_view
+        view = build_scrub_view(acc[:, 0], tr['px'], tr['py'], b, tr['vx'], tr['vy'], tr['ax'], tr['ay'])
+        png = _png(view['fig_map'])
+        plt.close(view['fig_map'])
+        plt.close(view['fig_graphs'])
+        return png
+
+    return g
+
+
+GRAPHS = {'table': table_graph, 'tisch': tisch_graph, 'trajectory': trajectory_graph}
+TARGETS = {'table': 'grid', 'tisch': 'resample', 'trajectory': 'integrate'}
+
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('graph', choices=sorted(GRAPHS))
+    parser.add_argument('--dataset', default='3', help="table: process_table.DATASETS key")
+    parser.add_argument('--ordner', default='Tisch_Scheune_magnetisch', help="tisch: Messordner")
+    parser.add_argument('--sweep', nargs=4, metavar=('PARAM', 'START', 'STOP', 'N'),
+                        help="evaluate N values of PARAM between START and STOP")
+    parser.add_argument('--set', nargs=2, action='append', default=[], metavar=('PARAM', 'VALUE'),
+                        help="fixed parameter override (repeatable)")
+    parser.add_argument('--target', help="stage to evaluate (default: grid / resample / integrate)")
+    parser.add_argument('--render', metavar='DIR', help="also render every sweep value to DIR/<param>_<value>.png")
+    parser.add_argument('--disk', metavar='DIR', help="disk tier for stage outputs")
+    parser.add_argument('--memory-mb', type=float, default=MEMORY_MB)
+    args = parser.parse_args()
+
+    import matplotlib
+    matplotlib.use('Agg')
+    cache = StageCache(args.memory_mb, args.disk)
+    if args.graph == 'table':
+        g = table_graph(args.dataset, cache)
+    elif args.graph == 'tisch':
+        g = tisch_graph(args.ordner, cache)
+    else:
+        g = trajectory_graph(cache=cache)
+
+    def typed(name, text):
+        default = g.defaults[name]
+        return type(default)(text) if isinstance(default, (int, float)) else text
+
+    fixed = {p: typed(p, v) for p, v in args.set}
+    target = 'render' if args.render else (args.target or TARGETS[args.graph])
+    if args.render:
+        os.makedirs(args.render, exist_ok=True)
+
+    if args.sweep:
+        param, start, stop, n = args.sweep
+        values = np.linspace(float(start), float(stop), int(n))
+        if isinstance(g.defaults[param], int):
+            values = np.unique(np.round(values).astype(int))
+        runs = [{**fixed, param: typed(param, v)} for v in values]
+    else:
+        param, runs = None, [fixed]
+
+    times = []
+    for run in runs:
+        t0 = time.perf_counter()
+        out = g.get(target, **run)
+        times.append(time.perf_counter() - t0)
+        if args.render:
+            value = run.get(param)
+            label = args.graph if param is None else f"{param}_{value:g}" if isinstance(value, float) \
+                else f"{param}_{value}"
+            with open(os.path.join(args.render, f"{label}.png"), 'wb') as f:
+                f.write(out)
+
+    print(f"{len(runs)} run(s) of '{target}': first {times[0]:.3f} s"
+          + (f", others {np.mean(times[1:]) * 1e3:.1f} ms on average" if len(times) > 1 else ''))
+    g.print_stats()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,565 @@
+"""
+Recording daemon: ingests the Arduino serial protocol (ultrasoundStartStop.ino)
+and any number of Phyphox-style sensor feeds over local TCP sockets at the same
+time, stamps every sample against one monotonic clock and writes the session in
+the layouts the processing scripts already read:
+
+    <out>/ultrasonic.txt       serial-monitor dump "HH:MM:SS.fff -> /time_ms,s1,s2"
+    <out>/<feed>.csv           Phyphox export ("Time (s)","Magnetic Field x (µT)", ...)
+    <out>/session.json         clock origin, STARTED times, per-channel counts and drops
+
+All times are seconds on the recorder clock (time.monotonic from the start of
+the recording); the TXT prefix is the wall-clock time of that origin plus the
+same offset, so ultrasonic_parser and phyphox_loader see one time base. Samples
+that arrive in one block are spread back by their own device timestamps.
+
+Every channel pushes into a fixed ring buffer that is drained to disk in
+batches; a full ring drops the newest samples and counts them instead of
+stalling the input. A sensor feed sends one CSV row per sample, "t,x,y,z" or
+"t,x,y,z,abs" (t in device seconds); header lines are ignored.
+
+    python recorder.py --out session_01 --arduino /dev/ttyACM0 --feed magnetometer=5001
+    python recorder.py --out /tmp/rec --replay-arduino Arduino/table3.txt --replay-feed magnetometer=Arduino/table3.csv --speed 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'Arduino'))
+from serial_stream import PREFIX_PATTERN, SerialStreamParser  # noqa: E402
+from phyphox_loader import load_phyphox_array  # noqa: E402
+
+RING_CAPACITY = 1 << 16     # samples per channel
+FLUSH_INTERVAL = 0.5        # s between batch writes
+HIGH_WATER = 0.5            # flush early once the ring is this full
+BLOCK_SIZE = 65536
+
+# Phyphox column names per sensor (quantity, unit, absolute column)
+LAYOUTS = {
+    'magnetometer': ('Magnetic Field', 'µT', True),
+    'linear_acceleration': ('Linear Acceleration', 'm/s^2', False),
+    'accelerometer': ('Acceleration', 'm/s^2', False),
+}
+
+
+def _layout(name):
+    for kind in LAYOUTS:
+        if name.startswith(kind):
+            return kind
+    raise ValueError(f"Unknown feed '{name}', names start with one of {sorted(LAYOUTS)}")
+
+
+def phyphox_header(kind):
+    quantity, unit, absolute = LAYOUTS[kind]
+    cols = ['Time (s)'] + [f"{quantity} {a} ({unit})" for a in 'xyz']
+    if absolute:
+        cols.append(f"Absolute field ({unit})")
+    return ','.join(f'"{c}"' for c in cols) + '\n'
+
+
+class RingBuffer:
+    """
+    Single-producer / single-consumer ring of fixed-width float rows. The
+    producer only advances head and the consumer only tail, so neither needs
+    a lock. A full ring keeps what it has and counts the rejected rows.
+    """
+
+    def __init__(self, capacity, width):
+        self.data = np.empty((capacity, width))
+        self.capacity = capacity
+        self.head = 0
+        self.tail = 0
+        self.dropped = 0
+        self.max_fill = 0
+
+    def __len__(self):
+        return self.head - self.tail
+
+    def push(self, rows):
+        free = self.capacity - (self.head - self.tail)
+        if len(rows) > free:
+            self.dropped += len(rows) - free
+            rows = rows[:free]
+        n = len(rows)
+        i = self.head % self.capacity
+        first = min(n, self.capacity - i)
+        self.data[i:i + first] = rows[:first]
+        self.data[:n - first] = rows[first:]
+        # Publish only after the rows are in place
+        self.head += n
+        self.max_fill = max(self.max_fill, self.head - self.tail)
+        return n
+
+    def pop(self):
+        n = self.head - self.tail
+        i = self.tail % self.capacity
+        first = min(n, self.capacity - i)
+        out = np.concatenate((self.data[i:i + first], self.data[:n - first]))
+        self.tail += n
+        return out
+
+
+def format_rows(rows):
+    """CSV text of a float array in the Phyphox number format (one % per batch)."""
+    line = ','.join(['%.9E'] * rows.shape[1]) + '\n'
+    return (line * len(rows)) % tuple(rows.ravel().tolist())
+
+
+def stamp(recv, t_dev, last=-np.inf):
+    """
+    Recorder times for one received block: the arrival time minus each
+    sample's device-time distance to the newest sample, never going back
+    before the previous block.
+    """
+    back = np.nan_to_num(t_dev[-1] - t_dev, nan=0.0)
+    return np.maximum(recv - np.clip(back, 0, None), last)
+
+
+# --- Channels ---
+
+class Channel:
+    """One input: ring buffer, output file and counters."""
+
+    def __init__(self, name, path, width, capacity):
+        self.name, self.path = name, path
+        self.ring = RingBuffer(capacity, width)
+        self.wake = asyncio.Event()
+        self.received = self.written = self.malformed = self.batches = 0
+        self.last = -np.inf
+        self.connections = 0
+
+    def push(self, rows):
+        self.received += len(rows)
+        self.last = rows[-1, 0]
+        self.ring.push(rows)
+        if len(self.ring) >= HIGH_WATER * self.ring.capacity:
+            self.wake.set()
+
+    def header(self):
+        return ''
+
+    def format(self, rows):
+        raise NotImplementedError
+
+    def stats(self):
+        return {'path': os.path.basename(self.path), 'received': self.received, 'written': self.written,
+                'dropped': self.ring.dropped, 'malformed': self.malformed, 'batches': self.batches,
+                'max_fill': self.ring.max_fill, 'capacity': self.ring.capacity, 'connections': self.connections}
+
+
+class UltrasonicChannel(Channel):
+    """Rows (time, run, time_ms / 1000, s1, s2), written as a serial-monitor dump."""
+
+    def __init__(self, path, wall0, capacity):
+        super().__init__('ultrasonic', path, 5, capacity)
+        self.parser = SerialStreamParser(chunk_size=1024)
+        self.wall0 = wall0
+        self.run_written = 0
+        self.started = {}
+
+    def feed(self, block, recv):
+        chunks = self.parser.feed(block) + self.parser.drain()
+        self.malformed = self.parser.stats.dropped_bytes
+        if not chunks:
+            return
+        samples = np.concatenate(chunks)
+        t = stamp(recv, samples[:, 1], self.last)
+        # Recorder time of time_ms = 0 for every new run
+        runs, first = np.unique(samples[:, 0].astype(int), return_index=True)
+        for run, i in zip(runs, first):
+            self.started.setdefault(int(run), float(t[i] - np.nan_to_num(samples[i, 1])))
+        self.push(np.column_stack((t, samples)))
+
+    def format(self, rows):
+        lines = []
+        for t, run, t_dev, s1, s2 in rows:
+            clock = (self.wall0 + timedelta(seconds=float(t))).strftime('%H:%M:%S.%f')[:-3]
+            if run != self.run_written:
+                self.run_written = run
+                lines.append(f"{clock} -> --- STARTED ---\n")
+            ms = '' if np.isnan(t_dev) else f"{t_dev * 1000:.0f},"
+            lines.append(f"{clock} -> /{ms}{s1:.2f},{s2:.2f}\n")
+        return ''.join(lines)
+
+
+class SensorChannel(Channel):
+    """Rows (time, device time, x, y, z[, abs]), written as a Phyphox CSV."""
+
+    def __init__(self, name, path, capacity):
+        self.kind = _layout(name)
+        self.absolute = LAYOUTS[self.kind][2]
+        super().__init__(name, path, 6 if self.absolute else 5, capacity)
+        self._pending = b''
+
+    def header(self):
+        return phyphox_header(self.kind)
+
+    def parse(self, data):
+        """
+        Complete CSV rows of a block as an (n, 5) array t, x, y, z, abs (NaN
+        if not sent); keeps a partial line for the next block.
+        """
+        data = self._pending + data
+        end = data.rfind(b'\n') + 1
+        self._pending, data = data[end:], data[:end]
+        lines = [ln for ln in data.split(b'\n') if ln.strip() and not ln.lstrip().startswith(b'"')]
+        if not lines:
+            return None
+        width = lines[0].count(b',') + 1
+        try:
+            if width not in (4, 5):
+                raise ValueError
+            rows = np.array(b','.join(lines).split(b','), dtype=float).reshape(len(lines), width)
+        except ValueError:
+            # Mixed widths or garbage: row by row
+            good = []
+            for ln in lines:
+                try:
+                    vals = [float(v) for v in ln.split(b',')]
+                except ValueError:
+                    continue
+                if len(vals) in (4, 5):
+                    good.append(vals + [np.nan] * (5 - len(vals)))
+            self.malformed += len(lines) - len(good)
+            if not good:
+                return None
+            rows = np.array(good)
+        if rows.shape[1] == 4:
+            rows = np.column_stack((rows, np.full(len(rows), np.nan)))
+        return rows
+
+    def feed(self, block, recv):
+        rows = self.parse(block)
+        if rows is None:
+            return
+        cols = [stamp(recv, rows[:, 0], self.last), rows[:, :4]]
+        if self.absolute:
+            missing = np.isnan(rows[:, 4])
+            if missing.any():
+                rows[missing, 4] = np.sqrt((rows[missing, 1:4] ** 2).sum(axis=1))
+            cols.append(rows[:, 4])
+        self.push(np.column_stack(cols))
+
+    def format(self, rows):
+        # Phyphox writes %.9E; the device time column is not part of the layout
+        return format_rows(np.delete(rows, 1, axis=1))
+
+
+# --- Recorder ---
+
+class Recorder:
+    """
+    Owns the clock, the channels and their flush tasks. Inputs are attached
+    with add_arduino / add_feed inside a running event loop; stop() flushes
+    everything and writes session.json.
+    """
+
+    def __init__(self, out_dir, capacity=RING_CAPACITY, flush_interval=FLUSH_INTERVAL):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.capacity, self.flush_interval = capacity, flush_interval
+        self._mono0 = time.monotonic()
+        self.wall0 = datetime.now()
+        self.channels = {}
+        self.servers = []
+        self._tasks = []
+        self._pumps = {}
+        self._files = {}
+        self._stopping = False
+
+    def now(self):
+        return time.monotonic() - self._mono0
+
+    def _add(self, ch):
+        self.channels[ch.name] = ch
+        f = open(ch.path, 'w', encoding='utf-8')
+        f.write(ch.header())
+        self._files[ch.name] = f
+        self._tasks.append(asyncio.ensure_future(self._flusher(ch)))
+        return ch
+
+    async def _flusher(self, ch):
+        loop = asyncio.get_running_loop()
+        f = self._files[ch.name]
+        while True:
+            try:
+                await asyncio.wait_for(ch.wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            ch.wake.clear()
+            done = self._stopping
+            if len(ch.ring):
+                rows = ch.ring.pop()
+                # Formatting and the write run off the event loop
+                await loop.run_in_executor(None, lambda: f.write(ch.format(rows)))
+                ch.written += len(rows)
+                ch.batches += 1
+            if done and not len(ch.ring):
+                f.flush()
+                return
+
+    async def _pump(self, ch, reader, writer=None):
+        task = asyncio.current_task()
+        self._pumps[task] = writer
+        ch.connections += 1
+        try:
+            while True:
+                try:
+                    block = await reader.read(BLOCK_SIZE)
+                except (OSError, ConnectionError):
+                    # EIO: the other end of a pty hung up
+                    break
+                if not block:
+                    break
+                ch.feed(block, self.now())
+        finally:
+            self._pumps.pop(task, None)
+            if writer is not None:
+                writer.close()
+
+    async def add_arduino(self, source, baud=9600):
+        """source: tty / pty path or tcp:HOST:PORT (e.g. a serial-to-network bridge)."""
+        ch = self._add(UltrasonicChannel(os.path.join(self.out_dir, 'ultrasonic.txt'), self.wall0, self.capacity))
+        if source.startswith('tcp:'):
+            _, host, port = source.split(':')
+            reader, _ = await asyncio.open_connection(host, int(port))
+        else:
+            reader = await open_tty(source, baud)
+        asyncio.ensure_future(self._pump(ch, reader))
+        return ch
+
+    async def add_feed(self, name, port, host='127.0.0.1'):
+        """Listens for sensor rows on host:port; returns the bound port."""
+        ch = self._add(SensorChannel(name, os.path.join(self.out_dir, f"{name}.csv"), self.capacity))
+        server = await asyncio.start_server(lambda r, w: self._pump(ch, r, w), host, port)
+        self.servers.append(server)
+        return server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        for server in self.servers:
+            server.close()
+        # Sockets are closed (their pumps see EOF), the tty pump is cancelled
+        pumps = dict(self._pumps)
+        for task, writer in pumps.items():
+            if writer is None:
+                task.cancel()
+            else:
+                writer.close()
+        await asyncio.gather(*pumps, return_exceptions=True)
+        # The flushers write what is left and finish
+        self._stopping = True
+        for ch in self.channels.values():
+            ch.wake.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for f in self._files.values():
+            f.close()
+        session = self.session()
+        with open(os.path.join(self.out_dir, 'session.json'), 'w') as f:
+            json.dump(session, f, indent=1)
+        return session
+
+    def session(self):
+        us = self.channels.get('ultrasonic')
+        return {'wall_start': self.wall0.isoformat(timespec='milliseconds'), 'duration_s': self.now(),
+                'started_s': {str(k): v for k, v in us.started.items()} if us else {},
+                'channels': {name: ch.stats() for name, ch in self.channels.items()}}
+
+
+async def open_tty(path, baud=9600):
+    """Non-blocking StreamReader on a tty / pty in raw mode."""
+    import termios
+    import tty
+    fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK | getattr(os, 'O_NOCTTY', 0))
+    if os.isatty(fd):
+        tty.setraw(fd, termios.TCSANOW)
+        speed = getattr(termios, f"B{baud}", None)
+        if speed is not None:
+            attrs = termios.tcgetattr(fd)
+            attrs[4] = attrs[5] = speed
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=BLOCK_SIZE * 4)
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, 'rb', buffering=0))
+    return reader
+
+
+# --- Local stand-ins for the devices ---
+
+def _arduino_lines(log_path):
+    """(seconds, device bytes) per line of a serial-monitor dump, prefix removed."""
+    out = []
+    with open(log_path, encoding='utf-8', errors='replace') as f:
+        for line in f:
+            m = PREFIX_PATTERN.match(line)
+            if not m:
+                continue
+            hh, mm, ss = m.groups()
+            out.append(((int(hh) * 60 + int(mm)) * 60 + float(ss), line[m.end():].strip().encode() + b'\r\n'))
+    t0 = out[0][0] if out else 0.0
+    return [((t - t0) % 86400, data) for t, data in out]
+
+
+async def _paced(items, speed, send):
+    """Calls send(payload) for (t, payload) items at t / speed after the start (speed 0: no pacing)."""
+    start = time.monotonic()
+    for t, payload in items:
+        if speed:
+            delay = start + t / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await send(payload)
+
+
+async def replay_arduino(log_path, speed=1.0):
+    """
+    Replays a recorded ultrasonic .txt through a pseudo-terminal at speed x
+    real time. Returns (tty path to record from, coroutine that sends the
+    log and returns the number of samples sent).
+    """
+    import pty
+    import tty
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    path = os.ttyname(slave)
+    lines = _arduino_lines(log_path)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.connect_write_pipe(asyncio.Protocol, os.fdopen(master, 'wb', buffering=0))
+        writer = asyncio.StreamWriter(transport, protocol, None, loop)
+
+        async def send(data):
+            writer.write(data)
+            if transport.get_write_buffer_size() > BLOCK_SIZE:
+                await _drain_transport(transport)
+        await _paced(lines, speed, send)
+        await _drain_transport(transport)
+        # Let the reader empty the pty before hanging up
+        await asyncio.sleep(0.2)
+        transport.close()
+        os.close(slave)
+        return sent
+    counter = SerialStreamParser()
+    sent = sum(len(c) for _, data in lines for c in counter.feed(data)) + sum(len(c) for c in counter.flush())
+    return path, run()
+
+
+async def _drain_transport(transport):
+    while transport.get_write_buffer_size():
+        await asyncio.sleep(0.001)
+
+
+async def replay_feed(csv_path, port, speed=1.0, packet_s=0.05, host='127.0.0.1'):
+    """
+    Sends a Phyphox export row by row to a recorder feed at speed x real time,
+    in packets of packet_s seconds of data. Returns the number of rows sent.
+    """
+    rows = np.asarray(load_phyphox_array(csv_path))
+    t = rows[:, 0] - rows[0, 0]
+    cut = np.searchsorted(t, np.arange(0, t[-1] + packet_s, packet_s)[1:], side='right')
+    packets = np.split(rows, cut)
+    times = np.r_[0, t[np.minimum(cut, len(t) - 1)]][:len(packets)]
+    _, writer = await asyncio.open_connection(host, port)
+
+    async def send(packet):
+        writer.write(format_rows(packet).encode())
+        await writer.drain()
+    await _paced([(ti, p) for ti, p in zip(times, packets) if len(p)], speed, send)
+    writer.close()
+    await writer.wait_closed()
+    return len(rows)
+
+
+async def replay_session(out_dir, arduino_log=None, feeds=(), speed=1.0, capacity=RING_CAPACITY,
+                         flush_interval=FLUSH_INTERVAL):
+    """
+    Records the stand-in devices for the given files into out_dir. Returns
+    (session dict, {channel: samples sent}, wall seconds).
+    """
+    rec = Recorder(out_dir, capacity, flush_interval)
+    jobs = {}
+    if arduino_log:
+        path, job = await replay_arduino(arduino_log, speed)
+        await rec.add_arduino(path)
+        jobs['ultrasonic'] = job
+    for name, csv_path in feeds:
+        port = await rec.add_feed(name, 0)
+        jobs[name] = replay_feed(csv_path, port, speed)
+    t0 = time.perf_counter()
+    sent = dict(zip(jobs, await asyncio.gather(*jobs.values())))
+    # Wait until the last blocks have arrived (or 1 s without progress)
+    received, waited = -1, 0.0
+    while any(rec.channels[k].received < n for k, n in sent.items()) and waited < 1.0:
+        total = sum(ch.received for ch in rec.channels.values())
+        waited = 0.0 if total != received else waited + 0.01
+        received = total
+        await asyncio.sleep(0.01)
+    session = await rec.stop()
+    return session, sent, time.perf_counter() - t0
+
+
+def print_session(session, sent=None, wall=None):
+    print(f"{'channel':<22} {'sent':>9} {'received':>9} {'written':>9} {'dropped':>8} {'malformed':>9} "
+          f"{'batches':>7} {'max fill':>8}")
+    for name, st in session['channels'].items():
+        s = sent.get(name, '') if sent else ''
+        print(f"{name:<22} {s:>9} {st['received']:>9} {st['written']:>9} {st['dropped']:>8} {st['malformed']:>9} "
+              f"{st['batches']:>7} {st['max_fill']:>8}")
+    if wall:
+        total = sum(st['received'] for st in session['channels'].values())
+        print(f"{total} samples in {wall:.2f} s ({total / wall:,.0f} samples/s)")
+
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--out', required=True, help="session directory")
+    parser.add_argument('--arduino', help="tty / pty path or tcp:HOST:PORT")
+    parser.add_argument('--baud', type=int, default=9600)
+    parser.add_argument('--feed', action='append', default=[], metavar='NAME=PORT',
+                        help="sensor feed listening on PORT, NAME starting with " + ' / '.join(LAYOUTS))
+    parser.add_argument('--duration', type=float, help="stop after this many seconds (default: Ctrl+C)")
+    parser.add_argument('--replay-arduino', metavar='TXT', help="stand-in Arduino replaying this log")
+    parser.add_argument('--replay-feed', action='append', default=[], metavar='NAME=CSV',
+                        help="stand-in sensor replaying this Phyphox export")
+    parser.add_argument('--speed', type=float, default=1.0, help="replay speed (x real time, 0: as fast as possible)")
+    parser.add_argument('--capacity', type=int, default=RING_CAPACITY, help="ring buffer samples per channel")
+    parser.add_argument('--flush-interval', type=float, default=FLUSH_INTERVAL)
+    args = parser.parse_args()
+
+    if args.replay_arduino or args.replay_feed:
+        feeds = [tuple(f.split('=', 1)) for f in args.replay_feed]
+        session, sent, wall = asyncio.run(replay_session(args.out, args.replay_arduino, feeds, args.speed,
+                                                         args.capacity, args.flush_interval))
+        print_session(session, sent, wall)
+        return
+
+    async def record():
+        rec = Recorder(args.out, args.capacity, args.flush_interval)
+        if args.arduino:
+            await rec.add_arduino(args.arduino, args.baud)
+        for feed in args.feed:
+            name, port = feed.split('=', 1)
+            print(f"{name}: listening on port {await rec.add_feed(name, int(port))}")
+        print(f"Recording to {args.out} (clock origin {rec.wall0:%H:%M:%S.%f})")
+        try:
+            await asyncio.sleep(args.duration if args.duration else float('inf'))
+        finally:
+            # Also on Ctrl+C: flush the rings and write session.json
+            print_session(await rec.stop())
+
+    try:
+        asyncio.run(record())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
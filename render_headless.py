@@ -0,0 +1,121 @@
+"""
+Non-interactive rendering of all heat maps to image files (Agg backend, no
+prompts, no windows): the 2-D heatmap and 3-D surface of every Tisch_Scheune
+session (EXPOM&Accelerometer) and the griddata map of every table scan
+(Arduino/process_table.py).
+
+Datasets are rendered in parallel in a process pool; every worker creates a
+single figure once and reuses it for all of its plots.
+
+    python render_headless.py --out maps --workers 4
+    python render_headless.py --only tables --format svg
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt  # noqa: E402
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'Arduino'))
+sys.path.insert(0, os.path.join(ROOT, 'EXPOM&Accelerometer'))
+
+import heatmap_Tisch_Scheune_magnetisch as tisch  # noqa: E402
+import process_table  # noqa: E402
+
+_FIG = None
+
+
+def _figure():
+    """The worker's figure, created on first use."""
+    global _FIG
+    if _FIG is None:
+        _FIG = plt.figure()
+    return _FIG
+
+
+def render_session(name, out_dir, fmt='png', dpi=100):
+    """2-D and 3-D map of one Tisch_Scheune session. Returns (name, files, t_compute, t_render)."""
+    t0 = time.perf_counter()
+    messungen = tisch.lade_datensaetze([name]).popitem()[1]
+    magnet_matrix, x_positions = tisch.verarbeite_messungen(messungen)
+    t1 = time.perf_counter()
+    if len(magnet_matrix) == 0:
+        return name, [], t1 - t0, 0.0
+
+    fig = _figure()
+    base = os.path.basename(os.path.normpath(name))
+    files = []
+    for suffix, zeichne in (('2d', tisch.zeichne_2d), ('3d', tisch.zeichne_3d)):
+        pfad = os.path.join(out_dir, f"{base}_{suffix}.{fmt}")
+        zeichne(fig, magnet_matrix, x_positions).savefig(pfad, dpi=dpi)
+        files.append(pfad)
+    return name, files, t1 - t0, time.perf_counter() - t1
+
+
+def render_table(selection, out_dir, fmt='png', dpi=100):
+    """Gridded map of one table scan. Returns (name, files, t_compute, t_render)."""
+    t0 = time.perf_counter()
+    result = process_table.build_map(selection, base_dir=process_table.BASE_DIR)
+    t1 = time.perf_counter()
+    if result is None:
+        return process_table.DATASETS.get(selection, ('', '', selection))[2], [], t1 - t0, 0.0
+
+    xi, yi, zi, display_name = result
+    pfad = os.path.join(out_dir, os.path.splitext(process_table.map_filename(display_name))[0] + f".{fmt}")
+    process_table.draw_map(_figure(), xi, yi, zi, display_name).savefig(pfad, dpi=dpi)
+    return display_name, [pfad], t1 - t0, time.perf_counter() - t1
+
+
+def _run(job):
+    kind, name, out_dir, fmt, dpi = job
+    render = render_session if kind == 'session' else render_table
+    return render(name, out_dir, fmt, dpi)
+
+
+def render_all(sessions, tables, out_dir, workers=1, fmt='png', dpi=100):
+    """Renders all given datasets; returns a list of (name, files, t_compute, t_render)."""
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [('session', s, out_dir, fmt, dpi) for s in sessions]
+    jobs += [('table', t, out_dir, fmt, dpi) for t in tables]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(_run, jobs))
+    return [_run(job) for job in jobs]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--out', default='maps')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--only', choices=['sessions', 'tables'])
+    parser.add_argument('--sessions', nargs='+', help="session directories (default: all found)")
+    parser.add_argument('--tables', nargs='+', choices=sorted(process_table.DATASETS),
+                        help="process_table datasets (default: all)")
+    parser.add_argument('--format', default='png')
+    parser.add_argument('--dpi', type=int, default=100)
+    args = parser.parse_args()
+
+    sessions = args.sessions or list(tisch.finde_datensaetze())
+    tables = args.tables or sorted(process_table.DATASETS)
+    if args.only == 'sessions':
+        tables = []
+    elif args.only == 'tables':
+        sessions = []
+
+    t0 = time.perf_counter()
+    results = render_all(sessions, tables, args.out, args.workers, args.format, args.dpi)
+    total = time.perf_counter() - t0
+
+    print(f"\n{'dataset':<34} {'compute (s)':>11} {'render (s)':>10}  files")
+    for name, files, t_compute, t_render in results:
+        print(f"{name:<34} {t_compute:>11.3f} {t_render:>10.3f}  {len(files)}")
+    print(f"{len(results)} datasets in {total:.2f} s ({args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""
+Per-stage timing for the processing scripts: wall and CPU time, sample counts
+and peak memory of every pipeline stage, written as one JSON report per run.
+Opt-in cProfile capture per top-level stage for drilling into hot spots.
+
+Stages are marked in the scripts with
+
+    with stage('parse') as s:
+        df = parse(...)
+        s.samples = len(df)
+
+or the @timed('integrate') decorator. Both cost one attribute check while no
+timer is active, which is the default. A timer is activated by running a
+script through this module
+
+    python stage_timer.py --out report.json Arduino/process_table.py
+    python stage_timer.py --out report.json --cprofile "EXPOM&Accelerometer/heatmap_Tisch_Scheune_magnetisch.py" --batch --workers 1
+
+or by setting PS_MAGFIELD_PROFILE=report.json (PS_MAGFIELD_CPROFILE=1 for
+cProfile) before starting a script. Stages running inside process-pool
+workers are not recorded; the pool call itself is. The clock and the
+memory tracing start with the first stage (imports before it are not
+measured); time between top-level stages is reported as '(unstaged)'.
+"""
+import argparse
+import atexit
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import runpy
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+PROFILE_TOP = 25        # functions per stage in the cProfile summary
+
+
+def _max_rss_mb():
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2 ** 20 if sys.platform == 'darwin' else rss / 2 ** 10
+
+
+class Stage:
+    """One timed stage; set .samples inside the with-block to report a sample count."""
+    __slots__ = ('name', 'path', 'depth', 'samples', 'wall_s', 'cpu_s', 'peak_mb', 'alloc_mb',
+                 '_t0', '_c0', '_mem0', '_peak', '_profile')
+
+    def __init__(self, name, path, depth, samples=None):
+        self.name, self.path, self.depth, self.samples = name, path, depth, samples
+        self.wall_s = self.cpu_s = self.peak_mb = self.alloc_mb = None
+        self._profile = None
+
+    def record(self):
+        return {'name': self.name, 'path': self.path, 'depth': self.depth, 'samples': self.samples,
+                'wall_s': self.wall_s, 'cpu_s': self.cpu_s, 'peak_mb': self.peak_mb, 'alloc_mb': self.alloc_mb}
+
+
+class _NullStage:
+    """Stand-in while no timer is active (accepts .samples, does nothing)."""
+    samples = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, key, value):
+        pass
+
+
+_NULL = _NullStage()
+
+
+class StageTimer:
+    """
+    Collects nested stages of one run. memory=True traces Python/NumPy
+    allocations (tracemalloc; slows allocation-heavy code somewhat),
+    cprofile=True runs cProfile during every top-level stage.
+    """
+
+    def __init__(self, run='run', memory=True, cprofile=False):
+        self.run, self.memory, self.cprofile = run, memory, cprofile
+        self.stages = []
+        self._stack = []
+        self._profiles = {}
+        self._started = datetime.now().isoformat(timespec='seconds')
+        # Clock and tracemalloc start at the first stage, so imports and setup
+        # before it are neither traced nor counted
+        self._t0 = None
+
+    # --- Stages ---
+    def stage(self, name, samples=None):
+        path = '/'.join([s.name for s in self._stack] + [name])
+        return _StageContext(self, Stage(name, path, len(self._stack), samples))
+
+    def _enter(self, st):
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+            if self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+        if self.memory:
+            cur, peak = tracemalloc.get_traced_memory()
+            for outer in self._stack:
+                outer._peak = max(outer._peak, peak)
+            tracemalloc.reset_peak()
+            st._mem0 = st._peak = cur
+        if self.cprofile and not self._stack:
+            st._profile = self._profiles.setdefault(st.name, cProfile.Profile())
+            st._profile.enable()
+        self._stack.append(st)
+        st._c0 = time.process_time()
+        st._t0 = time.perf_counter()
+
+    def _exit(self, st):
+        st.wall_s = time.perf_counter() - st._t0
+        st.cpu_s = time.process_time() - st._c0
+        if st._profile is not None:
+            st._profile.disable()
+        self._stack.pop()
+        if self.memory:
+            cur, peak = tracemalloc.get_traced_memory()
+            st._peak = max(st._peak, peak)
+            st.peak_mb = (st._peak - st._mem0) / 1e6
+            st.alloc_mb = (cur - st._mem0) / 1e6
+            if self._stack:
+                self._stack[-1]._peak = max(self._stack[-1]._peak, st._peak)
+            tracemalloc.reset_peak()
+        self.stages.append(st)
+
+    # --- Report ---
+    def total(self):
+        """Wall time since the first stage started."""
+        return 0.0 if self._t0 is None else time.perf_counter() - self._t0
+
+    def unstaged(self, total=None):
+        """Part of the total not covered by any top-level stage."""
+        total = self.total() if total is None else total
+        return max(total - sum(st.wall_s for st in self.stages if st.depth == 0), 0.0)
+
+    def summary(self):
+        """Stages aggregated by path, in order of first appearance."""
+        agg = {}
+        for st in sorted(self.stages, key=lambda s: s._t0):
+            a = agg.setdefault(st.path, {'calls': 0, 'wall_s': 0.0, 'cpu_s': 0.0, 'samples': None, 'peak_mb': None})
+            a['calls'] += 1
+            a['wall_s'] += st.wall_s
+            a['cpu_s'] += st.cpu_s
+            if st.samples is not None:
+                a['samples'] = (a['samples'] or 0) + int(st.samples)
+            if st.peak_mb is not None:
+                a['peak_mb'] = max(a['peak_mb'] or 0.0, st.peak_mb)
+        return agg
+
+    def report(self):
+        total = self.total()
+        rep = {'run': self.run, 'started': self._started, 'argv': sys.argv,
+               'total_s': total, 'unstaged_s': self.unstaged(total), 'max_rss_mb': _max_rss_mb(),
+               'memory': self.memory, 'stages': [s.record() for s in sorted(self.stages, key=lambda s: s._t0)],
+               'summary': self.summary()}
+        if self._profiles:
+            rep['profile'] = {name: _top_functions(p) for name, p in self._profiles.items()}
+        return rep
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=1)
+        if self._profiles:
+            # Merged raw profile for snakeviz / pstats
+            stats = pstats.Stats(*self._profiles.values())
+            stats.dump_stats(os.path.splitext(path)[0] + '.prof')
+        return path
+
+    def print_summary(self, file=sys.stdout):
+        total = self.total()
+        share = (lambda t: t / total) if total > 0 else (lambda t: 0.0)
+        print(f"\n{'stage':<40} {'calls':>5} {'wall (s)':>9} {'share':>6} {'cpu (s)':>8} {'samples':>9} "
+              f"{'peak (MB)':>10}", file=file)
+        for path, a in self.summary().items():
+            depth = path.count('/')
+            label = '  ' * depth + path.rsplit('/', 1)[-1]
+            samples = '' if a['samples'] is None else a['samples']
+            peak = '' if a['peak_mb'] is None else f"{a['peak_mb']:.1f}"
+            print(f"{label:<40} {a['calls']:>5} {a['wall_s']:>9.3f} {share(a['wall_s']):>6.1%} "
+                  f"{a['cpu_s']:>8.3f} {samples:>9} {peak:>10}", file=file)
+        unstaged = self.unstaged(total)
+        print(f"{'(unstaged)':<40} {'':>5} {unstaged:>9.3f} {share(unstaged):>6.1%}", file=file)
+        rss = _max_rss_mb()
+        print(f"{'total (from first stage)':<40} {'':>5} {total:>9.3f}" + (f"   max RSS {rss:.0f} MB" if rss else ''), file=file)
+
+
+class _StageContext:
+    __slots__ = ('timer', 'st')
+
+    def __init__(self, timer, st):
+        self.timer, self.st = timer, st
+
+    def __enter__(self):
+        self.timer._enter(self.st)
+        return self.st
+
+    def __exit__(self, *exc):
+        self.timer._exit(self.st)
+        return False
+
+
+def _top_functions(profile, n=PROFILE_TOP):
+    out = io.StringIO()
+    stats = pstats.Stats(profile, stream=out)
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({func})", 'calls': nc,
+                     'tottime_s': tt, 'cumtime_s': ct})
+    rows.sort(key=lambda r: r['cumtime_s'], reverse=True)
+    return rows[:n]
+
+
+# --- Active timer ---
+_active = None
+
+
+def active():
+    return _active
+
+
+def start(run='run', memory=True, cprofile=False, out=None):
+    """Activates a timer for this process; with out, the report is written at exit."""
+    global _active
+    _active = StageTimer(run, memory, cprofile)
+    if out:
+        timer = _active
+
+        def _finish():
+            timer.print_summary()
+            print(f"Stage report: {timer.write(out)}")
+        atexit.register(_finish)
+    return _active
+
+
+def stop():
+    global _active
+    timer, _active = _active, None
+    return timer
+
+
+def stage(name, samples=None):
+    """Context manager for one stage of the active timer (no-op without one)."""
+    if _active is None:
+        return _NULL
+    return _active.stage(name, samples)
+
+
+def timed(name=None, samples=None):
+    """Decorator: the whole call is one stage; samples(result) gives the sample count."""
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if _active is None:
+                return fn(*args, **kwargs)
+            with _active.stage(label) as st:
+                result = fn(*args, **kwargs)
+                if samples is not None:
+                    st.samples = samples(result)
+            return result
+        return inner
+    return wrap
+
+
+def from_env(run):
+    """Starts a timer if PS_MAGFIELD_PROFILE names a report file (called by the scripts at startup)."""
+    out = os.environ.get('PS_MAGFIELD_PROFILE')
+    if _active is None and out:
+        start(run, memory=os.environ.get('PS_MAGFIELD_PROFILE_MEMORY', '1') != '0',
+              cprofile=os.environ.get('PS_MAGFIELD_CPROFILE', '0') not in ('', '0'), out=out)
+    return _active
+
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description="Runs a processing script with per-stage timing")
+    parser.add_argument('--out', default='stage_report.json', help="JSON report (cProfile data next to it as .prof)")
+    parser.add_argument('--cprofile', action='store_true', help="capture cProfile per top-level stage")
+    parser.add_argument('--no-memory', action='store_true', help="skip tracemalloc (lower overhead)")
+    parser.add_argument('script')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    # The scripts import this file as 'stage_timer', not '__main__'
+    import stage_timer
+    script = os.path.abspath(args.script)
+    stage_timer.start(os.path.basename(script), memory=not args.no_memory, cprofile=args.cprofile,
+                      out=os.path.abspath(args.out))
+    # The scripts read their data relative to their own folder
+    sys.argv = [script] + args.args
+    sys.path.insert(0, os.path.dirname(script))
+    os.chdir(os.path.dirname(script))
+    runpy.run_path(script, run_name='__main__')
+
+
+if __name__ == "__main__":
+    main()
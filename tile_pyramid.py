@@ -0,0 +1,341 @@
+"""
+Multi-resolution tile pyramid for large gridded |B| maps. Level 0 is the map
+at full resolution; every further level halves it (2 x 2 cells -> 1) until one
+tile covers the whole map. Each level keeps mean, min, max and the number of
+level-0 cells with data, stored tile by tile as memory-mapped .npy files:
+
+    <root>/pyramid.json            extent, level-0 shape, tile size, levels
+    <root>/L<k>_<stat>.npy         (tile rows, tile cols, tile, tile), float32 / uint32 count
+
+A viewport only reads the tiles it overlaps, on the coarsest level that still
+has at least one cell per screen pixel, so drawing costs the same for a
+300 x 300 table scan and a 20000 x 20000 combined surface. Building works one
+strip of tiles at a time, so the full-resolution map never has to be in memory.
+
+    python tile_pyramid.py build pyr_table3 --table 3 --shape 2000 2000
+    python tile_pyramid.py build pyr_stack --stack stack.npz
+    python tile_pyramid.py view pyr_table3 --stat max
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, 'Arduino'))
+from gridding import grid_map  # noqa: E402
+from stage_timer import stage  # noqa: E402
+
+TILE = 256
+STATS = ('mean', 'min', 'max', 'count')
+
+
+def _dtype(stat):
+    return np.uint32 if stat == 'count' else np.float32
+
+
+def _to_tiles(strip, ntx, tile):
+    """(tile, ntx * tile) strip -> (ntx, tile, tile) row of tiles."""
+    return strip.reshape(tile, ntx, tile).transpose(1, 0, 2)
+
+
+def _from_tiles(row):
+    """(rows, ntx, tile, tile) tiles -> (rows * tile, ntx * tile) strip."""
+    r, ntx, t, _ = row.shape
+    return row.transpose(0, 2, 1, 3).reshape(r * t, ntx * t)
+
+
+def _pad(a, rows, cols, fill):
+    if a.shape == (rows, cols):
+        return a
+    out = np.full((rows, cols), fill, dtype=a.dtype)
+    out[:a.shape[0], :a.shape[1]] = a
+    return out
+
+
+def _reduce2(mean, mn, mx, cnt):
+    """2 x 2 cells -> 1: count-weighted mean, NaN-ignoring min / max, summed count."""
+    def quads(a):
+        return a[0::2, 0::2], a[1::2, 0::2], a[0::2, 1::2], a[1::2, 1::2]
+    c = cnt.astype(np.float64)
+    s = np.where(cnt > 0, mean, 0) * c
+    c4 = sum(quads(c))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        m = sum(quads(s)) / c4
+    lo = np.fmin(np.fmin(*quads(mn)[:2]), np.fmin(*quads(mn)[2:]))
+    hi = np.fmax(np.fmax(*quads(mx)[:2]), np.fmax(*quads(mx)[2:]))
+    return m, lo, hi, c4.astype(np.uint32)
+
+
+# --- Building ---
+
+def _build(root, shape, extent, tile, strip):
+    """
+    Writes the pyramid; strip(r0, r1) returns level-0 rows r0..r1 (full width,
+    NaN where there is no data).
+    """
+    os.makedirs(root, exist_ok=True)
+    ny, nx = shape
+    levels = []
+    k = 0
+    while True:
+        h, w = -(-ny // 2 ** k), -(-nx // 2 ** k)
+        nty, ntx = -(-h // tile), -(-w // tile)
+        levels.append({'shape': [h, w], 'tiles': [nty, ntx]})
+        if nty == 1 and ntx == 1:
+            break
+        k += 1
+    meta = {'extent': [float(v) for v in extent], 'shape': [ny, nx], 'tile': tile, 'levels': levels}
+
+    def open_level(k, mode):
+        nty, ntx = levels[k]['tiles']
+        return {s: np.lib.format.open_memmap(os.path.join(root, f"L{k}_{s}.npy"), mode=mode, dtype=_dtype(s),
+                                             shape=(nty, ntx, tile, tile)) for s in STATS}
+
+    # Level 0: one strip of tiles at a time
+    with stage('pyramid_level0', ny * nx):
+        out = open_level(0, 'w+')
+        nty, ntx = levels[0]['tiles']
+        for j in range(nty):
+            r0, r1 = j * tile, min((j + 1) * tile, ny)
+            z = _pad(np.asarray(strip(r0, r1), np.float32), tile, ntx * tile, np.nan)
+            ok = np.isfinite(z)
+            for s, a in (('mean', z), ('min', z), ('max', z), ('count', ok.astype(np.uint32))):
+                out[s][j] = _to_tiles(a, ntx, tile)
+        for a in out.values():
+            a.flush()
+
+    # Coarser levels from two tile rows of the level below
+    with stage('pyramid_reduce'):
+        for k in range(1, len(levels)):
+            src, dst = out, open_level(k, 'w+')
+            nty, ntx = levels[k]['tiles']
+            for j in range(nty):
+                rows = {s: _from_tiles(a[2 * j:2 * j + 2]) for s, a in src.items()}
+                fill = {'count': 0}
+                rows = {s: _pad(a, 2 * tile, 2 * ntx * tile, fill.get(s, np.nan)) for s, a in rows.items()}
+                reduced = _reduce2(rows['mean'], rows['min'], rows['max'], rows['count'])
+                for s, a in zip(STATS, reduced):
+                    dst[s][j] = _to_tiles(a.astype(_dtype(s)), ntx, tile)
+            for a in dst.values():
+                a.flush()
+            out = dst
+
+    with open(os.path.join(root, 'pyramid.json'), 'w') as f:
+        json.dump(meta, f, indent=1)
+    return TilePyramid(root)
+
+
+def node_extent(xlim, ylim, shape):
+    """Cell-edge extent of a map whose cells are centred on linspace(*xlim, nx) x linspace(*ylim, ny)."""
+    ny, nx = shape
+    dx = (xlim[1] - xlim[0]) / max(nx - 1, 1)
+    dy = (ylim[1] - ylim[0]) / max(ny - 1, 1)
+    return xlim[0] - dx / 2, xlim[1] + dx / 2, ylim[0] - dy / 2, ylim[1] + dy / 2
+
+
+def from_array(root, z, extent, tile=TILE):
+    """Pyramid of a gridded map (row 0 at ymin); z may itself be a memmap."""
+    return _build(root, z.shape, extent, tile, lambda r0, r1: z[r0:r1])
+
+
+def from_points(root, x, y, z, xlim, ylim, shape, method='linear', tile=TILE, **options):
+    """
+    Grids scattered samples straight into level 0 at any resolution, strip by
+    strip (see Arduino/gridding.py). The linear backend triangulates once.
+    """
+    from scipy.interpolate import LinearNDInterpolator
+    ny, nx = shape
+    xs, ys = np.linspace(*xlim, nx), np.linspace(*ylim, ny)
+    x, y, z = (np.asarray(v, float) for v in (x, y, z))
+    interp = LinearNDInterpolator(np.column_stack((x, y)), z) if method == 'linear' else None
+
+    def strip(r0, r1):
+        xi, yi = np.meshgrid(xs, ys[r0:r1])
+        if interp is not None:
+            return interp(xi, yi)
+        return grid_map(x, y, z, xi, yi, method=method, **options)
+    return _build(root, shape, node_extent(xlim, ylim, shape), tile, strip)
+
+
+# --- Reading ---
+
+class TilePyramid:
+    """Read side: tiles and viewport windows; tiles_read counts the tiles touched."""
+
+    def __init__(self, root):
+        self.root = root
+        with open(os.path.join(root, 'pyramid.json')) as f:
+            self.meta = json.load(f)
+        self.extent = tuple(self.meta['extent'])
+        self.shape = tuple(self.meta['shape'])
+        self.tile = self.meta['tile']
+        self.levels = self.meta['levels']
+        self._arrays = {}
+        self.tiles_read = 0
+
+    def cell_size(self, level):
+        x0, x1, y0, y1 = self.extent
+        ny, nx = self.shape
+        return (x1 - x0) / nx * 2 ** level, (y1 - y0) / ny * 2 ** level
+
+    def array(self, level, stat='mean'):
+        key = (level, stat)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(os.path.join(self.root, f"L{level}_{stat}.npy"), mmap_mode='r')
+        return self._arrays[key]
+
+    def tile_at(self, level, ty, tx, stat='mean'):
+        self.tiles_read += 1
+        return self.array(level, stat)[ty, tx]
+
+    def level_for(self, xlim, ylim, pixels):
+        """Coarsest level with at least one cell per pixel in both directions."""
+        dx, dy = self.cell_size(0)
+        cols = abs(xlim[1] - xlim[0]) / dx
+        rows = abs(ylim[1] - ylim[0]) / dy
+        ratio = min(cols / max(pixels[0], 1), rows / max(pixels[1], 1))
+        level = int(np.floor(np.log2(ratio))) if ratio >= 1 else 0
+        return min(level, len(self.levels) - 1)
+
+    def window(self, xlim, ylim, pixels=(800, 600), stat='mean', level=None):
+        """
+        Cells of the viewport xlim x ylim at the level for a screen of
+        pixels = (width, height). Returns (data, extent, level); data row 0 is
+        at ymin (imshow with origin='lower').
+        """
+        if level is None:
+            level = self.level_for(xlim, ylim, pixels)
+        x0, _, y0, _ = self.extent
+        dx, dy = self.cell_size(level)
+        h, w = self.levels[level]['shape']
+        c0 = int(np.clip(np.floor((min(xlim) - x0) / dx), 0, w))
+        c1 = int(np.clip(np.ceil((max(xlim) - x0) / dx), c0, w))
+        r0 = int(np.clip(np.floor((min(ylim) - y0) / dy), 0, h))
+        r1 = int(np.clip(np.ceil((max(ylim) - y0) / dy), r0, h))
+        t = self.tile
+        out = np.full((r1 - r0, c1 - c0), 0 if stat == 'count' else np.nan, dtype=_dtype(stat))
+        for ty in range(r0 // t, -(-r1 // t)):
+            for tx in range(c0 // t, -(-c1 // t)):
+                block = self.tile_at(level, ty, tx, stat)
+                ra, rb = max(r0, ty * t), min(r1, (ty + 1) * t)
+                ca, cb = max(c0, tx * t), min(c1, (tx + 1) * t)
+                out[ra - r0:rb - r0, ca - c0:cb - c0] = block[ra - ty * t:rb - ty * t, ca - tx * t:cb - tx * t]
+        return out, (x0 + c0 * dx, x0 + c1 * dx, y0 + r0 * dy, y0 + r1 * dy), level
+
+    def value_range(self, stat='mean'):
+        """Colour limits from the one-tile top level."""
+        top = len(self.levels) - 1
+        lo, hi = self.array(top, 'min'), self.array(top, 'max')
+        if stat == 'count':
+            return 0, int(self.array(top, 'count').max())
+        return float(np.nanmin(lo)), float(np.nanmax(hi))
+
+
+class PyramidView:
+    """
+    Matplotlib image that refetches its tiles whenever the axes are panned or
+    zoomed, at the resolution of the axes on screen.
+    """
+
+    def __init__(self, ax, pyramid, stat='mean', cmap='inferno'):
+        self.ax, self.pyramid, self.stat = ax, pyramid, stat
+        x0, x1, y0, y1 = pyramid.extent
+        data, extent, self.level = pyramid.window((x0, x1), (y0, y1), self._pixels(), stat)
+        vmin, vmax = pyramid.value_range(stat)
+        self.image = ax.imshow(data, extent=extent, origin='lower', cmap=cmap, vmin=vmin, vmax=vmax,
+                               interpolation='nearest', aspect='auto')
+        ax.set_xlim(x0, x1)
+        ax.set_ylim(y0, y1)
+        ax.callbacks.connect('xlim_changed', self.update)
+        ax.callbacks.connect('ylim_changed', self.update)
+
+    def _pixels(self):
+        bbox = self.ax.get_window_extent()
+        return max(int(bbox.width), 1), max(int(bbox.height), 1)
+
+    def update(self, ax=None):
+        data, extent, self.level = self.pyramid.window(self.ax.get_xlim(), self.ax.get_ylim(), self._pixels(),
+                                                       self.stat)
+        self.image.set_data(data)
+        self.image.set_extent(extent)
+        self.ax.set_title(f"{self.stat} |B|, level {self.level}", fontsize=10)
+
+
+def decimate(z, max_shape, stat='mean'):
+    """
+    Block reduction of a 2-D array to at most max_shape (same rules as the
+    pyramid levels, by integer factors per axis); returns z itself if it fits.
+    """
+    z = np.asarray(z, float)
+    fy, fx = (-(-n // max(m, 1)) for n, m in zip(z.shape, max_shape))
+    if fy == 1 and fx == 1:
+        return z
+    h, w = -(-z.shape[0] // fy), -(-z.shape[1] // fx)
+    blocks = _pad(z, h * fy, w * fx, np.nan).reshape(h, fy, w, fx)
+    with warnings.catch_warnings():
+        # All-NaN blocks stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return {'mean': np.nanmean, 'min': np.nanmin, 'max': np.nanmax}[stat](blocks, axis=(1, 3))
+
+
+# --- Main ---
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    b = sub.add_parser('build', help="build a pyramid")
+    b.add_argument('root')
+    src = b.add_mutually_exclusive_group(required=True)
+    src.add_argument('--table', help="process_table.DATASETS key: grid the table scan's points")
+    src.add_argument('--stack', help="map_stack.py .npz (mean map)")
+    src.add_argument('--npy', help="any 2-D .npy map (row 0 at ymin), with --extent")
+    b.add_argument('--extent', type=float, nargs=4, metavar=('X0', 'X1', 'Y0', 'Y1'))
+    b.add_argument('--shape', type=int, nargs=2, default=(2000, 2000), metavar=('NY', 'NX'),
+                   help="level-0 resolution for --table")
+    b.add_argument('--method', default='linear', help="gridding backend for --table")
+    b.add_argument('--tile', type=int, default=TILE)
+    v = sub.add_parser('view', help="interactive viewer (zoom / pan refetch tiles)")
+    v.add_argument('root')
+    v.add_argument('--stat', default='mean', choices=STATS)
+    args = parser.parse_args()
+
+    if args.cmd == 'view':
+        import matplotlib.pyplot as plt
+        pyr = TilePyramid(args.root)
+        fig, ax = plt.subplots(figsize=(10, 8))
+        view = PyramidView(ax, pyr, args.stat)
+        fig.colorbar(view.image, ax=ax, label='Magnetic Field Strength (µT)')
+        ax.set_aspect('equal', adjustable='datalim')
+        plt.show()
+        print(f"{pyr.tiles_read} tiles read")
+        return
+
+    t0 = time.perf_counter()
+    if args.table:
+        import process_table
+        merged = process_table.merge_points(args.table, process_table.BASE_DIR)
+        if merged is None:
+            return
+        df = merged[0]
+        x, y, z = df['S1'].to_numpy(), df['S2'].to_numpy(), df['B_abs'].to_numpy()
+        pyr = from_points(args.root, x, y, z, (x.min(), x.max()), (y.min(), y.max()), args.shape,
+                          args.method, args.tile)
+    elif args.stack:
+        from map_stack import MapStack
+        stack = MapStack.load(args.stack)
+        pyr = from_array(args.root, stack.mean, node_extent(stack.xlim, stack.ylim, stack.shape), args.tile)
+    else:
+        if not args.extent:
+            parser.error("--npy needs --extent")
+        pyr = from_array(args.root, np.load(args.npy, mmap_mode='r'), args.extent, args.tile)
+    h, w = pyr.shape
+    print(f"{args.root}: {w} x {h} cells, {len(pyr.levels)} levels of {pyr.tile} px tiles "
+          f"in {time.perf_counter() - t0:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
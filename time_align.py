@@ -0,0 +1,192 @@
+"""
+Time alignment of two sensor streams on sorted NumPy time axes, shared by
+the EXPOM lanes (merge_asof nearest), Arduino/process_table.py (interp1d)
+and Arduino/heatmap.py (np.interp).
+
+Alignment locates every query time between two source samples once; nearest,
+linear and tolerance-gated lookups of any number of channels reuse those
+indices (dense sorted queries without gating go through np.interp directly,
+whose merge-like search is faster than gathering by index):
+
+    al = Alignment(acc_time, mag_time, offset=0.12)
+    pos = al.nearest(acc_pos, tolerance=0.1)      # merge_asof(direction='nearest')
+    s1, s2 = al.linear(np.column_stack((s1, s2)), outside='nan').T   # interp1d
+"""
+import numpy as np
+
+
+def bracket(t_src, q, dense=False):
+    """
+    lo[i] = last source index with t_src[lo] <= q[i] (-1 before the start),
+    i.e. searchsorted(t_src, q, side='right') - 1. Also returns the bracketing
+    times t_src[lo] and t_src[lo + 1] (-inf / +inf outside).
+
+    dense: q is sorted and at least as long as t_src. The position then comes
+    from np.interp over the sample numbers, whose search starts at the
+    previous result (a linear merge instead of one binary search per query);
+    rounding can put it one sample off, which the check against the
+    bracketing times repairs.
+    """
+    n = len(t_src)
+    if dense and n > 1:
+        lo = np.interp(q, t_src, np.arange(n, dtype=np.float64)).astype(np.intp)
+    else:
+        lo = np.searchsorted(t_src, q, side='right') - 1
+    t_lo, t_hi = _neighbours(t_src, lo)
+    if not dense:
+        return lo, t_lo, t_hi
+
+    while True:
+        fix = np.flatnonzero((t_lo > q) | (t_hi <= q))
+        if len(fix) == 0:
+            return lo, t_lo, t_hi
+        lo[fix] += np.where(t_hi[fix] <= q[fix], 1, -1)
+        t_lo[fix], t_hi[fix] = _neighbours(t_src, lo[fix])
+
+
+def _neighbours(t_src, lo):
+    """t_src[lo] and t_src[lo + 1], -inf / +inf beyond the ends."""
+    if len(t_src) == 0:
+        return np.full(len(lo), -np.inf), np.full(len(lo), np.inf)
+    t_lo = np.take(t_src, lo, mode='clip')
+    t_hi = np.take(t_src, lo + 1, mode='clip')
+    t_lo[lo < 0] = -np.inf
+    t_hi[lo >= len(t_src) - 1] = np.inf
+    return t_lo, t_hi
+
+
+class Alignment:
+    """
+    Maps the query times t_query onto the sorted source time axis t_src.
+
+    Different device clocks: t_query = t_src * (1 + drift) + offset, i.e.
+    offset is the time of source t = 0 on the query clock and drift the
+    relative rate difference. The query times are transformed once into the
+    source clock, distances (tolerance) are measured on the source clock.
+
+    The bracketing indices are computed on first use and shared by all
+    lookups afterwards.
+    """
+
+    def __init__(self, t_src, t_query, offset=0.0, drift=0.0):
+        self.t_src = np.asarray(t_src, dtype=np.float64)
+        q = np.asarray(t_query, dtype=np.float64)
+        if offset:
+            q = q - offset
+        if drift:
+            q = q / (1.0 + drift)
+        self.t_query = q
+        # Sorted queries at least as dense as the source: merge-like search pays off
+        self.dense = len(q) >= len(self.t_src) and bool(np.all(q[1:] >= q[:-1]))
+        self._bracket = None
+        self._nearest = None
+
+    def _brackets(self):
+        if self._bracket is None:
+            self._bracket = bracket(self.t_src, self.t_query, self.dense)
+        return self._bracket
+
+    @property
+    def lo(self):
+        return self._brackets()[0]
+
+    @property
+    def hi(self):
+        return self.lo + 1
+
+    def _nearest_lookup(self):
+        if self._nearest is None:
+            lo, t_lo, t_hi = self._brackets()
+            d_back = self.t_query - t_lo
+            d_fwd = t_hi - self.t_query
+            # Tie -> earlier sample (as merge_asof); exact matches always go back
+            fwd = d_back > d_fwd
+            self._nearest = (lo + fwd, np.minimum(d_back, d_fwd))
+        return self._nearest
+
+    @property
+    def nearest_idx(self):
+        return self._nearest_lookup()[0]
+
+    @property
+    def distance(self):
+        return self._nearest_lookup()[1]
+
+    def matched(self, tolerance=None):
+        """Query rows that have a source sample within tolerance (inclusive)."""
+        if tolerance is None:
+            return np.isfinite(self.distance)
+        return self.distance <= tolerance
+
+    def nearest(self, values, tolerance=None, fill=np.nan):
+        """
+        Value of the nearest source sample for every query time, fill where
+        none lies within tolerance. values: (n_src,) or (n_src, channels).
+        """
+        values = np.asarray(values)
+        ok = self.matched(tolerance)
+        if ok.all():
+            return values[self.nearest_idx]
+        out = np.full((len(ok),) + values.shape[1:], fill,
+                      dtype=np.result_type(values.dtype, np.min_scalar_type(fill)))
+        out[ok] = values[self.nearest_idx[ok]]
+        return out
+
+    def linear(self, values, outside='clamp', tolerance=None, fill=np.nan):
+        """
+        Linear interpolation between the two neighbouring source samples, same
+        arithmetic as np.interp. outside='clamp' repeats the first/last value
+        (np.interp), 'nan' fills query times outside the source range
+        (interp1d with bounds_error=False). With tolerance, query times whose
+        nearest source sample is farther away (dropouts) are filled as well.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n, m = len(self.t_src), len(self.t_query)
+        if n == 0:
+            return np.full((m,) + values.shape[1:], fill)
+
+        if self.dense and tolerance is None:
+            # np.interp's own search is a merge here, cheaper than gathering by index
+            chans = values.reshape(n, -1)
+            out = np.empty((m, chans.shape[1]))
+            for k in range(chans.shape[1]):
+                out[:, k] = np.interp(self.t_query, self.t_src, chans[:, k])
+            if outside != 'clamp':
+                out[:np.searchsorted(self.t_query, self.t_src[0], side='left')] = fill
+                out[np.searchsorted(self.t_query, self.t_src[-1], side='right'):] = fill
+            return out.reshape((m,) + values.shape[1:])
+
+        lo_raw, t_lo, t_hi = self._brackets()
+        lo = np.clip(lo_raw, 0, max(n - 2, 0))
+        w = self.t_query - t_lo
+        dt = t_hi - t_lo
+        if values.ndim > 1:
+            w, dt = w[:, None], dt[:, None]
+        # Fancy indexing, not np.take: take copies non-contiguous columns first
+        y_lo = values[lo]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            out = (values[lo + 1 if n > 1 else lo] - y_lo) / dt * w + y_lo
+
+        # Before the first sample / at or after the last sample
+        before = lo_raw < 0
+        after = lo_raw >= n - 1
+        if outside == 'clamp':
+            out[before] = values[0]
+            out[after] = values[-1]
+        else:
+            out[before] = fill
+            out[after] = fill
+            out[after & (self.t_query == self.t_src[-1])] = values[-1]
+        if tolerance is not None:
+            out[~self.matched(tolerance)] = fill
+        return out
+
+
+def align_nearest(t_src, values, t_query, tolerance=None, offset=0.0, drift=0.0):
+    """Alignment(...).nearest in one call."""
+    return Alignment(t_src, t_query, offset, drift).nearest(values, tolerance)
+
+
+def align_linear(t_src, values, t_query, outside='clamp', tolerance=None, offset=0.0, drift=0.0):
+    """Alignment(...).linear in one call."""
+    return Alignment(t_src, t_query, offset, drift).linear(values, outside, tolerance)